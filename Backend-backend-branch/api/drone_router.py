@@ -8,12 +8,13 @@ import numpy as np
 
 from db.database import get_db
 from db import crud
-from topview.model import TopViewModel
-from topview.config import MODEL_PATH
+from topview.model import TOPVIEW_MODEL_NAME
 from topview.utils import assign_numbers, draw_overlay
 from sideview.model import SideViewModel
 from sideview import aggregator
-from utils.video_utils import get_video_duration, extract_frame_at
+from sideview.scripts.frame_quality import QUALITY_GATE_ENABLED, QualityGate
+from utils.video_utils import get_video_duration, extract_frames_at
+from utils.model_registry import model_registry
 
 router = APIRouter(prefix="/api/drone", tags=["Drone"])
 
@@ -21,6 +22,9 @@ router = APIRouter(prefix="/api/drone", tags=["Drone"])
 VALID_PARTS = {"stem", "bud", "leaves"}
 VALID_STATUSES = {"healthy", "unhealthy", "critical", "bud_rot", "bud_root_dropping", "stem_bleeding"}
 
+# Sideview tree frames decoded and held in memory per batched prediction
+SIDEVIEW_FRAME_BATCH = 16
+
 def validate_part_name(part_name: str) -> str:
     """Validate and normalize part name to lowercase."""
     if not part_name:
@@ -60,16 +64,16 @@ def validate_confidence(confidence: float) -> float:
         raise HTTPException(status_code=400, detail=f"confidence must be between 0.0-1.0, got {confidence}")
     return confidence
 
-# Initialize models (lazy loading)
+# Initialize models (shared through the model registry)
 topview_model = None
-sideview_model = SideViewModel()
+sideview_model = SideViewModel.get_instance()
 
-def get_topview_model(model_path: str = None):
-    """Lazily instantiate TopViewModel. Returns None if weights file missing."""
+def get_topview_model():
+    """Lazily acquire the shared TopViewModel. Returns None if weights file missing."""
     global topview_model
     if topview_model is None:
         try:
-            topview_model = TopViewModel(model_path or MODEL_PATH)
+            topview_model = model_registry.acquire(TOPVIEW_MODEL_NAME)
         except FileNotFoundError:
             # Defer error to request time so app can start without weights present
             return None
@@ -234,46 +238,75 @@ async def upload_sideview(
 
     # Get video duration and split into N segments
     duration = get_video_duration(video_path)
-    results = []
-    
-    for i, tree in enumerate(trees, start=1):
-        # Calculate mid-point of this tree's segment
-        mid = duration * (i - 0.5) / N
-        frame_path = os.path.join(dest_dir, f"tree_{tree.tree_number}_frame.jpg")
-        
-        # Extract frame at midpoint
-        ok = extract_frame_at(video_path, mid, frame_path)
-        if not ok:
-            results.append({"tree": tree.tree_number, "error": "Frame extraction failed"})
-            continue
-        
-        # Run sideview prediction
+    # Mid-point of each tree's segment
+    timestamps = [duration * (i - 0.5) / N for i in range(1, N + 1)]
+    results = [None] * N
+    batch = []  # (tree index, RGB frame)
+    # Blurred / badly exposed tree frames are not predicted
+    gate = QualityGate() if QUALITY_GATE_ENABLED else None
+    
+    def predict_pending():
         try:
-            pred = sideview_model.predict(frame_path)
-            
-            # Extract predictions (adapt based on your model output format)
-            part_name = pred.get("part", "unknown")
-            status_name = pred.get("status", "unknown")
-            status_conf = pred.get("status_confidence", pred.get("part_confidence", 1.0))
-            
-            # Store prediction as TreePart
-            crud.add_tree_part(
-                db=db,
-                tree_id=tree.id, 
-                part_name=part_name, 
-                status=status_name, 
-                confidence=status_conf
-            )
-            
-            results.append({
-                "tree": tree.tree_number, 
-                "part": part_name, 
-                "status": status_name, 
-                "confidence": status_conf
-            })
+            preds = sideview_model.predict_batch([frame for _, frame in batch])
         except Exception as e:
-            results.append({"tree": tree.tree_number, "error": str(e)})
-            continue
+            preds = [e] * len(batch)
+        
+        for (i, _), pred in zip(batch, preds):
+            tree = trees[i]
+            try:
+                if isinstance(pred, Exception):
+                    raise pred
+                
+                # Extract predictions (adapt based on your model output format)
+                part_name = pred.get("part", "unknown")
+                status_name = pred.get("status", "unknown")
+                status_conf = pred.get("status_confidence", pred.get("part_confidence", 1.0))
+                
+                # Store prediction as TreePart
+                crud.add_tree_part(
+                    db=db,
+                    tree_id=tree.id, 
+                    part_name=part_name, 
+                    status=status_name, 
+                    confidence=status_conf
+                )
+                
+                results[i] = {
+                    "tree": tree.tree_number, 
+                    "part": part_name, 
+                    "status": status_name, 
+                    "confidence": status_conf
+                }
+            except Exception as e:
+                results[i] = {"tree": tree.tree_number, "error": str(e)}
+        batch.clear()
+    
+    # Decode all tree frames in one pass over the video and predict them
+    # in batches, straight from memory
+    for i, frame in extract_frames_at(video_path, timestamps):
+        frame_path = os.path.join(dest_dir, f"tree_{trees[i].tree_number}_frame.jpg")
+        cv2.imwrite(frame_path, frame)
+        
+        frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        if gate is not None:
+            passed, reason, metrics = gate.check(frame_rgb)
+            if not passed:
+                results[i] = {
+                    "tree": trees[i].tree_number,
+                    "gated": reason,
+                    "quality": {k: round(v, 3) for k, v in metrics.items()}
+                }
+                continue
+        
+        batch.append((i, frame_rgb))
+        if len(batch) >= SIDEVIEW_FRAME_BATCH:
+            predict_pending()
+    if batch:
+        predict_pending()
+    
+    for i, tree in enumerate(trees):
+        if results[i] is None:
+            results[i] = {"tree": tree.tree_number, "error": "Frame extraction failed"}
 
     # Aggregate health for each tree
     for t in trees:
@@ -303,6 +336,7 @@ async def upload_sideview(
     return JSONResponse({
         "survey_id": survey_id, 
         "processed": len(results), 
+        "gated": gate.gated_frames if gate is not None else 0,
         "results": results
     })
 
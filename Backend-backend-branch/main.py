@@ -2,6 +2,7 @@
 
 import logging
 import json
+import os
 from datetime import datetime
 from pathlib import Path
 from fastapi import FastAPI, Request, HTTPException
@@ -16,6 +17,7 @@ from api.drone_router import router as drone_router
 from api.farmer_router import router as farmer_router
 from api.survey_router import router as survey_router
 from utils.security import RateLimiter, SecurityHeaders
+from utils.model_registry import model_registry, current_rss_bytes
 
 # Deekshith - Survey Orchestration
 from Deekshith.survey.router import router as deekshith_survey_router
@@ -62,8 +64,8 @@ async def add_security_headers(request: Request, call_next):
 @app.middleware("http")
 async def rate_limit_middleware(request: Request, call_next):
     """Rate limit requests per IP address."""
-    # Skip rate limiting for health check
-    if request.url.path == "/health":
+    # Skip rate limiting for health checks
+    if request.url.path.startswith("/health"):
         return await call_next(request)
     
     client_ip = request.client.host if request.client else "unknown"
@@ -119,6 +121,23 @@ storage_path = Path(__file__).parent / "Deekshith" / "storage"
 if storage_path.exists():
     app.mount("/storage", StaticFiles(directory=str(storage_path)), name="storage")
 
+@app.on_event("startup")
+async def preload_models():
+    """
+    Optionally warm the shared models before the first request.
+    PRELOAD_MODELS is a comma-separated list of registry names, or "all".
+    """
+    preload = os.getenv("PRELOAD_MODELS", "").strip()
+    if not preload:
+        return
+    names = None if preload.lower() == "all" else [n.strip() for n in preload.split(",") if n.strip()]
+    errors = model_registry.warm_up(names)
+    for name, error in errors.items():
+        if error:
+            logger.warning(f"Model preload failed for {name}: {error}")
+        else:
+            logger.info(f"Model preloaded: {name}")
+
 @app.get("/health", tags=["Health"])
 async def health_check():
     """
@@ -126,12 +145,10 @@ async def health_check():
     Returns service status, timestamp, and model availability.
     """
     try:
-        # Check if models are loaded
-        from topview.model import TopViewModel
-        from sideview.model import SideViewModel
-        
-        topview_loaded = TopViewModel.model is not None if hasattr(TopViewModel, 'model') else False
-        sideview_loaded = SideViewModel.model is not None if hasattr(SideViewModel, 'model') else False
+        models = {
+            entry["name"]: "loaded" if entry["loaded"] else "not_loaded"
+            for entry in model_registry.stats()
+        }
         
         return JSONResponse(
             status_code=200,
@@ -139,10 +156,7 @@ async def health_check():
                 "status": "healthy",
                 "timestamp": datetime.utcnow().isoformat(),
                 "version": "1.0.0",
-                "models": {
-                    "topview_yolo": "loaded" if topview_loaded else "not_loaded",
-                    "sideview_tensorflow": "loaded" if sideview_loaded else "not_loaded"
-                }
+                "models": models
             }
         )
     except Exception as e:
@@ -156,6 +170,19 @@ async def health_check():
             }
         )
 
+@app.get("/health/models", tags=["Health"])
+async def model_health():
+    """
+    Report every registered model with its load state, reference count,
+    load time, parameter memory and the RSS growth caused by loading it.
+    """
+    return {
+        "timestamp": datetime.utcnow().isoformat(),
+        "pid": os.getpid(),
+        "process_rss_bytes": current_rss_bytes(),
+        "models": model_registry.stats()
+    }
+
 @app.get("/", tags=["Root"])
 async def root():
     """Root endpoint with API documentation link."""
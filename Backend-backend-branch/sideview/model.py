@@ -2,14 +2,55 @@
 """
 Sideview Model Wrapper
 Provides a model interface compatible with the existing drone_router.py
+
+All sideview models (transfer classifier and UNet++ segmenter) are loaded
+through the process-wide model registry, so the drone router, the sideview
+router and the video pipeline share a single instance of each.
 """
 
 import logging
 from pathlib import Path
 from typing import Optional
 
+from sideview.test_transfer_model import find_model_path, CLASSIFIER_BACKEND
+from utils.model_registry import model_registry
+
 logger = logging.getLogger(__name__)
 
+SIDEVIEW_ROOT = Path(__file__).parent
+# Classifier file for the configured backend (SIDEVIEW_CLASSIFIER_BACKEND):
+# .keras/.h5 for Keras, quantized .tflite/.onnx for the CPU runtimes
+MODEL_PATH = Path(find_model_path(str(SIDEVIEW_ROOT), CLASSIFIER_BACKEND))
+LABELS_PATH = SIDEVIEW_ROOT / "labels.json"
+SEGMENTER_MODEL_PATH = SIDEVIEW_ROOT / "model" / "coconut_best_dice.pth"
+
+# Registry names
+TRANSFER_MODEL_NAME = "sideview_transfer"
+SEGMENTER_MODEL_NAME = "sideview_segmenter"
+
+
+def _load_transfer_predictor():
+    """Registry loader for the Keras transfer classifier."""
+    from sideview.test_transfer_model import TransferModelPredictor
+
+    return TransferModelPredictor(
+        model_path=str(MODEL_PATH),
+        labels_path=str(LABELS_PATH)
+    )
+
+
+def _load_segmentation_model():
+    """Registry loader for the UNet++ segmenter used by the video pipeline."""
+    from sideview.scripts.video_to_phase2 import load_segmentation_model
+
+    if not SEGMENTER_MODEL_PATH.exists():
+        raise FileNotFoundError(f"Segmentation model not found at {SEGMENTER_MODEL_PATH}")
+    return load_segmentation_model(SEGMENTER_MODEL_PATH)
+
+
+model_registry.register(TRANSFER_MODEL_NAME, _load_transfer_predictor)
+model_registry.register(SEGMENTER_MODEL_NAME, _load_segmentation_model)
+
 # Global model instance
 _model_instance: Optional['SideViewModel'] = None
 
@@ -19,24 +60,19 @@ class SideViewModel:
     Wrapper class for the sideview transfer learning model.
     Provides compatibility with existing drone router code.
     """
-    
+
     def __init__(self):
         """Initialize the sideview model."""
         self.model = None
-        self.model_path = Path(__file__).parent / "plant_disease_transfer_model.h5"
-        self.labels_path = Path(__file__).parent / "labels.json"
+        self.model_path = MODEL_PATH
+        self.labels_path = LABELS_PATH
         self._load_model()
-    
+
     def _load_model(self):
-        """Load the transfer model if available."""
+        """Take a reference to the shared transfer model if available."""
         try:
-            from sideview.test_transfer_model import TransferModelPredictor
-            
             if self.model_path.exists() and self.labels_path.exists():
-                self.model = TransferModelPredictor(
-                    model_path=str(self.model_path),
-                    labels_path=str(self.labels_path)
-                )
+                self.model = model_registry.acquire(TRANSFER_MODEL_NAME)
                 logger.info("Sideview model loaded successfully")
             else:
                 logger.warning(f"Model files not found at {self.model_path}")
@@ -44,22 +80,37 @@ class SideViewModel:
         except Exception as e:
             logger.error(f"Failed to load sideview model: {e}")
             self.model = None
-    
+
     def predict(self, image_path: str):
         """
         Predict disease from image.
-        
+
         Args:
             image_path: Path to the image file
-            
+
         Returns:
             Prediction results dictionary
         """
         if self.model is None:
             raise RuntimeError("Model not loaded")
-        
+
         return self.model.predict(image_path)
-    
+
+    def predict_batch(self, images):
+        """
+        Predict disease for decoded images in batched forward passes.
+
+        Args:
+            images: list of HxWx3 uint8 RGB arrays
+
+        Returns:
+            List of prediction results dictionaries, same order as ``images``
+        """
+        if self.model is None:
+            raise RuntimeError("Model not loaded")
+
+        return self.model.predict_batch(images)
+
     @classmethod
     def get_instance(cls) -> 'SideViewModel':
         """Get or create singleton instance."""
@@ -6,6 +6,7 @@ Provides API endpoints for disease detection in coconut trees using:
 - Video processing with frame-by-frame analysis
 """
 
+import io
 import sys
 import os
 import json
@@ -14,12 +15,23 @@ import logging
 from pathlib import Path
 from typing import Optional
 
+import numpy as np
 from fastapi import APIRouter, File, UploadFile, HTTPException
 from fastapi.responses import JSONResponse
+from PIL import Image
 
 # ✅ recommendation.py must be in ROOT (same folder as main.py)
 from recommendation import get_recommendation
 
+# Shared models (loaded once per process through the model registry)
+from sideview.model import (
+    MODEL_PATH,
+    LABELS_PATH,
+    TRANSFER_MODEL_NAME,
+    SEGMENTER_MODEL_NAME,
+)
+from utils.model_registry import model_registry
+
 # Setup logging
 logger = logging.getLogger(__name__)
 
@@ -28,8 +40,6 @@ SIDEVIEW_ROOT = Path(__file__).parent
 SCRIPTS_DIR = SIDEVIEW_ROOT / "scripts"
 UPLOADS_DIR = SIDEVIEW_ROOT / "uploads"
 RESULTS_DIR = SIDEVIEW_ROOT / "results"
-MODEL_PATH = SIDEVIEW_ROOT / "plant_disease_transfer_model.h5"
-LABELS_PATH = SIDEVIEW_ROOT / "labels.json"
 
 # Ensure directories exist
 UPLOADS_DIR.mkdir(parents=True, exist_ok=True)
@@ -69,7 +79,7 @@ router = APIRouter(
     }
 )
 
-# Lazy-loaded global predictor for single-image endpoint
+# Reference held by the single-image endpoint
 _image_predictor: Optional[TransferModelPredictor] = None
 
 # ✅ In-memory storage for last image and last video (for recommendation endpoint)
@@ -100,10 +110,7 @@ def _get_predictor() -> TransferModelPredictor:
                 detail=f"Labels file not found at {LABELS_PATH}"
             )
         
-        _image_predictor = TransferModelPredictor(
-            model_path=str(MODEL_PATH),
-            labels_path=str(LABELS_PATH)
-        )
+        _image_predictor = model_registry.acquire(TRANSFER_MODEL_NAME)
         logger.info("Transfer model loaded successfully")
     
     return _image_predictor
@@ -155,16 +162,27 @@ async def predict_image_endpoint(file: UploadFile = File(...)):
         # Get predictor (loads model if needed)
         predictor = _get_predictor()
         
-        # Save uploaded image
+        # Decode upload in memory
+        contents = await file.read()
+        try:
+            with Image.open(io.BytesIO(contents)) as img:
+                img_rgb = np.asarray(img.convert("RGB"))
+        except Exception:
+            raise HTTPException(
+                status_code=400,
+                detail="Could not decode image file."
+            )
+        
+        # Run prediction on the decoded image (no disk round trip)
+        result = predictor.predict_batch([img_rgb])[0]
+        
+        # Keep a copy of the upload for reference
         image_upload_dir = UPLOADS_DIR / "images"
         image_upload_dir.mkdir(parents=True, exist_ok=True)
         
         file_path = image_upload_dir / file.filename
         with open(file_path, "wb") as buffer:
-            shutil.copyfileobj(file.file, buffer)
-        
-        # Run prediction
-        result = predictor.predict(str(file_path))
+            buffer.write(contents)
         
         # ✅ Store for recommendation endpoint
         LAST_IMAGE_PREDICTION = result
@@ -236,13 +254,17 @@ async def process_video_endpoint(file: UploadFile = File(...)):
         
         logger.info(f"Processing video: {file.filename}")
         
-        # Run the video processing pipeline
-        output_json_path = run_pipeline(
-            video_path=str(file_path),
-            phase2_model=str(MODEL_PATH),
-            frame_interval=0,  # Auto-detect interval
-            debug=False,
-        )
+        # Run the video processing pipeline with the shared models
+        with model_registry.lease(TRANSFER_MODEL_NAME) as predictor, \
+                model_registry.lease(SEGMENTER_MODEL_NAME) as segmentation_model:
+            output_json_path = run_pipeline(
+                video_path=str(file_path),
+                phase2_model=str(MODEL_PATH),
+                frame_interval=0,  # Auto-detect interval
+                debug=False,
+                predictor=predictor,
+                segmentation_model=segmentation_model,
+            )
         
         # Generate HTML report
         generate_report(Path(output_json_path))
@@ -255,8 +277,9 @@ async def process_video_endpoint(file: UploadFile = File(...)):
         predictions = result_data.get("predictions", [])
         formatted_predictions = _format_predictions(predictions)
         
-        # Generate dashboard
-        dashboard = aggregate_dashboard(formatted_predictions)
+        # Generate dashboard (with the frames rejected by the quality gate)
+        gated_frames = result_data.get("segmentation_result", {}).get("quality_gate", {}).get("gated_frames", 0)
+        dashboard = aggregate_dashboard(formatted_predictions, gated_frames=gated_frames)
         
         # ✅ Store dashboard for recommendation endpoint
         LAST_VIDEO_DASHBOARD = dashboard
@@ -370,6 +393,7 @@ def _format_predictions(predictions: list) -> list:
             "ood_reason": prediction_detail.get("ood_reason"),
             "ood_signals": prediction_detail.get("ood_signals"),
             "reliability": prediction_detail.get("reliability", 0),
+            "reuse_count": pred_entry.get("reuse_count", 0),
         })
     
     return formatted_predictions
@@ -8,6 +8,13 @@ Usage:
     from video.scripts.aggregate_dashboard import aggregate_dashboard
     dashboard = aggregate_dashboard(predictions)
 
+Predictions reused for near-identical video frames (frame_dedup.py) carry
+a ``reuse_count``; each prediction counts as 1 + reuse_count frames, so
+the dashboard matches what it would have been without deduplication.
+
+Frames rejected by the quality gate (frame_quality.py) never reach the
+models; callers pass their count as ``gated_frames`` and it is reported
+in ``meta`` next to the OOD and low-confidence counts.
 """
 from collections import Counter
 
@@ -37,18 +44,28 @@ def _safe_conf(p, key_path, default=0.0):
         return default
 
 
-def aggregate_dashboard(predictions):
+def _frame_weight(p):
+    """Number of video frames a prediction stands for (itself + reuses)."""
+    try:
+        return 1 + max(0, int(p.get("reuse_count") or 0))
+    except (TypeError, ValueError):
+        return 1
+
+
+def aggregate_dashboard(predictions, gated_frames=0):
     """
     Input  : predictions (list) → your existing per-frame JSON list
+             gated_frames → frames rejected by the quality gate before inference
     Output : dashboard summary JSON
     """
 
     # -----------------------------
     # 1️⃣ Basic counts and filtering
     # -----------------------------
-    total_frames = len(predictions)
-    ood_count = sum(1 for p in predictions if p.get("is_out_of_distribution", False))
-    low_conf_count = sum(1 for p in predictions if p.get("reliability", 0) < LOW_CONFIDENCE_THRESHOLD)
+    total_frames = sum(_frame_weight(p) for p in predictions)
+    reused_frames = total_frames - len(predictions)
+    ood_count = sum(_frame_weight(p) for p in predictions if p.get("is_out_of_distribution", False))
+    low_conf_count = sum(_frame_weight(p) for p in predictions if p.get("reliability", 0) < LOW_CONFIDENCE_THRESHOLD)
 
     # Frames considered valid for dashboard (high reliability and not OOD)
     valid_frames = [
@@ -63,7 +80,9 @@ def aggregate_dashboard(predictions):
                 "total_frames": total_frames,
                 "valid_frames": 0,
                 "ood_frames": ood_count,
-                "low_confidence_frames": low_conf_count
+                "low_confidence_frames": low_conf_count,
+                "reused_frames": reused_frames,
+                "gated_frames": gated_frames
             },
             "tree": {
                 "health": "unknown",
@@ -80,15 +99,15 @@ def aggregate_dashboard(predictions):
     # -----------------------------
     # 2️⃣ TREE-LEVEL AGGREGATION (counts + weighted by reliability)
     # -----------------------------
-    healthy_count = sum(1 for p in valid_frames if p.get("health") == "healthy")
-    total_count = len(valid_frames)
+    healthy_count = sum(_frame_weight(p) for p in valid_frames if p.get("health") == "healthy")
+    total_count = sum(_frame_weight(p) for p in valid_frames)
 
     # Simple fraction-based score
     tree_score = round((healthy_count / total_count) * 100, 2)
 
     # Weighted score uses reliability as weight so high-reliability frames count more
-    total_weight = sum(p.get("reliability", 0) for p in valid_frames) or 1
-    healthy_weight = sum(p.get("reliability", 0) for p in valid_frames if p.get("health") == "healthy")
+    total_weight = sum(p.get("reliability", 0) * _frame_weight(p) for p in valid_frames) or 1
+    healthy_weight = sum(p.get("reliability", 0) * _frame_weight(p) for p in valid_frames if p.get("health") == "healthy")
     weighted_score = round((healthy_weight / total_weight) * 100, 2)
 
     # Health decision: prefer weighted score but keep a fallback to simple score
@@ -109,7 +128,7 @@ def aggregate_dashboard(predictions):
                 continue
             if part not in VALID_DISEASES_BY_PART or d not in VALID_DISEASES_BY_PART[part]:
                 continue
-            disease_counter[d] += p.get("reliability", 0)
+            disease_counter[d] += p.get("reliability", 0) * _frame_weight(p)
             part_disease_map[d] = part  # Remember which part has this disease
 
         if disease_counter:
@@ -140,20 +159,20 @@ def aggregate_dashboard(predictions):
             }
             continue
 
-        part_total = len(part_frames)
-        part_healthy = sum(1 for p in part_frames if p.get("health") == "healthy")
+        part_total = sum(_frame_weight(p) for p in part_frames)
+        part_healthy = sum(_frame_weight(p) for p in part_frames if p.get("health") == "healthy")
 
         # Simple score
         part_score = round((part_healthy / part_total) * 100, 2)
 
         # Weighted score by reliability
-        total_w = sum(p.get("reliability", 0) for p in part_frames) or 1
-        healthy_w = sum(p.get("reliability", 0) for p in part_frames if p.get("health") == "healthy")
+        total_w = sum(p.get("reliability", 0) * _frame_weight(p) for p in part_frames) or 1
+        healthy_w = sum(p.get("reliability", 0) * _frame_weight(p) for p in part_frames if p.get("health") == "healthy")
         part_weighted = round((healthy_w / total_w) * 100, 2)
 
         # Average confidences (if present)
-        avg_part_conf = round(sum(_safe_conf(p, ("part", "confidence")) for p in part_frames) / part_total, 2)
-        avg_status_conf = round(sum(_safe_conf(p, ("status", "confidence")) for p in part_frames) / part_total, 2)
+        avg_part_conf = round(sum(_safe_conf(p, ("part", "confidence")) * _frame_weight(p) for p in part_frames) / part_total, 2)
+        avg_status_conf = round(sum(_safe_conf(p, ("status", "confidence")) * _frame_weight(p) for p in part_frames) / part_total, 2)
 
         # Disease breakdown (weighted by reliability)
         diseases = {}
@@ -167,7 +186,7 @@ def aggregate_dashboard(predictions):
                 # Enforce part–disease compatibility
                 if part not in VALID_DISEASES_BY_PART or d not in VALID_DISEASES_BY_PART[part]:
                     continue
-                d_counter[d] += p.get("reliability", 0)
+                d_counter[d] += p.get("reliability", 0) * _frame_weight(p)
 
             total_diseased_w = sum(d_counter.values()) or 1
             diseases = {d: round((w / total_diseased_w) * 100, 2) for d, w in d_counter.items()}
@@ -211,7 +230,9 @@ def aggregate_dashboard(predictions):
             "total_frames": total_frames,
             "valid_frames": total_count,
             "ood_frames": ood_count,
-            "low_confidence_frames": low_conf_count
+            "low_confidence_frames": low_conf_count,
+            "reused_frames": reused_frames,
+            "gated_frames": gated_frames
         },
         "tree": {
             "health": tree_health,
@@ -0,0 +1,120 @@
+"""
+Downscaled analysis proxy for sideview videos.
+
+The segmenter sees every frame at IMG_SIZE x IMG_SIZE (512), so decoding,
+color-converting and postprocessing 4K frames is mostly wasted work. The
+proxy is a copy of the video scaled so its short side is IMG_SIZE (both
+sides stay >= the model input), with exactly the same frames, so frame
+indices of the proxy and the original match. Segmentation, tracking,
+postprocessing and the overlay videos run on the proxy; only the crops
+that go to the classifier are cut from full-resolution frames
+(crop_utils.save_frame_crops(full_frame=...)).
+
+The proxy is written next to the video as ``<stem>.proxy<N>.mp4`` with
+ffmpeg (OpenCV fallback) and reused while it is newer than the video.
+
+Usage:
+    proxy_path = make_analysis_proxy(video_path)   # None: video already small
+"""
+
+import os
+import shutil
+import subprocess
+from pathlib import Path
+
+import cv2
+
+PROXY_ENABLED = os.environ.get("SIDEVIEW_ANALYSIS_PROXY", "0") == "1"
+
+# Short side of the proxy: the segmenter input size (predict_video.IMG_SIZE)
+PROXY_SHORT_SIDE = 512
+
+# Only videos at least this much larger than the proxy get one
+PROXY_MIN_SCALE = 1.5
+
+
+def proxy_size(width, height, short_side=PROXY_SHORT_SIDE):
+    """Proxy (width, height): short side = ``short_side``, even dimensions."""
+    scale = short_side / min(width, height)
+    return (max(2, int(round(width * scale / 2)) * 2),
+            max(2, int(round(height * scale / 2)) * 2))
+
+
+def proxy_path_for(video_path, short_side=PROXY_SHORT_SIDE):
+    video_path = Path(video_path)
+    return video_path.with_name(f"{video_path.stem}.proxy{short_side}.mp4")
+
+
+def _frame_count(path):
+    cap = cv2.VideoCapture(str(path))
+    count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT)) if cap.isOpened() else -1
+    cap.release()
+    return count
+
+
+def _write_with_ffmpeg(video_path, out_path, size):
+    w, h = size
+    subprocess.run(
+        ["ffmpeg", "-y", "-v", "error", "-i", str(video_path),
+         "-vf", f"scale={w}:{h}:flags=area", "-vsync", "passthrough", "-an",
+         "-c:v", "libx264", "-preset", "veryfast", "-crf", "18", "-pix_fmt", "yuv420p",
+         str(out_path)],
+        check=True, capture_output=True, timeout=3600,
+    )
+
+
+def _write_with_opencv(video_path, out_path, size):
+    cap = cv2.VideoCapture(str(video_path))
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    writer = cv2.VideoWriter(str(out_path), cv2.VideoWriter_fourcc(*"mp4v"), fps, size)
+    try:
+        while True:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            writer.write(cv2.resize(frame, size, interpolation=cv2.INTER_AREA))
+    finally:
+        writer.release()
+        cap.release()
+
+
+def make_analysis_proxy(video_path, short_side=PROXY_SHORT_SIDE, out_path=None):
+    """
+    Create (or reuse) the analysis proxy of a video.
+
+    Returns the proxy path, or None when the video is not large enough to
+    benefit or no frame-exact proxy could be written.
+    """
+    video_path = Path(video_path)
+    cap = cv2.VideoCapture(str(video_path))
+    if not cap.isOpened():
+        return None
+    width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+    height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    cap.release()
+
+    if min(width, height) < short_side * PROXY_MIN_SCALE:
+        return None
+
+    out_path = Path(out_path) if out_path else proxy_path_for(video_path, short_side)
+    if out_path.exists() and out_path.stat().st_mtime >= video_path.stat().st_mtime \
+            and _frame_count(out_path) == total_frames:
+        return out_path
+
+    size = proxy_size(width, height, short_side)
+    try:
+        if shutil.which("ffmpeg"):
+            _write_with_ffmpeg(video_path, out_path, size)
+        else:
+            _write_with_opencv(video_path, out_path, size)
+    except (OSError, subprocess.SubprocessError) as e:
+        print(f"   ⚠️  Analysis proxy failed ({e}), using full resolution")
+        return None
+
+    # Frame indices must match the original for full-resolution crops
+    if _frame_count(out_path) != total_frames:
+        print("   ⚠️  Analysis proxy frame count differs from the video, using full resolution")
+        out_path.unlink(missing_ok=True)
+        return None
+    return out_path
@@ -0,0 +1,123 @@
+"""Cold-start benchmark for the sideview transfer model.
+
+Each mode runs in a fresh Python process so import, load and first
+inference times are measured from a cold interpreter:
+
+    legacy      MobileNetV2(weights="imagenet") + load_weights(.h5) + model.predict
+    h5          MobileNetV2(weights=None) + load_weights(.h5) + traced tf.function
+    keras       load_model(.keras) + traced tf.function
+    savedmodel  tf.saved_model.load(dir) + traced tf.function
+
+Usage:
+    python benchmark_cold_start.py
+    python benchmark_cold_start.py --modes legacy keras --repeat 3
+
+Create the .keras / SavedModel files first with convert_transfer_model.py.
+"""
+import argparse
+import json
+import statistics
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+project_root = Path(__file__).resolve().parents[1]
+
+MODEL_FILES = {
+    "legacy": project_root / "plant_disease_transfer_model.h5",
+    "h5": project_root / "plant_disease_transfer_model.h5",
+    "keras": project_root / "plant_disease_transfer_model.keras",
+    "savedmodel": project_root / "plant_disease_transfer_model_savedmodel",
+}
+
+# Number of warm inferences timed after the first (cold) one
+WARM_CALLS = 20
+
+
+def _child(mode, model_path):
+    """Measure one cold start in this (fresh) process and print JSON."""
+    t0 = time.perf_counter()
+    import numpy as np
+    sys.path.insert(0, str(project_root))
+    import test_transfer_model as ttm
+    t_import = time.perf_counter() - t0
+
+    t1 = time.perf_counter()
+    if mode == "legacy":
+        labels = ttm.load_labels(str(project_root / "labels.json"))
+        model = ttm.build_model(len(labels), weights="imagenet")
+        model.load_weights(model_path)
+
+        def infer(batch):
+            return model.predict(batch, verbose=0)
+    else:
+        predictor = ttm.TransferModelPredictor(model_path=model_path, backend="keras")
+
+        def infer(batch):
+            return predictor.backend(batch)
+    t_load = time.perf_counter() - t1
+
+    batch = np.random.default_rng(0).random((1, ttm.INPUT_SIZE, ttm.INPUT_SIZE, 3), dtype=np.float32)
+    t2 = time.perf_counter()
+    infer(batch)
+    t_first = time.perf_counter() - t2
+
+    warm = []
+    for _ in range(WARM_CALLS):
+        t3 = time.perf_counter()
+        infer(batch)
+        warm.append(time.perf_counter() - t3)
+
+    print(json.dumps({
+        "import_s": t_import,
+        "load_s": t_load,
+        "first_inference_s": t_first,
+        "warm_inference_ms": statistics.median(warm) * 1000.0,
+        "total_s": time.perf_counter() - t0,
+    }))
+
+
+def run_mode(mode, repeat):
+    model_path = MODEL_FILES[mode]
+    if not model_path.exists():
+        print(f"⚠️  {mode}: {model_path.name} not found, skipping")
+        return None
+
+    runs = []
+    for _ in range(repeat):
+        out = subprocess.run(
+            [sys.executable, __file__, "--child", mode, str(model_path)],
+            capture_output=True, text=True,
+        )
+        if out.returncode != 0:
+            print(f"❌ {mode} failed:\n{out.stderr[-2000:]}")
+            return None
+        runs.append(json.loads(out.stdout.strip().splitlines()[-1]))
+
+    return {key: statistics.median(r[key] for r in runs) for key in runs[0]}
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Cold-start benchmark for the transfer model')
+    parser.add_argument('--modes', nargs='+', choices=list(MODEL_FILES), default=list(MODEL_FILES))
+    parser.add_argument('--repeat', type=int, default=3, help='Cold starts per mode (median reported)')
+    parser.add_argument('--child', nargs=2, metavar=('MODE', 'MODEL_PATH'), help=argparse.SUPPRESS)
+
+    args = parser.parse_args()
+
+    if args.child:
+        _child(*args.child)
+        return
+
+    print(f"{'mode':<12}{'import s':>10}{'load s':>10}{'first s':>10}{'warm ms':>10}{'total s':>10}")
+    for mode in args.modes:
+        res = run_mode(mode, args.repeat)
+        if res is None:
+            continue
+        print(f"{mode:<12}{res['import_s']:>10.2f}{res['load_s']:>10.2f}"
+              f"{res['first_inference_s']:>10.2f}{res['warm_inference_ms']:>10.1f}{res['total_s']:>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
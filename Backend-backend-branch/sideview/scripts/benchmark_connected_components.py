@@ -0,0 +1,170 @@
+"""Stats-based connected components vs the original scipy implementation.
+
+The original connected_components_props labelled with scipy.ndimage.label
+and built a full-frame mask and np.where coordinates for every component.
+The current one labels with cv2.connectedComponentsWithStats and builds
+pixel data only on access. On synthetic noisy label masks (a tree plus
+hundreds of leaf / bud fragments) this reports per-frame milliseconds for:
+
+    label       labeling + per-component properties (class masks of one frame)
+    postprocess smart_postprocess end to end with either labeling
+
+and checks that components (order, area, bbox, centroid, mask, coords)
+and the filtered masks are identical.
+
+Usage:
+    python benchmark_connected_components.py
+    python benchmark_connected_components.py --size 3840x2160 --fragments 600 --frames 5
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+from scipy import ndimage
+
+scripts_dir = Path(__file__).parent
+if str(scripts_dir) not in sys.path:
+    sys.path.insert(0, str(scripts_dir))
+
+import postprocess_utils
+from postprocess_utils import Component, connected_components_props, smart_postprocess
+
+
+def legacy_connected_components_props(binary_mask):
+    """
+    The original implementation (full-frame mask and coords per component).
+
+    Components are returned as Component objects over the scipy label
+    image, so smart_postprocess can run on them; their mask and coords are
+    still built eagerly, as before.
+    """
+    labeled, num_features = ndimage.label(binary_mask)
+
+    if num_features == 0:
+        return []
+
+    components = []
+    for label_id in range(1, num_features + 1):
+        mask = (labeled == label_id).astype(np.uint8)
+        coords = np.array(np.where(mask > 0)).T
+
+        if len(coords) == 0:
+            continue
+
+        area = len(coords)
+        ymin, ymax = coords[:, 0].min(), coords[:, 0].max()
+        xmin, xmax = coords[:, 1].min(), coords[:, 1].max()
+        components.append(Component(
+            labeled, label_id,
+            mask=mask,
+            area=area,
+            bbox=(xmin, ymin, xmax, ymax),
+            centroid=((xmin + xmax) / 2, (ymin + ymax) / 2),
+            coords=coords,
+            slice=(slice(ymin, ymax + 1), slice(xmin, xmax + 1)),
+        ))
+
+    return components
+
+
+def make_mask(rng, size, fragments):
+    """Noisy label mask (0=bg, 1=bud, 2=leaf, 3=stem): a tree plus fragments."""
+    w, h = size
+    mask = np.zeros((h, w), dtype=np.uint8)
+    # Crown in the image center, so both close-up and full-tree postprocessing run
+    cx, top = w // 2, int(h * 0.45)
+    cv2.rectangle(mask, (cx - w // 80, top), (cx + w // 80, h - 1), 3, -1)
+    for _ in range(10):
+        angle = rng.uniform(0, np.pi)
+        end = (int(cx + np.cos(angle) * w / 5), int(top - np.sin(angle) * h / 4))
+        cv2.line(mask, (cx, top), end, 2, thickness=max(4, h // 80))
+    cv2.circle(mask, (cx, top), h // 40, 1, -1)
+
+    for _ in range(4):
+        x = int(rng.integers(0, w))
+        cv2.rectangle(mask, (x, int(rng.integers(h // 3, h // 2))), (x + w // 150, h - 1), 3, -1)
+    for _ in range(fragments):
+        center = (int(rng.integers(0, w)), int(rng.integers(0, h)))
+        cv2.circle(mask, center, int(rng.integers(2, max(3, h // 200))), int(rng.choice([1, 2, 2, 2])), -1)
+    return mask
+
+
+def same_components(new, legacy):
+    """Compares without building full-frame masks of the new components."""
+    if len(new) != len(legacy):
+        return False
+    for x, y in zip(new, legacy):
+        if (x['area'] != y['area'] or tuple(map(int, x['bbox'])) != tuple(map(int, y['bbox']))
+                or tuple(x['centroid']) != tuple(y['centroid'])):
+            return False
+        # Same pixels inside the bbox window and none outside it
+        if not np.array_equal(y['mask'][x['slice']] > 0, x['local_mask']) or y['mask'].sum() != x['area']:
+            return False
+        if not np.array_equal(x['coords'], y['coords']):
+            return False
+    return True
+
+
+def time_per_frame(fn, masks, repeats):
+    best = float('inf')
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        for mask in masks:
+            fn(mask)
+        best = min(best, time.perf_counter() - t0)
+    return best / len(masks) * 1000.0
+
+
+def label_frame(props):
+    def run(mask):
+        # One class at a time: the original holds a full-frame mask per component
+        for class_id in (1, 2, 3):
+            props((mask == class_id).astype(np.uint8))
+    return run
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark connected-component labeling for postprocessing')
+    parser.add_argument('--size', default='3840x2160', help='Mask size WxH (default: 3840x2160)')
+    parser.add_argument('--fragments', type=int, default=400, help='Noise fragments per frame')
+    parser.add_argument('--frames', type=int, default=4)
+    parser.add_argument('--repeats', type=int, default=3, help='Timed runs (best reported)')
+
+    args = parser.parse_args()
+
+    size = tuple(int(v) for v in args.size.split('x'))
+    rng = np.random.default_rng(0)
+    masks = [make_mask(rng, size, args.fragments) for _ in range(args.frames)]
+    counts = [len(connected_components_props((masks[0] == c).astype(np.uint8))) for c in (1, 2, 3)]
+    print(f"{args.frames} masks of {size[0]}x{size[1]}, components per class (bud, leaf, stem): {counts}\n")
+
+    match = all(
+        same_components(connected_components_props(binary), legacy_connected_components_props(binary))
+        for mask in masks
+        for binary in ((mask == class_id).astype(np.uint8) for class_id in (1, 2, 3))
+    )
+
+    legacy_label = time_per_frame(label_frame(legacy_connected_components_props), masks, args.repeats)
+    new_label = time_per_frame(label_frame(connected_components_props), masks, args.repeats)
+
+    new_filtered = [smart_postprocess(mask, mask.shape) for mask in masks]
+    new_pp = time_per_frame(lambda m: smart_postprocess(m, m.shape), masks, args.repeats)
+    postprocess_utils.connected_components_props = legacy_connected_components_props
+    try:
+        old_filtered = [smart_postprocess(mask, mask.shape) for mask in masks]
+        legacy_pp = time_per_frame(lambda m: smart_postprocess(m, m.shape), masks, args.repeats)
+    finally:
+        postprocess_utils.connected_components_props = connected_components_props
+    match = match and all(np.array_equal(a, b) for a, b in zip(new_filtered, old_filtered))
+
+    print(f"{'ms/frame':<14}{'scipy':>10}{'stats':>10}{'speed-up':>10}")
+    print(f"{'label':<14}{legacy_label:>10.1f}{new_label:>10.1f}{legacy_label / new_label:>9.2f}x")
+    print(f"{'postprocess':<14}{legacy_pp:>10.1f}{new_pp:>10.1f}{legacy_pp / new_pp:>9.2f}x")
+    print(f"\nIdentical components and filtered masks: {'yes' if match else 'NO'}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,110 @@
+"""Benchmark of the frame sources across sampling intervals.
+
+Creates synthetic videos (H.264 via ffmpeg with the requested GOP sizes,
+or OpenCV's mp4v writer when ffmpeg is missing) and times reading every
+N-th frame with each strategy from frame_sources.py:
+
+    legacy      seek before every sampled frame (previous behaviour)
+    seek        keyframe-aware seeking
+    sequential  grab() every frame, retrieve() the sampled ones
+    auto        what VideoSegmenter picks for this interval / GOP
+
+Frames returned by every strategy are checked against the legacy ones.
+
+Usage:
+    python benchmark_frame_sources.py
+    python benchmark_frame_sources.py --intervals 1 5 15 30 120 --gops 30 250 --seconds 30
+"""
+import argparse
+import hashlib
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+scripts_dir = Path(__file__).parent
+if str(scripts_dir) not in sys.path:
+    sys.path.insert(0, str(scripts_dir))
+
+from frame_sources import open_frame_source
+
+STRATEGIES = ("legacy", "seek", "sequential", "auto")
+
+
+def make_video(path, seconds, fps, gop, size=(1280, 720)):
+    """Write a synthetic test video; returns the path actually written."""
+    w, h = size
+    if shutil.which("ffmpeg"):
+        subprocess.run(
+            ["ffmpeg", "-y", "-v", "error", "-f", "lavfi",
+             "-i", f"testsrc2=size={w}x{h}:rate={fps}", "-t", str(seconds),
+             "-c:v", "libx264", "-pix_fmt", "yuv420p", "-g", str(gop), "-keyint_min", str(gop),
+             "-sc_threshold", "0", str(path)],
+            check=True,
+        )
+        return path
+
+    # Fallback: moving shapes + noise through OpenCV (codec GOP not controllable)
+    rng = np.random.default_rng(0)
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*"mp4v"), fps, (w, h))
+    for i in range(int(seconds * fps)):
+        frame = rng.integers(0, 40, (h, w, 3), dtype=np.uint8)
+        cv2.circle(frame, ((i * 7) % w, h // 2), 80, (0, 200, 0), -1)
+        cv2.putText(frame, str(i), (40, 80), cv2.FONT_HERSHEY_SIMPLEX, 2, (255, 255, 255), 3)
+        writer.write(frame)
+    writer.release()
+    return path
+
+
+def read_all(video, interval, strategy):
+    cap = cv2.VideoCapture(str(video))
+    total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    t0 = time.perf_counter()
+    source = open_frame_source(cap, total, interval, video, strategy)
+    digests = [(idx, hashlib.md5(frame.tobytes()).hexdigest()) for idx, frame in source]
+    elapsed = time.perf_counter() - t0
+    cap.release()
+    return digests, elapsed, source
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark sequential vs seeking frame sources')
+    parser.add_argument('--intervals', nargs='+', type=int, default=[1, 2, 5, 15, 30, 60, 120])
+    parser.add_argument('--gops', nargs='+', type=int, default=[30, 120, 250])
+    parser.add_argument('--seconds', type=float, default=20)
+    parser.add_argument('--fps', type=int, default=30)
+    parser.add_argument('--video', default=None, help='Benchmark an existing video instead')
+
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.video:
+            videos = [(Path(args.video), None)]
+        else:
+            videos = [(make_video(Path(tmp) / f"gop{g}.mp4", args.seconds, args.fps, g), g) for g in args.gops]
+            if not shutil.which("ffmpeg"):
+                print("⚠️  ffmpeg not found: using OpenCV mp4v videos, GOP settings are not applied\n")
+
+        for video, gop in videos:
+            print(f"=== {video.name}" + (f" (encoded GOP {gop})" if gop else "") + " ===")
+            print(f"{'interval':>9}" + "".join(f"{s + ' ms':>15}" for s in STRATEGIES) + f"{'auto ->':>20}  match")
+            for interval in args.intervals:
+                reference, _, _ = read_all(video, interval, "legacy")
+                line, match, picked = f"{interval:>9}", True, ""
+                for strategy in STRATEGIES:
+                    digests, elapsed, source = read_all(video, interval, strategy)
+                    match &= digests == reference
+                    line += f"{elapsed * 1000:>15.1f}"
+                    if strategy == "auto":
+                        picked = f"{source.strategy} (gop {source.gop_size})"
+                print(f"{line}{picked:>20}  {'yes' if match else 'NO'}")
+            print()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,117 @@
+"""Postprocessing at frame resolution vs at model resolution.
+
+The segmenter's 512x512 prediction of a synthetic 4K label mask (a tree
+plus leaf / bud fragments, see benchmark_connected_components.make_mask)
+is postprocessed both ways:
+
+    frame   resized to the frame size, smart_postprocess, crops
+    model   resized to model resolution (model_resolution.mask_shape),
+            smart_postprocess, crops with the mask upscaled inside the
+            class bboxes only
+
+and this reports per-frame milliseconds for the resize + postprocessing
+and for the crops, the per-class IoU of the kept pixels at frame
+resolution, and whether the lazily upscaled crops and pixel counts are
+exactly those of a full nearest-neighbour upscale of the filtered mask.
+
+Usage:
+    python benchmark_model_resolution.py
+    python benchmark_model_resolution.py --size 1920x1080 --frames 16 --crop-size 224
+"""
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+scripts_dir = Path(__file__).parent
+if str(scripts_dir) not in sys.path:
+    sys.path.insert(0, str(scripts_dir))
+
+from benchmark_connected_components import make_mask
+from crop_utils import CLASS_NAMES, save_frame_crops
+from model_resolution import mask_shape
+from postprocess_utils import smart_postprocess
+
+IMG_SIZE = 512
+
+
+def postprocess(pred, shape):
+    mask = cv2.resize(pred, (shape[1], shape[0]), interpolation=cv2.INTER_NEAREST)
+    return smart_postprocess(mask, mask.shape)
+
+
+def crops(frame_rgb, filtered, frames_dir, frame_idx, crop_size):
+    return save_frame_crops(frame_rgb, filtered, Path(frames_dir) / f"frame_{frame_idx:06d}", frame_idx,
+                            crop_size=crop_size)
+
+
+def best_ms(fn, repeats):
+    best = float('inf')
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - t0)
+    return best * 1000.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark postprocessing at model resolution')
+    parser.add_argument('--size', default='3840x2160', help='Frame size WxH (default: 3840x2160)')
+    parser.add_argument('--frames', type=int, default=8)
+    parser.add_argument('--fragments', type=int, default=400, help='Noise fragments per frame')
+    parser.add_argument('--crop-size', type=int, default=224)
+    parser.add_argument('--repeats', type=int, default=3, help='Timed runs (best reported)')
+
+    args = parser.parse_args()
+
+    size = tuple(int(v) for v in args.size.split('x'))
+    rng = np.random.default_rng(0)
+    items = []
+    for _ in range(args.frames):
+        frame_rgb = rng.integers(0, 255, (size[1], size[0], 3), dtype=np.uint8)
+        mask = make_mask(rng, size, args.fragments)
+        pred = cv2.resize(mask, (IMG_SIZE, IMG_SIZE), interpolation=cv2.INTER_NEAREST)
+        items.append((frame_rgb, pred))
+    frame_shape = items[0][0].shape[:2]
+    shape = mask_shape(frame_shape)
+    print(f"{args.frames} frames of {size[0]}x{size[1]}, model-resolution masks {shape[1]}x{shape[0]}\n")
+
+    timings = {}
+    inter = dict.fromkeys(CLASS_NAMES, 0)
+    union = dict.fromkeys(CLASS_NAMES, 0)
+    exact = True
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, target in (("frame", frame_shape), ("model", shape)):
+            pp = sum(best_ms(lambda: postprocess(pred, target), args.repeats) for _, pred in items)
+            filtered = [postprocess(pred, target) for _, pred in items]
+            cr = sum(best_ms(lambda: crops(frame_rgb, f, tmp, i, args.crop_size), args.repeats)
+                     for i, ((frame_rgb, _), f) in enumerate(zip(items, filtered)))
+            timings[name] = (pp / args.frames, cr / args.frames, filtered)
+
+        for i, ((frame_rgb, _), full, small) in enumerate(zip(items, timings["frame"][2], timings["model"][2])):
+            upscaled = cv2.resize(small, (frame_shape[1], frame_shape[0]), interpolation=cv2.INTER_NEAREST)
+            for class_id in CLASS_NAMES:
+                a, b = full == class_id, upscaled == class_id
+                inter[class_id] += int(np.count_nonzero(a & b))
+                union[class_id] += int(np.count_nonzero(a | b))
+            # Lazy upscale inside the crop bboxes == full upscale, then crops
+            lazy, lazy_crops = crops(frame_rgb, small, Path(tmp) / "lazy", i, args.crop_size)
+            eager, eager_crops = crops(frame_rgb, upscaled, Path(tmp) / "eager", i, args.crop_size)
+            exact = exact and lazy["class_stats"] == eager["class_stats"] and all(
+                np.array_equal(x[1], y[1]) for x, y in zip(lazy_crops, eager_crops))
+
+    print(f"{'ms/frame':<14}{'frame':>10}{'model':>10}{'speed-up':>10}")
+    for row, k in (("postprocess", 0), ("crops", 1)):
+        a, b = timings["frame"][k], timings["model"][k]
+        print(f"{row:<14}{a:>10.1f}{b:>10.1f}{a / b:>9.2f}x")
+    print("\nIoU of kept pixels at frame resolution: " + ", ".join(
+        f"{CLASS_NAMES[c]} {inter[c] / union[c]:.4f}" if union[c] else f"{CLASS_NAMES[c]} -" for c in CLASS_NAMES))
+    print(f"Lazy crops identical to a full upscale: {'yes' if exact else 'NO'}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,123 @@
+"""Scaling of shared-memory process-pool postprocessing on 4K frames.
+
+Runs smart_postprocess + class crop saving for synthetic 3840x2160 frames
+(a tree with stem, crown leaves and buds plus clutter components) in the
+calling thread, then through shm_pool.PostprocessPool with 1..N workers,
+and reports frames/s and speed-up. Filtered masks and crop stats from the
+pool are checked against the in-process results.
+
+Usage:
+    python benchmark_postprocess_pool.py
+    python benchmark_postprocess_pool.py --workers 1 2 4 8 16 --frames 64 --no-save
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+scripts_dir = Path(__file__).parent
+if str(scripts_dir) not in sys.path:
+    sys.path.insert(0, str(scripts_dir))
+
+from crop_utils import save_frame_crops
+from postprocess_utils import smart_postprocess
+from shm_pool import PostprocessPool
+
+
+def make_frame(rng, size=(3840, 2160)):
+    """Synthetic RGB frame and raw label mask (0=bg, 1=bud, 2=leaf, 3=stem)."""
+    w, h = size
+    frame = rng.integers(0, 255, (h, w, 3), dtype=np.uint8)
+    mask = np.zeros((h, w), dtype=np.uint8)
+
+    # Main tree: stem from the bottom up to a crown of leaves with buds
+    cx = w // 2 + int(rng.integers(-w // 10, w // 10))
+    top = h // 4
+    cv2.rectangle(mask, (cx - w // 60, top), (cx + w // 60, h - 1), 3, -1)
+    for _ in range(12):
+        angle = rng.uniform(0, np.pi)
+        end = (int(cx + np.cos(angle) * w / 5), int(top - np.sin(angle) * h / 6 + h / 12))
+        cv2.line(mask, (cx, top), end, 2, thickness=max(4, h // 80))
+    for _ in range(4):
+        cv2.circle(mask, (cx + int(rng.integers(-w // 40, w // 40)), top + h // 40), h // 60, 1, -1)
+
+    # Clutter: neighbouring stems and stray leaf / bud blobs
+    for _ in range(3):
+        x = int(rng.integers(0, w))
+        cv2.rectangle(mask, (x, int(rng.integers(h // 3, h // 2))), (x + w // 120, h - 1), 3, -1)
+    for _ in range(40):
+        center = (int(rng.integers(0, w)), int(rng.integers(0, h)))
+        cv2.circle(mask, center, int(rng.integers(5, h // 40)), int(rng.integers(1, 3)), -1)
+    return frame, mask
+
+
+def run_inline(items, save):
+    out = []
+    for frame_idx, frame_rgb, raw_pred in items:
+        filtered, _ = smart_postprocess(raw_pred, frame_rgb.shape, debug=True)
+        stats = None
+        if save is not None:
+            frames_dir, crop_size, pad_bg, _ = save
+            frame_results, _ = save_frame_crops(
+                frame_rgb, filtered, Path(frames_dir) / f"frame_{frame_idx:06d}", frame_idx,
+                crop_size=crop_size, pad_bg=pad_bg,
+            )
+            stats = frame_results["class_stats"]
+        out.append((filtered, stats))
+    return out
+
+
+def run_pool(pool, items, save):
+    out = []
+    for _, _, filtered, _, _, saved in pool.imap(items, save=save):
+        out.append((filtered, saved[0]["class_stats"] if saved else None))
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark process-pool postprocessing on 4K frames')
+    parser.add_argument('--workers', nargs='+', type=int, default=None,
+                        help='Worker counts (default: 1 2 4 ... up to the CPU count)')
+    parser.add_argument('--frames', type=int, default=48)
+    parser.add_argument('--distinct', type=int, default=8, help='Distinct synthetic frames (cycled)')
+    parser.add_argument('--crop-size', type=int, default=224)
+    parser.add_argument('--no-save', action='store_true', help='Postprocess only, no crop saving')
+
+    args = parser.parse_args()
+
+    cpus = os.cpu_count() or 1
+    workers = args.workers or sorted({1, *[2 ** k for k in range(1, cpus.bit_length()) if 2 ** k <= cpus], cpus})
+
+    rng = np.random.default_rng(0)
+    distinct = [make_frame(rng) for _ in range(args.distinct)]
+    items = [(i, *distinct[i % len(distinct)]) for i in range(args.frames)]
+    h, w = items[0][2].shape
+    print(f"{args.frames} frames of {w}x{h}, crop saving {'off' if args.no_save else 'on'}, {cpus} CPUs\n")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        save = None if args.no_save else (Path(tmp), args.crop_size, (255, 255, 255), False)
+
+        t0 = time.perf_counter()
+        reference = run_inline(items, save)
+        inline_seconds = time.perf_counter() - t0
+        print(f"{'mode':>12}{'frames/s':>12}{'speed-up':>12}  match")
+        print(f"{'inline':>12}{args.frames / inline_seconds:>12.2f}{1.0:>12.2f}  -")
+
+        for n in workers:
+            with PostprocessPool(n) as pool:
+                run_pool(pool, items[:n], save)  # warm-up: start workers, attach the ring
+                t0 = time.perf_counter()
+                results = run_pool(pool, items, save)
+                elapsed = time.perf_counter() - t0
+            match = all(np.array_equal(a[0], b[0]) and a[1] == b[1] for a, b in zip(results, reference))
+            print(f"{f'{n} workers':>12}{args.frames / elapsed:>12.2f}{inline_seconds / elapsed:>12.2f}  "
+                  f"{'yes' if match else 'NO'}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,163 @@
+"""Per-frame latency and IoU parity of the segmenter runtimes.
+
+Every runtime is compared with the original fp32 eager model run one frame
+at a time. For each runtime / batch size the report shows per-frame
+latency, speed-up, per-class IoU (bud / leaf / stem) of the predicted
+masks against the reference, and pixel agreement. Append "-bf16" to a
+torch runtime to run it under bf16 autocast.
+
+Usage:
+    python benchmark_segmenter.py --video ../uploads/videos/tree.mp4
+    python benchmark_segmenter.py --frames ./frames_dir --runtimes optimized torchscript onnx \
+        --batch-sizes 1 4 8 --json segmenter_bench.json
+"""
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+import torch
+
+scripts_dir = Path(__file__).parent
+if str(scripts_dir) not in sys.path:
+    sys.path.insert(0, str(scripts_dir))
+
+from predict_video import CLASSES, IMG_SIZE, MODEL_DIR, load_segmentation_model
+from segmenter_runtime import RUNTIMES, build_segmenter_runtime, cpu_supports_bf16
+
+IMAGE_EXTENSIONS = {".png", ".jpg", ".jpeg"}
+
+
+def load_frames(video=None, frames_dir=None, samples=32):
+    """``samples`` RGB frames resized to the model input, evenly spread over the video."""
+    frames = []
+    if video:
+        cap = cv2.VideoCapture(str(video))
+        total = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        for idx in np.linspace(0, max(total - 1, 0), samples).astype(int):
+            cap.set(cv2.CAP_PROP_POS_FRAMES, int(idx))
+            ret, frame_bgr = cap.read()
+            if ret:
+                frames.append(cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2RGB))
+        cap.release()
+    else:
+        files = sorted(p for p in Path(frames_dir).rglob("*") if p.suffix.lower() in IMAGE_EXTENSIONS)
+        for path in files[:samples]:
+            frame_bgr = cv2.imread(str(path))
+            if frame_bgr is not None:
+                frames.append(cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2RGB))
+
+    if not frames:
+        raise ValueError("No frames could be read")
+    return np.stack([cv2.resize(f, (IMG_SIZE, IMG_SIZE)) for f in frames])
+
+
+def run(runtime, frames, batch_size):
+    """Masks for all frames and median seconds per frame over the batches."""
+    runtime(frames[:batch_size])  # warm-up (allocation, tracing)
+    masks, per_frame = [], []
+    for i in range(0, len(frames), batch_size):
+        batch = frames[i:i + batch_size]
+        t0 = time.perf_counter()
+        masks.append(runtime(batch))
+        per_frame.append((time.perf_counter() - t0) / len(batch))
+    return np.concatenate(masks), float(np.median(per_frame))
+
+
+def mask_iou(reference, candidate):
+    """Per-class IoU over all frames (None if the class never appears)."""
+    ious = {}
+    for class_id in (1, 2, 3):
+        ref, cand = reference == class_id, candidate == class_id
+        union = np.logical_or(ref, cand).sum()
+        ious[CLASSES[class_id]["name"]] = float(np.logical_and(ref, cand).sum() / union) if union else None
+    return ious
+
+
+def benchmark(model_path, frames, runtimes, batch_sizes, threads=None):
+    if threads:
+        torch.set_num_threads(threads)
+    device = torch.device("cpu")
+
+    reference_model = load_segmentation_model(model_path, device)
+    reference, ref_latency = run(build_segmenter_runtime(reference_model, "eager", IMG_SIZE), frames, 1)
+    del reference_model
+
+    rows = [{"runtime": "eager", "bf16": False, "batch_size": 1,
+             "ms_per_frame": ref_latency * 1000.0, "speedup": 1.0,
+             "iou": mask_iou(reference, reference), "pixel_agreement": 1.0}]
+
+    for spec in runtimes:
+        name, _, suffix = spec.partition("-")
+        bf16 = suffix == "bf16"
+        for batch_size in batch_sizes:
+            # Fresh fp32 model per run: the torch runtimes convert it in place
+            model = load_segmentation_model(model_path, device)
+            try:
+                runtime = build_segmenter_runtime(model, name, IMG_SIZE, bf16=bf16)
+                masks, latency = run(runtime, frames, batch_size)
+            except Exception as e:
+                print(f"❌ {spec} (batch {batch_size}) failed: {e}")
+                continue
+            rows.append({
+                "runtime": name,
+                "bf16": bool(getattr(runtime, "bf16", False)),
+                "batch_size": batch_size,
+                "ms_per_frame": latency * 1000.0,
+                "speedup": ref_latency / latency,
+                "iou": mask_iou(reference, masks),
+                "pixel_agreement": float((reference == masks).mean()),
+            })
+
+    return rows
+
+
+def print_rows(rows):
+    names = [CLASSES[c]["name"] for c in (1, 2, 3)]
+    header = f"{'runtime':<14}{'bf16':>6}{'batch':>7}{'ms/frame':>10}{'speedup':>9}"
+    header += "".join(f"{'IoU ' + n:>11}" for n in names) + f"{'pixels':>9}"
+    print(header)
+    for row in rows:
+        line = (f"{row['runtime']:<14}{'yes' if row['bf16'] else 'no':>6}{row['batch_size']:>7}"
+                f"{row['ms_per_frame']:>10.1f}{row['speedup']:>8.2f}x")
+        for n in names:
+            iou = row["iou"][n]
+            line += f"{'-' if iou is None else f'{iou:.4f}':>11}"
+        line += f"{row['pixel_agreement'] * 100:>8.2f}%"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Segmenter runtime latency and IoU parity benchmark')
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument('--video', help='Video to sample frames from')
+    source.add_argument('--frames', help='Directory with frame images')
+    parser.add_argument('--model', default=str(MODEL_DIR / "coconut_best_dice.pth"), help='UNet++ checkpoint')
+    parser.add_argument('--samples', type=int, default=32, help='Frames to evaluate (default: 32)')
+    parser.add_argument('--runtimes', nargs='+', default=['optimized', 'torchscript', 'onnx'],
+                        help=f'Runtimes to compare: {", ".join(RUNTIMES)} (append -bf16 for torch runtimes)')
+    parser.add_argument('--batch-sizes', nargs='+', type=int, default=[1, 4])
+    parser.add_argument('--threads', type=int, default=None, help='torch intra-op threads')
+    parser.add_argument('--json', default=None, help='Also write the results to this JSON file')
+
+    args = parser.parse_args()
+
+    frames = load_frames(args.video, args.frames, args.samples)
+    print(f"Frames: {len(frames)} @ {IMG_SIZE}x{IMG_SIZE} | torch threads: {torch.get_num_threads()} | "
+          f"native bf16: {cpu_supports_bf16()}\n")
+
+    rows = benchmark(args.model, frames, args.runtimes, args.batch_sizes, args.threads)
+    print()
+    print_rows(rows)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(rows, f, indent=2)
+        print(f"\n✅ Results written to {args.json}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,164 @@
+"""Parity and latency report: quantized classifier vs the Keras reference.
+
+Runs the Keras model and one or more candidate models (TFLite / ONNX,
+fp32 or int8) on the same crops and reports, per labels.json class of the
+reference prediction:
+
+    n           crops whose reference top-1 is this class
+    agree       top-1 agreement with the reference
+    mean |dp|   mean absolute probability difference over all classes
+
+plus batch-1 and batch-32 latency for every model.
+
+Usage:
+    python classifier_parity.py --crops ../results \
+        --candidates ../plant_disease_transfer_model_int8.tflite ../plant_disease_transfer_model_int8.onnx
+    python classifier_parity.py --crops ../results --candidates ... --json parity.json
+"""
+import argparse
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+# Ensure project root (containing test_transfer_model.py) is on sys.path
+project_root = Path(__file__).resolve().parents[1]
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+from test_transfer_model import DEFAULT_BATCH_SIZE, find_model_path, load_backend, load_labels
+from quantize_transfer_model import find_crop_files, load_calibration_batches
+
+DEFAULT_LABELS = project_root / "labels.json"
+
+# Timed calls per batch size (median reported)
+LATENCY_CALLS = 20
+
+
+def run_model(backend, batch):
+    """Probabilities for ``batch`` in chunks of DEFAULT_BATCH_SIZE."""
+    return np.concatenate([
+        np.asarray(backend(batch[i:i + DEFAULT_BATCH_SIZE]), dtype=np.float32)
+        for i in range(0, len(batch), DEFAULT_BATCH_SIZE)
+    ])
+
+
+def measure_latency(backend, batch, batch_size):
+    """Median milliseconds per call for ``batch_size`` crops."""
+    x = np.resize(batch, (batch_size,) + batch.shape[1:]).astype(np.float32)
+    backend(x)  # warm-up (allocation, tracing)
+    times = []
+    for _ in range(LATENCY_CALLS):
+        t0 = time.perf_counter()
+        backend(x)
+        times.append(time.perf_counter() - t0)
+    return statistics.median(times) * 1000.0
+
+
+def compare(reference_probs, candidate_probs, index_to_class):
+    """Per-class (of the reference top-1) agreement and probability drift."""
+    ref_top = reference_probs.argmax(axis=1)
+    cand_top = candidate_probs.argmax(axis=1)
+    abs_diff = np.abs(reference_probs - candidate_probs).mean(axis=1)
+
+    per_class = {}
+    for idx, name in sorted(index_to_class.items()):
+        sel = ref_top == idx
+        n = int(sel.sum())
+        per_class[name] = {
+            "n": n,
+            "agreement": float((cand_top[sel] == idx).mean()) if n else None,
+            "mean_abs_prob_diff": float(abs_diff[sel].mean()) if n else None,
+        }
+
+    return {
+        "agreement": float((ref_top == cand_top).mean()),
+        "mean_abs_prob_diff": float(abs_diff.mean()),
+        "max_abs_prob_diff": float(np.abs(reference_probs - candidate_probs).max()),
+        "per_class": per_class,
+    }
+
+
+def parity_report(crops_dir, candidates, reference=None, labels_path=DEFAULT_LABELS, samples=None):
+    index_to_class = load_labels(str(labels_path))
+    num_classes = len(index_to_class)
+
+    files = find_crop_files(crops_dir, samples)
+    if not files:
+        raise FileNotFoundError(f"No crops found under {crops_dir}")
+    batch = np.concatenate(list(load_calibration_batches(files)))
+    print(f"Loaded {len(batch)} crops from {crops_dir}")
+
+    reference = reference or find_model_path(str(project_root), "keras")
+    ref_backend = load_backend(str(reference), num_classes, "keras")
+    ref_probs = run_model(ref_backend, batch)
+
+    report = {
+        "crops": len(batch),
+        "reference": {
+            "model": str(reference),
+            "latency_ms_b1": measure_latency(ref_backend, batch, 1),
+            f"latency_ms_b{DEFAULT_BATCH_SIZE}": measure_latency(ref_backend, batch, DEFAULT_BATCH_SIZE),
+        },
+        "candidates": [],
+    }
+
+    for path in candidates:
+        backend = load_backend(str(path), num_classes, "auto")
+        entry = {
+            "model": str(path),
+            "backend": backend.name,
+            "size_mb": Path(path).stat().st_size / 1e6,
+            "latency_ms_b1": measure_latency(backend, batch, 1),
+            f"latency_ms_b{DEFAULT_BATCH_SIZE}": measure_latency(backend, batch, DEFAULT_BATCH_SIZE),
+        }
+        entry.update(compare(ref_probs, run_model(backend, batch), index_to_class))
+        report["candidates"].append(entry)
+
+    return report
+
+
+def print_report(report):
+    ref = report["reference"]
+    big = f"latency_ms_b{DEFAULT_BATCH_SIZE}"
+    print(f"\nReference {Path(ref['model']).name}: "
+          f"b1 {ref['latency_ms_b1']:.1f} ms, b{DEFAULT_BATCH_SIZE} {ref[big]:.1f} ms")
+
+    for cand in report["candidates"]:
+        print(f"\n=== {Path(cand['model']).name} ({cand['backend']}, {cand['size_mb']:.1f} MB) ===")
+        print(f"b1 {cand['latency_ms_b1']:.1f} ms, b{DEFAULT_BATCH_SIZE} {cand[big]:.1f} ms | "
+              f"top-1 agreement {cand['agreement'] * 100:.2f}% | "
+              f"mean |dp| {cand['mean_abs_prob_diff']:.4f} | max |dp| {cand['max_abs_prob_diff']:.4f}")
+        print(f"{'class':<40}{'n':>6}{'agree':>10}{'mean |dp|':>12}")
+        for name, row in cand["per_class"].items():
+            if not row["n"]:
+                continue
+            print(f"{name:<40}{row['n']:>6}{row['agreement'] * 100:>9.1f}%{row['mean_abs_prob_diff']:>12.4f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare quantized classifier backends with the Keras model')
+    parser.add_argument('--crops', required=True, help='Directory with crops (e.g. predict_video results)')
+    parser.add_argument('--candidates', nargs='+', required=True, help='.tflite / .onnx models to compare')
+    parser.add_argument('--reference', default=None, help='Keras model (default: .keras/.h5 next to the script)')
+    parser.add_argument('--labels', default=str(DEFAULT_LABELS), help='Path to labels.json')
+    parser.add_argument('--samples', type=int, default=None, help='Max crops to evaluate (default: all)')
+    parser.add_argument('--json', default=None, help='Also write the report to this JSON file')
+
+    args = parser.parse_args()
+
+    report = parity_report(args.crops, args.candidates, reference=args.reference,
+                           labels_path=args.labels, samples=args.samples)
+    print_report(report)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\n✅ Report written to {args.json}")
+
+
+if __name__ == '__main__':
+    main()
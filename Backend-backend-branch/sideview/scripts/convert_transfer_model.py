@@ -0,0 +1,69 @@
+"""Convert the transfer model weights (.h5) to a serialized full model.
+
+The .h5 file only stores weights, so loading it means rebuilding
+MobileNetV2 first. A full-model file (.keras or SavedModel directory)
+loads directly, with no ImageNet weight download and no rebuild.
+
+Usage:
+    python convert_transfer_model.py
+    python convert_transfer_model.py --format savedmodel
+    python convert_transfer_model.py --input ../plant_disease_transfer_model.h5 \
+        --output ../plant_disease_transfer_model.keras
+"""
+import argparse
+import sys
+from pathlib import Path
+
+# Ensure project root (containing test_transfer_model.py) is on sys.path
+project_root = Path(__file__).resolve().parents[1]
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+from test_transfer_model import build_model, load_labels
+
+DEFAULT_INPUT = project_root / "plant_disease_transfer_model.h5"
+DEFAULT_LABELS = project_root / "labels.json"
+DEFAULT_OUTPUTS = {
+    "keras": project_root / "plant_disease_transfer_model.keras",
+    "savedmodel": project_root / "plant_disease_transfer_model_savedmodel",
+}
+
+
+def convert(input_path, output_path, labels_path=DEFAULT_LABELS, fmt="keras"):
+    """Rebuild the architecture, load the .h5 weights and save a full model."""
+    input_path = Path(input_path)
+    output_path = Path(output_path)
+    if not input_path.exists():
+        raise FileNotFoundError(f"Weights not found: {input_path}")
+
+    num_classes = len(load_labels(str(labels_path)))
+    model = build_model(num_classes, weights=None)
+    model.load_weights(str(input_path))
+
+    if fmt == "keras":
+        model.save(str(output_path))
+    elif fmt == "savedmodel":
+        model.export(str(output_path))
+    else:
+        raise ValueError(f"Unknown format: {fmt}")
+
+    print(f"✅ Saved {fmt} model: {output_path}")
+    return output_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Convert transfer model .h5 weights to a full model')
+    parser.add_argument('--input', default=str(DEFAULT_INPUT), help='Path to .h5 weights')
+    parser.add_argument('--labels', default=str(DEFAULT_LABELS), help='Path to labels.json')
+    parser.add_argument('--format', choices=sorted(DEFAULT_OUTPUTS), default='keras',
+                        help='Output format (default: keras)')
+    parser.add_argument('--output', help='Output path (default: next to the .h5 file)')
+
+    args = parser.parse_args()
+
+    output = args.output or DEFAULT_OUTPUTS[args.format]
+    convert(args.input, output, labels_path=args.labels, fmt=args.format)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,248 @@
+"""
+Class crop extraction for segmented video frames.
+
+Plain NumPy / OpenCV / PIL helpers (no torch), so they can run in the
+postprocessing worker processes of shm_pool.py as well as in
+VideoSegmenter.
+
+For every class present in a frame's label mask this writes:
+    <class>/<class>.png                          transparent bbox crop (RGBA)
+    <class>/<class>_frame<idx>_full.png          bbox crop on its background (RGB)
+    <class>/<class>_frame<idx>_pad_<N>px.png     optional centered N x N crop
+
+When the mask comes from a downscaled analysis proxy (analysis_proxy.py),
+the full and padded crops (the ones classified) are cut from the
+full-resolution frame at the bbox scaled back up. A mask at lower
+resolution than the frame (model_resolution.py) is upscaled only inside
+each class's padded bbox.
+"""
+
+import cv2
+import numpy as np
+from PIL import Image
+
+# Label ids of the segmenter (see predict_video.CLASSES)
+CLASS_NAMES = {1: "bud", 2: "leaf", 3: "stem"}
+
+# Image quality settings
+PNG_COMPRESSION = 0  # Lossless
+
+# Padding around the class bbox (pixels)
+BBOX_PAD = 10
+
+
+def mask_bbox(pred_mask, class_id):
+    """(xmin, ymin, xmax, ymax) of ``class_id`` in the label mask, or None."""
+    coords = np.where(pred_mask == class_id)
+    if len(coords[0]) == 0:
+        return None
+
+    ymin, ymax = coords[0].min(), coords[0].max()
+    xmin, xmax = coords[1].min(), coords[1].max()
+
+    return (xmin, ymin, xmax, ymax)
+
+
+def extract_with_transparency(img_rgb, mask):
+    """Extract image region with transparent background"""
+    h, w = img_rgb.shape[:2]
+    rgba = np.zeros((h, w, 4), dtype=np.uint8)
+    rgba[:, :, :3] = img_rgb
+    rgba[:, :, 3] = mask * 255
+    return rgba
+
+
+def padded_bbox(mask):
+    """(y_min, y_max, x_min, x_max) slice bounds of the mask plus BBOX_PAD, or None."""
+    coords = np.where(mask > 0)
+    if len(coords[0]) == 0:
+        return None
+
+    y_min, y_max = coords[0].min(), coords[0].max()
+    x_min, x_max = coords[1].min(), coords[1].max()
+
+    y_min = max(0, y_min - BBOX_PAD)
+    y_max = min(mask.shape[0], y_max + BBOX_PAD)
+    x_min = max(0, x_min - BBOX_PAD)
+    x_max = min(mask.shape[1], x_max + BBOX_PAD)
+    return y_min, y_max, x_min, x_max
+
+
+def crop_to_bbox(rgba_img, mask):
+    """Crop to bounding box"""
+    bbox = padded_bbox(mask)
+    if bbox is None:
+        return None
+    y_min, y_max, x_min, x_max = bbox
+    return rgba_img[y_min:y_max, x_min:x_max]
+
+
+def scale_bbox(bbox, from_shape, to_shape):
+    """Map slice bounds from an image of ``from_shape`` to one of ``to_shape`` (outward rounding)."""
+    y_min, y_max, x_min, x_max = bbox
+    sy = to_shape[0] / from_shape[0]
+    sx = to_shape[1] / from_shape[1]
+    return (
+        max(0, int(np.floor(y_min * sy))),
+        min(to_shape[0], int(np.ceil(y_max * sy))),
+        max(0, int(np.floor(x_min * sx))),
+        min(to_shape[1], int(np.ceil(x_max * sx))),
+    )
+
+
+def upscale_nearest(mask, bounds, to_shape):
+    """
+    Window (y_min, y_max, x_min, x_max) of ``mask`` resized to an image of
+    ``to_shape``, as cv2.resize(..., interpolation=cv2.INTER_NEAREST) of
+    the whole mask would give it.
+    """
+    y_min, y_max, x_min, x_max = bounds
+    h, w = mask.shape[:2]
+    # cv2: source index = floor(dst index / scale), scale = dst / src
+    rows = np.minimum(np.floor(np.arange(y_min, y_max) * (1.0 / (to_shape[0] / h))).astype(np.intp), h - 1)
+    cols = np.minimum(np.floor(np.arange(x_min, x_max) * (1.0 / (to_shape[1] / w))).astype(np.intp), w - 1)
+    return mask[rows[:, None], cols]
+
+
+def class_mask_window(pred_mask, class_id, frame_shape):
+    """
+    Binary uint8 mask of ``class_id`` at the resolution of ``frame_shape``
+    over its padded bbox, with the (y_min, y_max, x_min, x_max) bounds of
+    that window in the frame, or None if the class is absent. A
+    lower-resolution ``pred_mask`` is only upscaled inside the window.
+    """
+    if pred_mask.shape[:2] == tuple(frame_shape[:2]):
+        class_mask = (pred_mask == class_id).astype(np.uint8)
+        bounds = padded_bbox(class_mask)
+        if bounds is None:
+            return None
+        y_min, y_max, x_min, x_max = bounds
+        return class_mask[y_min:y_max, x_min:x_max], bounds
+
+    bbox = mask_bbox(pred_mask, class_id)
+    if bbox is None:
+        return None
+    # Frame pixels whose nearest mask pixel lies in the class bbox
+    xmin, ymin, xmax, ymax = bbox
+    y0, y1, x0, x1 = scale_bbox((ymin, ymax + 1, xmin, xmax + 1), pred_mask.shape, frame_shape)
+    local = upscale_nearest(pred_mask, (y0, y1, x0, x1), frame_shape) == class_id
+    rows = np.flatnonzero(local.any(axis=1))
+    cols = np.flatnonzero(local.any(axis=0))
+    local = local[rows[0]:rows[-1] + 1, cols[0]:cols[-1] + 1]
+    y0, x0 = y0 + rows[0], x0 + cols[0]
+
+    # Same padding as padded_bbox on the full-resolution mask
+    h, w = frame_shape[:2]
+    y_min, x_min = max(0, y0 - BBOX_PAD), max(0, x0 - BBOX_PAD)
+    y_max = min(h, y0 + local.shape[0] - 1 + BBOX_PAD)
+    x_max = min(w, x0 + local.shape[1] - 1 + BBOX_PAD)
+    class_mask = np.zeros((y_max - y_min, x_max - x_min), dtype=np.uint8)
+    class_mask[y0 - y_min:y0 - y_min + local.shape[0], x0 - x_min:x0 - x_min + local.shape[1]] = local
+    return class_mask, (y_min, y_max, x_min, x_max)
+
+
+def pad_to_square(rgb_crop, crop_size, pad_bg=(255, 255, 255)):
+    """Fit ``rgb_crop`` (aspect preserved, never upscaled) centered in a crop_size x crop_size image."""
+    ch_h, ch_w = rgb_crop.shape[0], rgb_crop.shape[1]
+
+    # Resize to fit within crop_size while preserving aspect ratio
+    scale = min(crop_size / max(ch_w, ch_h), 1.0)
+    if scale < 1.0:
+        new_w = int(ch_w * scale)
+        new_h = int(ch_h * scale)
+        resized = cv2.resize(rgb_crop, (new_w, new_h), interpolation=cv2.INTER_AREA)
+    else:
+        resized = rgb_crop
+        new_h, new_w = ch_h, ch_w
+
+    # Build background
+    if isinstance(pad_bg, int):
+        bg_color = (pad_bg, pad_bg, pad_bg)
+    else:
+        bg_color = tuple(int(x) for x in pad_bg)
+
+    pad_img = np.zeros((crop_size, crop_size, 3), dtype=np.uint8)
+    pad_img[:, :] = bg_color
+
+    x_off = (crop_size - new_w) // 2
+    y_off = (crop_size - new_h) // 2
+    pad_img[y_off:y_off+new_h, x_off:x_off+new_w] = resized
+    return pad_img
+
+
+def save_rgba_lossless(img_rgba, path):
+    """Save RGBA image as lossless PNG"""
+    img_pil = Image.fromarray(img_rgba, 'RGBA')
+    img_pil.save(str(path), 'PNG', compress_level=PNG_COMPRESSION)
+
+
+def save_frame_crops(frame_rgb, pred_mask, frame_dir, frame_idx, crop_size=0, pad_bg=(255, 255, 255),
+                     full_frame=None):
+    """
+    Save the class crops of one frame.
+
+    ``full_frame`` is the full-resolution RGB frame when ``frame_rgb`` and
+    ``pred_mask`` come from a downscaled proxy; the full and padded crops
+    are then cut from it. ``pred_mask`` may be smaller than ``frame_rgb``
+    (model-resolution postprocessing); crops and pixel counts are then
+    those of the mask upscaled to the frame (nearest neighbour).
+
+    Returns (results, crops): the per-frame summary (classes found, pixel
+    stats, written files) and a list of (class_name, rgb_full, path) for
+    every full RGB crop written.
+    """
+    results = {
+        "frame_index": frame_idx,
+        "classes_found": [],
+        "class_stats": {}
+    }
+    crops = []
+
+    total_pixels = frame_rgb.shape[0] * frame_rgb.shape[1]
+
+    for class_id, class_name in CLASS_NAMES.items():
+        window = class_mask_window(pred_mask, class_id, frame_rgb.shape)
+        if window is None:
+            continue
+        class_mask, bounds = window
+        pixel_count = np.sum(class_mask)
+
+        results["classes_found"].append(class_name)
+        results["class_stats"][class_name] = {
+            "pixel_count": int(pixel_count),
+            "percentage": round(pixel_count / total_pixels * 100, 2)
+        }
+
+        # Create class folder
+        class_dir = frame_dir / class_name
+        class_dir.mkdir(parents=True, exist_ok=True)
+
+        # Save cropped (transparent) - bbox only to save space
+        y_min, y_max, x_min, x_max = bounds
+        bbox_crop = extract_with_transparency(frame_rgb[y_min:y_max, x_min:x_max], class_mask)
+
+        save_rgba_lossless(bbox_crop, class_dir / f"{class_name}.png")
+        if full_frame is not None:
+            y_min, y_max, x_min, x_max = scale_bbox(bounds, frame_rgb.shape, full_frame.shape)
+            rgb_full = full_frame[y_min:y_max, x_min:x_max]
+        else:
+            rgb_full = bbox_crop[:, :, :3]
+
+        # Also optionally save fixed-size centered padded crop (RGB)
+        if crop_size and crop_size > 0:
+            pad_img = pad_to_square(rgb_full, crop_size, pad_bg)
+            padded_path = class_dir / f"{class_name}_frame{frame_idx:06d}_pad_{crop_size}px.png"
+            Image.fromarray(pad_img).save(str(padded_path), 'PNG', compress_level=PNG_COMPRESSION)
+            results.setdefault('padded_files', {}).setdefault(class_name, []).append(str(padded_path))
+
+        # Also save a full RGB crop (original bbox size) with background (no transparency)
+        try:
+            full_path = class_dir / f"{class_name}_frame{frame_idx:06d}_full.png"
+            Image.fromarray(rgb_full).save(str(full_path), 'PNG', compress_level=PNG_COMPRESSION)
+            results.setdefault('full_files', {}).setdefault(class_name, []).append(str(full_path))
+        except Exception:
+            continue
+
+        crops.append((class_name, rgb_full, str(full_path)))
+
+    return results, crops
@@ -0,0 +1,77 @@
+"""
+Perceptual-hash deduplication of sampled video frames.
+
+Hover segments of drone footage produce long runs of visually identical
+frames. Every sampled frame gets a 64-bit difference hash (dHash) of a
+9x8 grayscale thumbnail; a frame whose hash is within ``max_distance``
+bits of the last segmented frame (the reference) reuses that frame's
+segmentation and crop classifications instead of running UNet++ and the
+transfer model again.
+
+Comparing against the reference, not the previous frame, keeps slow
+drift from chaining frames together; ``max_run`` forces a fresh
+segmentation after that many consecutive reuses.
+
+Usage:
+    dedup = FrameDeduplicator()
+    ref_idx, distance = dedup.check(frame_idx, frame_rgb)
+    if ref_idx is not None:
+        ...  # reuse the results of frame ref_idx
+"""
+
+import os
+
+import cv2
+import numpy as np
+
+DEDUP_ENABLED = os.environ.get("SIDEVIEW_DEDUP", "0") == "1"
+
+# Hamming distance (of 64 bits) up to which frames count as duplicates
+DEDUP_MAX_DISTANCE = int(os.environ.get("SIDEVIEW_DEDUP_DISTANCE", "4"))
+
+# Consecutive reuses before a frame is segmented again regardless
+DEDUP_MAX_RUN = 10
+
+HASH_SIZE = 8
+
+
+def dhash(frame_rgb, hash_size=HASH_SIZE):
+    """Difference hash: sign of horizontal gradients of a tiny grayscale frame."""
+    gray = cv2.cvtColor(frame_rgb, cv2.COLOR_RGB2GRAY)
+    small = cv2.resize(gray, (hash_size + 1, hash_size), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    return int.from_bytes(np.packbits(bits).tobytes(), "big")
+
+
+def hamming(a, b):
+    return bin(a ^ b).count("1")
+
+
+class FrameDeduplicator:
+    """Decides, in frame order, which frames can reuse an earlier frame's results."""
+
+    def __init__(self, max_distance=DEDUP_MAX_DISTANCE, max_run=DEDUP_MAX_RUN):
+        self.max_distance = max_distance
+        self.max_run = max_run
+        self.ref_idx = None
+        self.ref_hash = None
+        self.run = 0
+        self.reused_frames = 0
+
+    def check(self, frame_idx, frame_rgb):
+        """
+        Returns (ref_idx, distance): ``ref_idx`` is the frame whose results
+        to reuse, or None if this frame must be processed (it then becomes
+        the new reference). ``distance`` is the Hamming distance to the
+        reference hash (None for the first frame).
+        """
+        h = dhash(frame_rgb)
+        distance = None if self.ref_hash is None else hamming(h, self.ref_hash)
+
+        if distance is not None and distance <= self.max_distance and self.run < self.max_run:
+            self.run += 1
+            self.reused_frames += 1
+            return self.ref_idx, distance
+
+        self.ref_idx, self.ref_hash, self.run = frame_idx, h, 0
+        return None, distance
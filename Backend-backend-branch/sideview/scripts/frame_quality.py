@@ -0,0 +1,131 @@
+"""
+Frame quality gate for the sideview pipelines.
+
+aggregate_dashboard drops predictions with low reliability or the OOD
+flag, but only after UNet++ and the transfer model have run on them. The
+gate rejects frames that would give such predictions before any model
+runs, from three cheap measurements on a grayscale thumbnail:
+
+    sharpness     variance of the Laplacian (defocus, general blur)
+    exposure      fraction of crushed-black / blown-out pixels and mean
+                  brightness (luminance histogram)
+    motion blur   no-reference blur estimate (Crete et al. 2007): how
+                  little the image changes when blurred further along a
+                  direction; the worst of horizontal / vertical is used,
+                  so blur along the drone's motion shows up even when
+                  edges across it stay sharp
+
+Usage:
+    gate = QualityGate()
+    passed, reason, metrics = gate.check(frame_rgb)
+"""
+
+import os
+
+import cv2
+import numpy as np
+
+QUALITY_GATE_ENABLED = os.environ.get("SIDEVIEW_QUALITY_GATE", "0") == "1"
+
+# Laplacian variance below which a frame is too blurry
+QUALITY_MIN_SHARPNESS = float(os.environ.get("SIDEVIEW_QUALITY_MIN_SHARPNESS", "40"))
+
+# Directional blur estimate (0 sharp .. 1 flat) above which a frame is motion blurred
+QUALITY_MAX_MOTION_BLUR = float(os.environ.get("SIDEVIEW_QUALITY_MAX_MOTION_BLUR", "0.45"))
+
+# Exposure: fraction of pixels at the ends of the histogram, mean brightness range
+QUALITY_MAX_CLIPPED = 0.4
+QUALITY_BRIGHTNESS_RANGE = (30, 225)
+DARK_LEVEL = 10
+BRIGHT_LEVEL = 245
+
+# Width of the thumbnail the measurements are taken on (thresholds depend on it)
+QUALITY_WIDTH = 480
+
+# Taps of the re-blur filter of the motion blur estimate
+REBLUR_TAPS = 9
+
+GATE_REASONS = ("underexposed", "overexposed", "blur", "motion_blur")
+
+
+def quality_thumbnail(frame_rgb, width=QUALITY_WIDTH):
+    """Grayscale thumbnail ``width`` pixels wide (aspect preserved)."""
+    gray = cv2.cvtColor(frame_rgb, cv2.COLOR_RGB2GRAY)
+    h, w = gray.shape
+    if w <= width:
+        return gray
+    return cv2.resize(gray, (width, max(1, round(h * width / w))), interpolation=cv2.INTER_AREA)
+
+
+def _directional_blur(gray, axis):
+    """Crete et al. blur estimate along ``axis`` (0 vertical, 1 horizontal)."""
+    img = gray.astype(np.float32)
+    # Box filter along the axis; cv2 sizes are (width, height)
+    reblurred = cv2.blur(img, (1, REBLUR_TAPS) if axis == 0 else (REBLUR_TAPS, 1))
+    d_img = np.abs(np.diff(img, axis=axis))
+    d_reblurred = np.abs(np.diff(reblurred, axis=axis))
+    total = d_img.sum()
+    if total == 0:
+        return 1.0
+    lost = np.maximum(0.0, d_img - d_reblurred).sum()
+    return float((total - lost) / total)
+
+
+def frame_metrics(frame_rgb):
+    """Sharpness, exposure and motion blur measurements of an RGB frame."""
+    gray = quality_thumbnail(frame_rgb)
+    hist = np.bincount(gray.ravel(), minlength=256)
+    n = gray.size
+    return {
+        "sharpness": float(cv2.Laplacian(gray, cv2.CV_64F).var()),
+        "mean_brightness": float(np.dot(hist, np.arange(256)) / n),
+        "dark_fraction": float(hist[:DARK_LEVEL + 1].sum() / n),
+        "bright_fraction": float(hist[BRIGHT_LEVEL:].sum() / n),
+        "motion_blur": max(_directional_blur(gray, 0), _directional_blur(gray, 1)),
+    }
+
+
+def gate_reason(metrics, min_sharpness=QUALITY_MIN_SHARPNESS, max_motion_blur=QUALITY_MAX_MOTION_BLUR):
+    """Why a frame with these metrics is rejected (see GATE_REASONS), or None."""
+    low, high = QUALITY_BRIGHTNESS_RANGE
+    if metrics["dark_fraction"] > QUALITY_MAX_CLIPPED or metrics["mean_brightness"] < low:
+        return "underexposed"
+    if metrics["bright_fraction"] > QUALITY_MAX_CLIPPED or metrics["mean_brightness"] > high:
+        return "overexposed"
+    if metrics["sharpness"] < min_sharpness:
+        return "blur"
+    if metrics["motion_blur"] > max_motion_blur:
+        return "motion_blur"
+    return None
+
+
+class QualityGate:
+    """Rejects unusable frames and counts them per reason."""
+
+    def __init__(self, min_sharpness=QUALITY_MIN_SHARPNESS, max_motion_blur=QUALITY_MAX_MOTION_BLUR):
+        self.min_sharpness = min_sharpness
+        self.max_motion_blur = max_motion_blur
+        self.checked_frames = 0
+        self.reasons = {reason: 0 for reason in GATE_REASONS}
+
+    @property
+    def gated_frames(self):
+        return sum(self.reasons.values())
+
+    def check(self, frame_rgb):
+        """Returns (passed, reason, metrics); ``reason`` is None for frames that pass."""
+        metrics = frame_metrics(frame_rgb)
+        reason = gate_reason(metrics, self.min_sharpness, self.max_motion_blur)
+        self.checked_frames += 1
+        if reason is not None:
+            self.reasons[reason] += 1
+        return reason is None, reason, metrics
+
+    def stats(self):
+        return {
+            "min_sharpness": self.min_sharpness,
+            "max_motion_blur": self.max_motion_blur,
+            "checked_frames": self.checked_frames,
+            "gated_frames": self.gated_frames,
+            "reasons": dict(self.reasons),
+        }
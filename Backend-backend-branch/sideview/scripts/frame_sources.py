@@ -0,0 +1,324 @@
+"""
+Frame sources for sampled video decoding.
+
+VideoSegmenter samples every ``frame_interval``-th frame. How those frames
+are reached matters a lot for inter-frame codecs (H.264/H.265):
+
+    sequential  grab() every frame, retrieve() only the sampled ones.
+                Costs one decode per source frame, no seeks.
+    seek        keyframe-aware seeking: jump with CAP_PROP_POS_FRAMES only
+                when the next sampled frame is past the current GOP,
+                otherwise grab() forward. A seek re-decodes from the
+                preceding keyframe, i.e. about GOP/2 frames on average.
+    legacy      seek before every sampled frame (the old behaviour).
+
+``open_frame_source`` picks sequential or seek automatically from the frame
+interval and the GOP size (keyframe distance), estimated with ffprobe when
+available.
+
+Sampling modes:
+
+    fixed       every ``frame_interval``-th frame (the sources above)
+    adaptive    MotionAdaptiveFrameSource: motion between frames is measured
+                on small grayscale thumbnails; frames are sampled densely
+                while the camera moves between trees and sparsely while it
+                hovers on one trunk.
+
+Usage:
+    source = open_frame_source(cap, total_frames, frame_interval, video_path)
+    for frame_idx, frame_bgr in source:
+        ...
+"""
+
+import json
+import os
+import shutil
+import subprocess
+from abc import ABC, abstractmethod
+
+import cv2
+
+FRAME_SOURCES = ("auto", "sequential", "seek", "legacy")
+FRAME_SOURCE = os.environ.get("SIDEVIEW_FRAME_SOURCE", "auto")
+
+# Seeking also pays for flushing the decoder and demuxer repositioning;
+# expressed in decoded-frame equivalents
+SEEK_OVERHEAD_FRAMES = 4
+
+# Packets inspected by ffprobe to estimate the GOP size
+GOP_PROBE_PACKETS = 600
+
+# GOP assumed when it cannot be measured: most phone/drone encoders put a
+# keyframe every 1-2 s
+DEFAULT_GOP_SECONDS = 2.0
+
+SAMPLING_MODES = ("fixed", "adaptive")
+SAMPLING_MODE = os.environ.get("SIDEVIEW_SAMPLING", "fixed")
+
+# Adaptive sampling. Motion is the mean absolute difference (0-255) between
+# consecutive probe thumbnails, minus a noise floor; a frame is sampled
+# once the motion accumulated since the last sample reaches the threshold.
+MOTION_PROBE_SECONDS = 0.1      # motion is measured every 0.1 s of video
+MOTION_THUMB_WIDTH = 64         # thumbnail width (px) for motion measurement
+MOTION_NOISE_FLOOR = 2.0        # sensor noise / compression flicker
+MOTION_THRESHOLD = 8.0          # accumulated motion that triggers a sample
+ADAPTIVE_MIN_INTERVAL = 0.2     # seconds: at most 5 fps during fast pans
+ADAPTIVE_MAX_INTERVAL = 2.0     # seconds: at least 0.5 fps while hovering
+
+
+class FrameSource(ABC):
+    """Iterable of (frame_idx, frame_bgr) for indices 0, interval, 2*interval, ..."""
+
+    strategy = None
+
+    def __init__(self, cap, total_frames, frame_interval):
+        self.cap = cap
+        self.total_frames = total_frames
+        self.frame_interval = max(1, int(frame_interval))
+        self.gop_size = None
+        self.decoded_frames = 0
+        self.seeks = 0
+
+    def stats(self):
+        return {
+            "strategy": self.strategy,
+            "gop_size": self.gop_size,
+            "decoded_frames": self.decoded_frames,
+            "seeks": self.seeks,
+        }
+
+    @abstractmethod
+    def __iter__(self):
+        """Yield (frame_idx, frame_bgr) for the sampled frames."""
+
+
+class SequentialFrameSource(FrameSource):
+    """Decode straight through; only sampled frames are retrieved."""
+
+    strategy = "sequential"
+
+    def __iter__(self):
+        for frame_idx in range(self.total_frames):
+            if not self.cap.grab():
+                return
+            self.decoded_frames += 1
+            if frame_idx % self.frame_interval:
+                continue
+            ret, frame_bgr = self.cap.retrieve()
+            if not ret:
+                return
+            yield frame_idx, frame_bgr
+
+
+class SeekingFrameSource(FrameSource):
+    """
+    Seek to sampled frames.
+
+    With ``gop_size`` (keyframe-aware) a seek is only issued when the target
+    lies beyond the GOP the decoder is currently in; shorter jumps are
+    decoded forward with grab(). ``gop_size=None`` seeks before every
+    sampled frame.
+    """
+
+    def __init__(self, cap, total_frames, frame_interval, gop_size=None):
+        super().__init__(cap, total_frames, frame_interval)
+        self.gop_size = gop_size
+        self.strategy = "seek" if gop_size else "legacy"
+
+    def __iter__(self):
+        position = None  # index of the next frame the decoder returns
+        for frame_idx in range(0, self.total_frames, self.frame_interval):
+            gap = None if position is None else frame_idx - position
+            if self.gop_size and gap is not None and 0 <= gap < self.gop_size:
+                for _ in range(gap):
+                    if not self.cap.grab():
+                        return
+                    self.decoded_frames += 1
+            else:
+                self.cap.set(cv2.CAP_PROP_POS_FRAMES, frame_idx)
+                self.seeks += 1
+
+            ret, frame_bgr = self.cap.read()
+            if not ret:
+                return
+            self.decoded_frames += 1
+            position = frame_idx + 1
+            yield frame_idx, frame_bgr
+
+
+class FrameFetcher:
+    """
+    Frames by increasing index from a capture: short jumps are decoded
+    forward with grab(), jumps of a GOP or more (or backwards) seek.
+    """
+
+    def __init__(self, cap, gop_size):
+        self.cap = cap
+        self.gop_size = max(1, int(gop_size))
+        self.position = None  # index of the next frame the decoder returns
+        self.decoded_frames = 0
+        self.seeks = 0
+
+    def get(self, frame_idx):
+        """BGR frame ``frame_idx``, or None past the end of the video."""
+        gap = None if self.position is None else frame_idx - self.position
+        if gap is not None and 0 <= gap < self.gop_size:
+            for _ in range(gap):
+                if not self.cap.grab():
+                    return None
+                self.decoded_frames += 1
+        else:
+            self.cap.set(cv2.CAP_PROP_POS_FRAMES, frame_idx)
+            self.seeks += 1
+
+        ret, frame_bgr = self.cap.read()
+        if not ret:
+            self.position = None
+            return None
+        self.decoded_frames += 1
+        self.position = frame_idx + 1
+        return frame_bgr
+
+    def stats(self):
+        return {"decoded_frames": self.decoded_frames, "seeks": self.seeks}
+
+
+def motion_thumbnail(frame_bgr, width=MOTION_THUMB_WIDTH):
+    """Small blurred grayscale copy of a frame for motion measurement."""
+    h, w = frame_bgr.shape[:2]
+    size = (width, max(1, round(h * width / w)))
+    gray = cv2.cvtColor(cv2.resize(frame_bgr, size, interpolation=cv2.INTER_AREA), cv2.COLOR_BGR2GRAY)
+    return cv2.GaussianBlur(gray, (3, 3), 0)
+
+
+def motion_score(prev_thumb, thumb, noise_floor=MOTION_NOISE_FLOOR):
+    """Inter-frame change above the noise floor (0 = static)."""
+    return max(0.0, float(cv2.absdiff(prev_thumb, thumb).mean()) - noise_floor)
+
+
+class MotionAdaptiveFrameSource(FrameSource):
+    """
+    Sample frames by motion instead of at a fixed interval.
+
+    Every frame is grabbed (sequential decoding); one frame per
+    MOTION_PROBE_SECONDS is retrieved and compared with the previous probe
+    on a thumbnail. A probe frame is sampled when the accumulated motion
+    since the last sample reaches ``threshold`` (but not within
+    ``min_interval`` seconds of it), or after ``max_interval`` seconds
+    without a sample.
+    """
+
+    strategy = "adaptive"
+
+    def __init__(self, cap, total_frames, fps, threshold=MOTION_THRESHOLD,
+                 min_interval=ADAPTIVE_MIN_INTERVAL, max_interval=ADAPTIVE_MAX_INTERVAL):
+        super().__init__(cap, total_frames, 1)
+        fps = fps or 30.0
+        self.probe_step = max(1, round(fps * MOTION_PROBE_SECONDS))
+        self.min_gap = max(self.probe_step, round(fps * min_interval))
+        self.max_gap = max(self.min_gap, round(fps * max_interval))
+        self.threshold = threshold
+        self.sampled_frames = 0
+        self.motion = []  # motion score of every probe
+
+    def stats(self):
+        stats = super().stats()
+        stats.update({
+            "sampled_frames": self.sampled_frames,
+            "probe_step": self.probe_step,
+            "mean_motion": round(sum(self.motion) / len(self.motion), 3) if self.motion else 0.0,
+            # Probes with no motion above the noise floor (hovering)
+            "still_fraction": round(sum(m == 0 for m in self.motion) / len(self.motion), 3) if self.motion else 0.0,
+        })
+        return stats
+
+    def __iter__(self):
+        prev_thumb = None
+        accumulated = 0.0
+        last_sample = None
+        for frame_idx in range(self.total_frames):
+            if not self.cap.grab():
+                return
+            self.decoded_frames += 1
+            if frame_idx % self.probe_step:
+                continue
+            ret, frame_bgr = self.cap.retrieve()
+            if not ret:
+                return
+
+            thumb = motion_thumbnail(frame_bgr)
+            if prev_thumb is not None:
+                score = motion_score(prev_thumb, thumb)
+                self.motion.append(score)
+                accumulated += score
+            prev_thumb = thumb
+
+            gap = None if last_sample is None else frame_idx - last_sample
+            if (gap is None or gap >= self.max_gap
+                    or (gap >= self.min_gap and accumulated >= self.threshold)):
+                last_sample = frame_idx
+                accumulated = 0.0
+                self.sampled_frames += 1
+                yield frame_idx, frame_bgr
+
+
+def probe_gop_size(video_path, max_packets=GOP_PROBE_PACKETS):
+    """Average keyframe distance from ffprobe packet flags, or None."""
+    if not video_path or shutil.which("ffprobe") is None:
+        return None
+    try:
+        out = subprocess.run(
+            ["ffprobe", "-v", "error", "-select_streams", "v:0",
+             "-show_entries", "packet=flags", "-read_intervals", f"%+#{max_packets}",
+             "-of", "json", str(video_path)],
+            capture_output=True, text=True, timeout=30,
+        )
+        packets = json.loads(out.stdout or "{}").get("packets", [])
+    except (OSError, subprocess.SubprocessError, ValueError):
+        return None
+
+    keyframes = [i for i, p in enumerate(packets) if "K" in p.get("flags", "")]
+    if len(keyframes) >= 2:
+        return max(1, round((keyframes[-1] - keyframes[0]) / (len(keyframes) - 1)))
+    if len(keyframes) == 1 and len(packets) > 1:
+        # Only one keyframe in the probed window: GOP is at least that long
+        return len(packets)
+    return None
+
+
+def estimate_gop_size(video_path, fps):
+    """GOP size in frames (ffprobe, else DEFAULT_GOP_SECONDS of video)."""
+    gop = probe_gop_size(video_path)
+    if gop is None:
+        gop = max(1, int(round((fps or 30.0) * DEFAULT_GOP_SECONDS)))
+    return gop
+
+
+def choose_strategy(frame_interval, gop_size):
+    """
+    Sequential decoding costs ``frame_interval`` decodes per sample; a seek
+    costs about half a GOP of decodes plus the seek overhead.
+    """
+    if frame_interval <= gop_size / 2 + SEEK_OVERHEAD_FRAMES:
+        return "sequential"
+    return "seek"
+
+
+def open_frame_source(cap, total_frames, frame_interval, video_path=None, strategy=None, gop_size=None):
+    """Create the frame source for ``strategy`` (default: SIDEVIEW_FRAME_SOURCE)."""
+    strategy = strategy or FRAME_SOURCE
+    if strategy in ("auto", "seek") and gop_size is None:
+        gop_size = estimate_gop_size(video_path, cap.get(cv2.CAP_PROP_FPS))
+    if strategy == "auto":
+        strategy = choose_strategy(frame_interval, gop_size)
+
+    if strategy == "sequential":
+        source = SequentialFrameSource(cap, total_frames, frame_interval)
+    elif strategy == "seek":
+        source = SeekingFrameSource(cap, total_frames, frame_interval, gop_size)
+    elif strategy == "legacy":
+        source = SeekingFrameSource(cap, total_frames, frame_interval, None)
+    else:
+        raise ValueError(f"Unknown frame source '{strategy}'. Choose from {FRAME_SOURCES}")
+    source.gop_size = gop_size
+    return source
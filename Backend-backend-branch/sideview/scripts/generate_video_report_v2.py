@@ -89,11 +89,15 @@ def generate_report(pred_json_path: Path) -> Path:
             'is_out_of_distribution': pred.get('is_out_of_distribution', False),
             'ood_reason': pred.get('ood_reason'),
             'ood_signals': pred.get('ood_signals'),
-            'reliability': pred.get('reliability', 0)
+            'reliability': pred.get('reliability', 0),
+            'reuse_count': p.get('reuse_count', 0)
           })
 
+    # Frames the segmenter's quality gate rejected before any model ran
+    gated_frames = data.get('segmentation_result', {}).get('quality_gate', {}).get('gated_frames', 0)
+
     try:
-        dashboard = aggregate_dashboard(formatted_predictions)
+        dashboard = aggregate_dashboard(formatted_predictions, gated_frames=gated_frames)
     except Exception:
         dashboard = None
 
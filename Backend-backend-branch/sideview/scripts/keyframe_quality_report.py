@@ -0,0 +1,192 @@
+"""Quality report: propagated keyframe masks vs full segmentation.
+
+Samples a video like predict_video.py, runs UNet++ on EVERY sampled frame
+(the reference) and, in parallel, the keyframe mode of VideoSegmenter
+(mask_propagation.MaskPropagator, keyframe requests on StemTracker
+misses). For the propagated frames it reports, by number of frames since
+the last keyframe:
+
+    n           propagated frames
+    IoU <cls>   IoU of the propagated raw mask with the reference, per class
+    stem pp     main-stem IoU after smart_postprocess (what the crops use)
+    pixels      pixel agreement of the raw masks
+
+plus keyframe counts per reason and the segmentation cost of keyframe
+mode relative to full inference.
+
+Usage:
+    python keyframe_quality_report.py --video ../uploads/videos/tree.mp4
+    python keyframe_quality_report.py --video tree.mp4 --frame-interval 2 --max-gap 6 --json keyframes.json
+"""
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+scripts_dir = Path(__file__).parent
+if str(scripts_dir) not in sys.path:
+    sys.path.insert(0, str(scripts_dir))
+
+from predict_video import CLASSES, VIDEO_TRACKING_PARAMS, VideoSegmenter
+from postprocess_utils import StemTracker, smart_postprocess
+from frame_sources import open_frame_source
+from mask_propagation import FLOW_MIN_CONFIDENCE, KEYFRAME_MAX_GAP, MaskPropagator, propagate_mask
+from crop_utils import mask_bbox
+
+CLASS_IDS = (1, 2, 3)
+
+
+class _Counts:
+    """Accumulated intersections / unions per class over propagated frames."""
+
+    def __init__(self):
+        self.n = 0
+        self.inter = dict.fromkeys(CLASS_IDS, 0)
+        self.union = dict.fromkeys(CLASS_IDS, 0)
+        self.stem_inter = self.stem_union = 0
+        self.agree = self.pixels = 0
+
+    def add(self, reference, propagated, reference_pp, propagated_pp):
+        self.n += 1
+        for class_id in CLASS_IDS:
+            ref, prop = reference == class_id, propagated == class_id
+            self.inter[class_id] += int(np.count_nonzero(ref & prop))
+            self.union[class_id] += int(np.count_nonzero(ref | prop))
+        ref, prop = reference_pp == 3, propagated_pp == 3
+        self.stem_inter += int(np.count_nonzero(ref & prop))
+        self.stem_union += int(np.count_nonzero(ref | prop))
+        self.agree += int(np.count_nonzero(reference == propagated))
+        self.pixels += reference.size
+
+    def row(self):
+        return {
+            "n": self.n,
+            "iou": {CLASSES[c]["name"]: self.inter[c] / self.union[c] if self.union[c] else None
+                    for c in CLASS_IDS},
+            "stem_iou_postprocessed": self.stem_inter / self.stem_union if self.stem_union else None,
+            "pixel_agreement": self.agree / self.pixels if self.pixels else None,
+        }
+
+
+def quality_report(segmenter, video_path, frame_interval, max_gap, min_confidence):
+    cap = cv2.VideoCapture(str(video_path))
+    if not cap.isOpened():
+        raise ValueError(f"Could not open video: {video_path}")
+    total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+    source = open_frame_source(cap, total_frames, frame_interval, video_path, segmenter.frame_source)
+
+    propagator = MaskPropagator(max_gap=max_gap, min_confidence=min_confidence)
+    tracker = StemTracker(
+        alpha=VIDEO_TRACKING_PARAMS['SMOOTH_ALPHA'],
+        iou_thresh=VIDEO_TRACKING_PARAMS['IOU_THRESH'],
+        min_consistent=VIDEO_TRACKING_PARAMS['MIN_CONSISTENT_FRAMES'],
+        max_missing=VIDEO_TRACKING_PARAMS['MAX_MISSING_FRAMES']
+    )
+    by_gap, overall = {}, _Counts()
+    previous_mask = None
+    inference_seconds = propagation_seconds = 0.0
+    frames = 0
+
+    try:
+        for batch in segmenter._iter_frame_batches(source):
+            t0 = time.perf_counter()
+            references = segmenter._inference_batch([frame_rgb for _, frame_rgb in batch])
+            inference_seconds += time.perf_counter() - t0
+
+            for (frame_idx, frame_rgb), reference in zip(batch, references):
+                frames += 1
+                t0 = time.perf_counter()
+                flow, _, reason = propagator.plan(frame_idx, frame_rgb)
+                mask = reference if reason is not None else propagate_mask(previous_mask, flow)
+                propagation_seconds += time.perf_counter() - t0
+                previous_mask = mask
+
+                # Tracker on the keyframe-mode masks, as in VideoSegmenter.predict
+                mask_pp = smart_postprocess(mask, mask.shape)
+                had_track = tracker.track is not None
+                main_bbox = mask_bbox(mask_pp, 3)
+                _, accepted = tracker.update(main_bbox, float((mask_pp == 3).sum()) if main_bbox else 0.0)
+                if reason is not None:
+                    continue
+                if had_track and not accepted:
+                    propagator.request_keyframe()
+
+                reference_pp = smart_postprocess(reference, reference.shape)
+                by_gap.setdefault(propagator.gap, _Counts()).add(reference, mask, reference_pp, mask_pp)
+                overall.add(reference, mask, reference_pp, mask_pp)
+    finally:
+        cap.release()
+
+    stats = propagator.stats()
+    seconds_per_frame = inference_seconds / frames if frames else 0.0
+    keyframe_cost = stats["keyframes"] * seconds_per_frame + propagation_seconds
+    return {
+        "video": str(video_path),
+        "frame_interval": frame_interval,
+        "frames": frames,
+        **stats,
+        "inference_ms_per_frame": seconds_per_frame * 1000.0,
+        "propagation_ms_per_frame": propagation_seconds / frames * 1000.0 if frames else 0.0,
+        # Segmentation time of keyframe mode relative to segmenting every frame
+        "relative_cost": keyframe_cost / inference_seconds if inference_seconds else None,
+        "overall": overall.row(),
+        "by_gap": {str(gap): counts.row() for gap, counts in sorted(by_gap.items())},
+    }
+
+
+def print_report(report):
+    print(f"\n{report['frames']} frames: {report['keyframes']} keyframes "
+          f"({', '.join(f'{k} {v}' for k, v in report['keyframe_reasons'].items())}), "
+          f"{report['propagated_frames']} propagated")
+    print(f"Inference {report['inference_ms_per_frame']:.1f} ms/frame, "
+          f"flow + warp {report['propagation_ms_per_frame']:.1f} ms/frame, "
+          f"mean flow confidence {report['mean_flow_confidence']}")
+    if report["relative_cost"] is not None:
+        print(f"Keyframe mode segmentation cost: {report['relative_cost'] * 100:.1f}% of full inference")
+
+    names = [CLASSES[c]["name"] for c in CLASS_IDS]
+    header = f"\n{'gap':<8}{'n':>6}" + "".join(f"{'IoU ' + n:>11}" for n in names) + f"{'stem pp':>10}{'pixels':>9}"
+    print(header)
+    rows = list(report["by_gap"].items()) + [("all", report["overall"])]
+    for gap, row in rows:
+        if not row["n"]:
+            continue
+        line = f"{gap:<8}{row['n']:>6}"
+        for n in names:
+            iou = row["iou"][n]
+            line += f"{'-' if iou is None else f'{iou:.4f}':>11}"
+        stem_pp = row["stem_iou_postprocessed"]
+        line += f"{'-' if stem_pp is None else f'{stem_pp:.4f}':>10}"
+        line += f"{row['pixel_agreement'] * 100:>8.2f}%"
+        print(line)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare keyframe-propagated masks with full segmentation')
+    parser.add_argument('--video', required=True, help='Video to evaluate')
+    parser.add_argument('--model', default=None, help='UNet++ checkpoint (default: model/coconut_best_dice.pth)')
+    parser.add_argument('--frame-interval', type=int, default=3, help='Process every Nth frame (default: 3)')
+    parser.add_argument('--max-gap', type=int, default=KEYFRAME_MAX_GAP,
+                        help='Max propagated frames between keyframes (default: SIDEVIEW_KEYFRAME_GAP)')
+    parser.add_argument('--min-confidence', type=float, default=FLOW_MIN_CONFIDENCE,
+                        help='Flow confidence below which a keyframe is forced (default: SIDEVIEW_FLOW_CONFIDENCE)')
+    parser.add_argument('--json', default=None, help='Also write the report to this JSON file')
+
+    args = parser.parse_args()
+
+    segmenter = VideoSegmenter(args.model)
+    report = quality_report(segmenter, args.video, max(1, args.frame_interval), args.max_gap, args.min_confidence)
+    print_report(report)
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(report, f, indent=2)
+        print(f"\n✅ Report written to {args.json}")
+
+
+if __name__ == '__main__':
+    main()
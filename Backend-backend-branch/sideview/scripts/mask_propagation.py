@@ -0,0 +1,165 @@
+"""
+Keyframe segmentation with optical-flow mask propagation.
+
+UNet++ only runs on keyframes; the label mask of every other sampled
+frame is the previous frame's mask warped by dense (Farneback) optical
+flow. Drone footage of a tree moves smoothly between nearby samples, so
+a warped mask is close to what the model would predict, at a fraction of
+the cost. That budget can go into a smaller frame interval (better
+temporal coverage) instead.
+
+A frame becomes a keyframe when:
+    first       it is the first frame
+    interval    ``max_gap`` frames were propagated since the last keyframe
+    flow        flow confidence is below ``min_confidence``
+    tracker     the StemTracker lost the stem on a propagated frame
+                (request_keyframe(), called from the tracking stage)
+
+Flow confidence is the fraction of pixels whose brightness, warped from
+the previous frame, matches the current frame within FLOW_RESIDUAL gray
+levels. Occlusions, motion blur and fast pans drive it down.
+
+Flow is computed on grayscale thumbnails FLOW_WIDTH pixels wide and
+scaled up to the mask size for warping.
+
+Usage:
+    propagator = MaskPropagator()
+    flow, confidence, reason = propagator.plan(frame_idx, frame_rgb)
+    if reason is None:
+        mask = propagate_mask(prev_mask, flow)   # propagated frame
+    else:
+        mask = segment(frame_rgb)                # keyframe
+"""
+
+import os
+
+import cv2
+import numpy as np
+
+KEYFRAMES_ENABLED = os.environ.get("SIDEVIEW_KEYFRAMES", "0") == "1"
+
+# Max propagated frames between two keyframes
+KEYFRAME_MAX_GAP = max(1, int(os.environ.get("SIDEVIEW_KEYFRAME_GAP", "4")))
+
+# Minimum fraction of pixels explained by the flow for a propagated frame
+FLOW_MIN_CONFIDENCE = float(os.environ.get("SIDEVIEW_FLOW_CONFIDENCE", "0.85"))
+
+# Gray-level difference up to which a warped pixel counts as explained
+FLOW_RESIDUAL = 12
+
+# Width of the grayscale thumbnails the flow is computed on
+FLOW_WIDTH = 320
+
+FARNEBACK_PARAMS = {
+    'pyr_scale': 0.5,
+    'levels': 3,
+    'winsize': 15,
+    'iterations': 3,
+    'poly_n': 5,
+    'poly_sigma': 1.2,
+    'flags': 0,
+}
+
+KEYFRAME_REASONS = ("first", "interval", "flow", "tracker")
+
+
+def flow_thumbnail(frame_rgb, width=FLOW_WIDTH):
+    """Grayscale thumbnail ``width`` pixels wide (aspect preserved)."""
+    gray = cv2.cvtColor(frame_rgb, cv2.COLOR_RGB2GRAY)
+    h, w = gray.shape
+    if w <= width:
+        return gray
+    return cv2.resize(gray, (width, max(1, round(h * width / w))), interpolation=cv2.INTER_AREA)
+
+
+def backward_flow(prev_gray, cur_gray):
+    """Flow from each pixel of ``cur_gray`` to where it was in ``prev_gray``."""
+    return cv2.calcOpticalFlowFarneback(cur_gray, prev_gray, None, **FARNEBACK_PARAMS)
+
+
+def _remap(image, flow, interpolation):
+    h, w = flow.shape[:2]
+    grid_x, grid_y = np.meshgrid(np.arange(w, dtype=np.float32), np.arange(h, dtype=np.float32))
+    return cv2.remap(image, grid_x + flow[..., 0], grid_y + flow[..., 1], interpolation,
+                     borderMode=cv2.BORDER_CONSTANT, borderValue=0)
+
+
+def flow_confidence(prev_gray, cur_gray, flow):
+    """Fraction of pixels of ``cur_gray`` that the flow explains from ``prev_gray``."""
+    warped = _remap(prev_gray, flow, cv2.INTER_LINEAR)
+    residual = cv2.absdiff(warped, cur_gray)
+    return float(np.count_nonzero(residual <= FLOW_RESIDUAL)) / residual.size
+
+
+def propagate_mask(mask, flow):
+    """Warp a label mask of the previous frame onto the current frame."""
+    h, w = mask.shape[:2]
+    fh, fw = flow.shape[:2]
+    if (fh, fw) != (h, w):
+        flow = cv2.resize(flow, (w, h), interpolation=cv2.INTER_LINEAR)
+        flow[..., 0] *= w / fw
+        flow[..., 1] *= h / fh
+    # Labels are not interpolated; pixels flowing in from outside are background
+    return _remap(mask, flow, cv2.INTER_NEAREST)
+
+
+class MaskPropagator:
+    """Decides, in frame order, which frames are segmented and which are propagated."""
+
+    def __init__(self, max_gap=KEYFRAME_MAX_GAP, min_confidence=FLOW_MIN_CONFIDENCE):
+        self.max_gap = max_gap
+        self.min_confidence = min_confidence
+        self.prev_gray = None
+        self.gap = 0
+        self.force = False
+        self.keyframes = {reason: 0 for reason in KEYFRAME_REASONS}
+        self.propagated_frames = 0
+        self._confidences = []
+
+    def request_keyframe(self):
+        """Make the next planned frame a keyframe (e.g. after a tracker miss)."""
+        self.force = True
+
+    def plan(self, frame_idx, frame_rgb):
+        """
+        Returns (flow, confidence, reason): ``reason`` is the keyframe reason
+        (see KEYFRAME_REASONS), or None if the frame is propagated with
+        ``flow``. ``confidence`` is the flow confidence (None when the flow
+        was not computed).
+        """
+        gray = flow_thumbnail(frame_rgb)
+        flow = confidence = reason = None
+
+        if self.prev_gray is None or self.prev_gray.shape != gray.shape:
+            reason = "first"
+        elif self.force:
+            reason = "tracker"
+        elif self.gap >= self.max_gap:
+            reason = "interval"
+        else:
+            flow = backward_flow(self.prev_gray, gray)
+            confidence = flow_confidence(self.prev_gray, gray, flow)
+            self._confidences.append(confidence)
+            if confidence < self.min_confidence:
+                reason = "flow"
+
+        self.prev_gray = gray
+        if reason is not None:
+            self.keyframes[reason] += 1
+            self.gap = 0
+            self.force = False
+            return None, confidence, reason
+
+        self.gap += 1
+        self.propagated_frames += 1
+        return flow, confidence, None
+
+    def stats(self):
+        return {
+            "max_gap": self.max_gap,
+            "min_flow_confidence": self.min_confidence,
+            "keyframes": sum(self.keyframes.values()),
+            "keyframe_reasons": dict(self.keyframes),
+            "propagated_frames": self.propagated_frames,
+            "mean_flow_confidence": round(float(np.mean(self._confidences)), 4) if self._confidences else None,
+        }
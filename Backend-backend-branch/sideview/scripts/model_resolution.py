@@ -0,0 +1,54 @@
+"""
+Postprocessing at model resolution for the sideview segmenter.
+
+The segmenter predicts IMG_SIZE x IMG_SIZE label masks, which were
+resized to the frame size before smart_postprocess: on 4K video,
+component labeling, dilation, stem scoring and tracking ran on 8 MP
+masks holding no more information than the 512 x 512 argmax. In
+model-resolution mode the prediction is resized to the aspect-correct
+mask shape with short side IMG_SIZE (like analysis_proxy.py's proxy, so
+neither axis loses model pixels), and smart_postprocess, StemTracker and
+the overlay / mask videos run at that size.
+
+The filtered mask is only upscaled where crops need it: inside each
+class's bbox, by crop_utils.save_frame_crops. Crop pixels and pixel
+counts are the ones a full-frame nearest-neighbour upscale of the
+filtered mask would give. The ROI window (roi_inference.py) is mapped
+back to frame coordinates with box_to_frame.
+
+Usage:
+    shape = mask_shape(frame_rgb.shape)            # (h, w) of the masks
+    bbox = box_to_frame(bbox, shape, frame_rgb.shape)
+"""
+
+import os
+
+from crop_utils import scale_bbox
+
+MODEL_RES_ENABLED = os.environ.get("SIDEVIEW_MODEL_RES_POSTPROCESS", "0") == "1"
+
+# Short side of the masks: the segmenter input size (predict_video.IMG_SIZE)
+MODEL_RES_SHORT_SIDE = 512
+
+
+def mask_shape(frame_shape, short_side=MODEL_RES_SHORT_SIDE):
+    """(h, w) of masks for frames of ``frame_shape``: short side ``short_side``, never upscaled."""
+    h, w = frame_shape[:2]
+    scale = short_side / min(h, w)
+    if scale >= 1.0:
+        return h, w
+    return max(1, int(round(h * scale))), max(1, int(round(w * scale)))
+
+
+def box_to_frame(bbox, from_shape, to_shape):
+    """(xmin, ymin, xmax, ymax) box (inclusive) of a mask of ``from_shape`` in an image of ``to_shape``."""
+    xmin, ymin, xmax, ymax = bbox
+    y0, y1, x0, x1 = scale_bbox((ymin, ymax + 1, xmin, xmax + 1), from_shape, to_shape)
+    return x0, y0, x1 - 1, y1 - 1
+
+
+def window_to_mask(window, frame_shape, shape):
+    """(x0, y0, x1, y1) window of a frame as a window of a mask of ``shape``."""
+    x0, y0, x1, y1 = window
+    y0, y1, x0, x1 = scale_bbox((y0, y1, x0, x1), frame_shape, shape)
+    return x0, y0, x1, y1
@@ -14,7 +14,6 @@ Author: Coconut Segmentation Project
 
 import cv2
 import numpy as np
-from scipy import ndimage
 
 # Avoid division by zero
 EPS = 1e-8
@@ -47,104 +46,182 @@ PARAMS = {
 }
 
 
+class Component(dict):
+    """
+    Connected component as a dict, backed by the shared label image.
+
+    'area', 'bbox', 'centroid' and 'slice' (bbox window of the label
+    image) are filled in from the labeling stats. The pixel data is only
+    built when first looked up (``comp['key']``; ``get`` / ``in`` do not
+    build it):
+    - 'local_mask': boolean mask of the component within its bbox window
+    - 'mask': full-frame uint8 mask
+    - 'coords': (N, 2) array of (row, col) coordinates
+    """
+
+    def __init__(self, labels, label_id, **props):
+        super().__init__(props)
+        self.labels = labels
+        self.label_id = label_id
+
+    def __missing__(self, key):
+        ys, xs = self['slice']
+        if key == 'local_mask':
+            value = self.labels[ys, xs] == self.label_id
+        elif key == 'mask':
+            value = np.zeros(self.labels.shape, dtype=np.uint8)
+            value[ys, xs] = self['local_mask']
+        elif key == 'coords':
+            rows, cols = np.nonzero(self['local_mask'])
+            value = np.stack([rows + ys.start, cols + xs.start], axis=1)
+        else:
+            raise KeyError(key)
+        self[key] = value
+        return value
+
+
 def connected_components_props(binary_mask):
     """
     Get connected components with properties.
     
-    Returns list of dicts with:
-    - 'mask': binary mask of component
+    Returns list of Component dicts with:
+    - 'mask': binary mask of component (built on access)
     - 'area': pixel count
     - 'bbox': (xmin, ymin, xmax, ymax)
     - 'centroid': (cx, cy)
-    - 'coords': array of (row, col) coordinates
+    - 'coords': array of (row, col) coordinates (built on access)
+    - 'local_mask', 'slice': component within its bbox window
+    
+    Components are 4-connected and numbered in raster order of their first
+    pixel, like scipy.ndimage.label.
     """
-    # Label connected components
-    labeled, num_features = ndimage.label(binary_mask)
+    # Label connected components (one shared label image + per-label stats)
+    num_labels, labels, stats, _ = cv2.connectedComponentsWithStats(
+        binary_mask.astype(np.uint8, copy=False), connectivity=4, ltype=cv2.CV_32S
+    )
     
-    if num_features == 0:
+    if num_labels <= 1:
         return []
     
+    left = stats[1:, cv2.CC_STAT_LEFT]
+    top = stats[1:, cv2.CC_STAT_TOP]
+    width = stats[1:, cv2.CC_STAT_WIDTH]
+    height = stats[1:, cv2.CC_STAT_HEIGHT]
+    
+    # First pixel of each component: leftmost one in its top row
+    first_x = np.array([
+        left[i] + np.argmax(labels[top[i], left[i]:left[i] + width[i]] == i + 1)
+        for i in range(num_labels - 1)
+    ])
+    
     components = []
-    for label_id in range(1, num_features + 1):
-        mask = (labeled == label_id).astype(np.uint8)
-        coords = np.array(np.where(mask > 0)).T  # (N, 2) as (row, col)
-        
-        if len(coords) == 0:
-            continue
-        
-        area = len(coords)
-        ymin, ymax = coords[:, 0].min(), coords[:, 0].max()
-        xmin, xmax = coords[:, 1].min(), coords[:, 1].max()
-        cx = (xmin + xmax) / 2
-        cy = (ymin + ymax) / 2
-        
-        components.append({
-            'mask': mask,
-            'area': area,
-            'bbox': (xmin, ymin, xmax, ymax),
-            'centroid': (cx, cy),
-            'coords': coords
-        })
+    for i in np.lexsort((first_x, top)):
+        xmin, ymin = int(left[i]), int(top[i])
+        xmax, ymax = xmin + int(width[i]) - 1, ymin + int(height[i]) - 1
+        components.append(Component(
+            labels, i + 1,
+            area=int(stats[i + 1, cv2.CC_STAT_AREA]),
+            bbox=(xmin, ymin, xmax, ymax),
+            centroid=((xmin + xmax) / 2, (ymin + ymax) / 2),
+            slice=(slice(ymin, ymax + 1), slice(xmin, xmax + 1)),
+        ))
     
     return components
 
 
-def compute_verticality_and_angle(coords):
+def principal_axes(comps):
     """
-    Compute PCA-based verticality measure and main axis angle.
+    PCA-based verticality and main axis angle for a list of components at
+    once, from the second-order central moments of each component's bbox
+    window.
     
-    Returns:
+    Returns (verticality, angle_deg) arrays in component order:
     - verticality: ratio of eigenvalues (higher = straighter/more linear)
     - angle_deg: angle of principal axis (90 = vertical)
     """
-    if len(coords) < 3:
-        return 0.0, 90.0
-    
-    # coords is (N, 2) as (row, col), convert to (x, y) = (col, row)
-    pts = coords.astype(np.float32)
-    X = np.stack([pts[:, 1], pts[:, 0]], axis=1)  # (x, y)
-    
-    # Center the points
-    Xc = X - X.mean(axis=0)
+    n = np.array([c['area'] for c in comps], dtype=np.float64)
+    mu = np.array([
+        [m['mu20'], m['mu11'], m['mu02']]
+        for m in (cv2.moments(c['local_mask'].view(np.uint8), binaryImage=True) for c in comps)
+    ]).reshape(-1, 3)
     
-    # Compute covariance matrix
-    cov = np.cov(Xc, rowvar=False)
+    # Covariance matrix [[a, b], [b, c]] of (x, y), as np.cov
+    a, b, c = (mu / np.maximum(n - 1, 1)[:, None]).T
     
-    try:
-        eigenvalues, eigenvectors = np.linalg.eigh(cov)
-    except Exception:
-        return 0.0, 90.0
-    
-    # Sort by eigenvalue descending
-    idx = np.argsort(eigenvalues)[::-1]
-    eigenvalues = eigenvalues[idx]
-    eigenvectors = eigenvectors[:, idx]
+    # Eigenvalues: largest from the trace, smallest from the determinant
+    l1 = (a + c) / 2 + np.sqrt(((a - c) / 2) ** 2 + b * b)
+    l2 = (a * c - b * b) / np.where(l1 > 0, l1, 1.0)
     
     # Verticality: ratio of first to second eigenvalue
-    if eigenvalues[1] <= 0:
-        verticality = eigenvalues[0] / EPS
-    else:
-        verticality = eigenvalues[0] / (eigenvalues[1] + EPS)
+    verticality = np.where(l2 <= 0, l1 / EPS, l1 / (np.maximum(l2, 0) + EPS))
     
-    # Angle of principal axis
-    vx, vy = eigenvectors[:, 0]
-    angle_rad = np.arctan2(vy, vx)
-    angle_deg = abs(angle_rad * 180.0 / np.pi)
+    # Angle of principal axis to the x axis, 0..90 (90 = vertical; also for round blobs)
+    angle_deg = np.abs(np.degrees(0.5 * np.arctan2(2 * b, a - c)))
+    angle_deg = np.where((a == c) & (b == 0), 90.0, angle_deg)
     
-    # Convert to "how vertical" (90 is perfectly vertical)
-    if angle_deg > 90:
-        angle_deg = 180 - angle_deg
-    
-    return verticality, angle_deg
+    few = n < 3
+    return np.where(few, 0.0, verticality), np.where(few, 90.0, angle_deg)
 
 
-def dilate_mask(mask, img_shape, kernel_frac=(0.02, 0.02)):
-    """Dilate mask with kernel sized as fraction of image dimensions."""
+def dilation_kernel(img_shape, kernel_frac=(0.02, 0.02)):
+    """Elliptical kernel sized as fraction of image dimensions."""
     h, w = img_shape[:2]
     kh = max(3, int(kernel_frac[0] * h))
     kw = max(3, int(kernel_frac[1] * w))
-    kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (kw, kh))
-    return cv2.dilate(mask.astype(np.uint8), kernel, iterations=1)
+    return cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (kw, kh))
+
+
+def padded_window(bbox, kernel, img_shape):
+    """
+    (row slice, col slice) of ``bbox`` (xmin, ymin, xmax, ymax) padded by
+    the kernel half-size and clipped to the image: a dilation by ``kernel``
+    of pixels inside the bbox never reaches outside this window.
+    """
+    h, w = img_shape[:2]
+    xmin, ymin, xmax, ymax = bbox
+    pad_y, pad_x = kernel.shape[0] // 2, kernel.shape[1] // 2
+    return (slice(max(0, ymin - pad_y), min(h, ymax + pad_y + 1)),
+            slice(max(0, xmin - pad_x), min(w, xmax + pad_x + 1)))
+
+
+def dilate_mask(mask, img_shape, kernel_frac=(0.02, 0.02)):
+    """Dilate mask with kernel sized as fraction of image dimensions.
+    
+    Only the window around the mask's bbox is dilated.
+    """
+    out = np.zeros(mask.shape[:2], dtype=np.uint8)
+    rows = np.flatnonzero(mask.any(axis=1))
+    if len(rows) == 0:
+        return out
+    cols = np.flatnonzero(mask.any(axis=0))
+    kernel = dilation_kernel(img_shape, kernel_frac)
+    window = padded_window((cols[0], rows[0], cols[-1], rows[-1]), kernel, img_shape)
+    out[window] = cv2.dilate(mask[window].astype(np.uint8), kernel, iterations=1)
+    return out
+
+
+def dilate_component(comp, img_shape, kernel_frac=(0.02, 0.02)):
+    """
+    Dilate a component within its padded bbox window.
+    
+    Returns (window, dilated): ``dilated`` is the uint8 dilation of the
+    component over ``window`` (see padded_window); it is zero outside.
+    """
+    kernel = dilation_kernel(img_shape, kernel_frac)
+    window = padded_window(comp['bbox'], kernel, img_shape)
+    local = np.zeros((window[0].stop - window[0].start, window[1].stop - window[1].start), dtype=np.uint8)
+    ys, xs = comp['slice']
+    local[ys.start - window[0].start:ys.stop - window[0].start,
+          xs.start - window[1].start:xs.stop - window[1].start] = comp['local_mask']
+    return window, cv2.dilate(local, kernel, iterations=1)
+
+
+def dilate_component_full(comp, img_shape, kernel_frac=(0.02, 0.02)):
+    """dilate_mask(comp['mask']) computed within the component's window."""
+    window, dilated = dilate_component(comp, img_shape, kernel_frac)
+    out = np.zeros(img_shape[:2], dtype=np.uint8)
+    out[window] = dilated
+    return out
 
 
 def create_vertical_corridor(stem_comp, img_shape, corridor_width_frac=0.15):
@@ -183,11 +260,29 @@ def create_vertical_corridor(stem_comp, img_shape, corridor_width_frac=0.15):
     return corridor
 
 
-def overlap_fraction(mask_a, mask_b):
-    """Fraction of mask_b that overlaps with mask_a."""
-    inter = np.logical_and(mask_a > 0, mask_b > 0).sum()
-    denom = mask_b.sum() + EPS
-    return inter / denom
+def component_overlaps(zone, comps):
+    """
+    Overlap fraction of each component with ``zone`` (share of its pixels
+    inside the zone) for all components of one connected_components_props
+    call, from one histogram of the label ids inside the zone.
+    """
+    if not comps:
+        return np.zeros(0)
+    labels = comps[0].labels
+    inter = np.bincount(labels[zone > 0], minlength=max(c.label_id for c in comps) + 1)
+    return np.array([inter[c.label_id] / (c['area'] + EPS) for c in comps])
+
+
+def components_mask(comps, img_shape, keep=None):
+    """
+    uint8 union of components of one connected_components_props call
+    (those where ``keep`` is True, if given), with a single label lookup.
+    """
+    if keep is not None:
+        comps = [c for c, k in zip(comps, keep) if k]
+    if not comps:
+        return np.zeros(img_shape[:2], dtype=np.uint8)
+    return np.isin(comps[0].labels, [c.label_id for c in comps]).astype(np.uint8)
 
 
 def compute_stem_scores(stem_comps, leaf_mask, bud_mask, img_shape, params=None):
@@ -217,85 +312,84 @@ def compute_stem_scores(stem_comps, leaf_mask, bud_mask, img_shape, params=None)
     
     # Combined leaf+bud mask for connection checking
     lb_mask = np.logical_or(leaf_mask > 0, bud_mask > 0).astype(np.uint8)
-    
-    # Collect raw features
-    features = []
-    for comp in stem_comps:
-        area = comp['area']
-        xmin, ymin, xmax, ymax = comp['bbox']
-        width = xmax - xmin
-        height = ymax - ymin
-        cx, cy = comp['centroid']
-        
-        # Aspect ratio (height / width)
-        aspect = height / (width + EPS)
-        
-        # Verticality from PCA
-        verticality, angle_deg = compute_verticality_and_angle(comp['coords'])
-        
-        # Bottom reach: does stem extend to bottom of image?
-        bottom_reach = 1.0 if (ymax >= (h - bottom_margin)) else 0.0
-        
-        # Connected fraction: how much leaf/bud is near this stem?
-        stem_dil = dilate_mask(comp['mask'], img_shape, params['DILATE_KERNEL_FRAC'])
-        connected_frac = overlap_fraction(stem_dil, lb_mask)
-        
-        # Distance from center
-        center_dist = np.sqrt((cx - img_center[0])**2 + (cy - img_center[1])**2)
-        max_dist = np.sqrt(img_center[0]**2 + img_center[1]**2)
-        
-        features.append({
-            'comp': comp,
-            'area': area / img_area,
-            'center_dist': center_dist / (max_dist + EPS),
-            'aspect': aspect,
-            'verticality': verticality,
-            'angle_deg': angle_deg,
-            'bottom_reach': bottom_reach,
-            'connected_frac': connected_frac,
-            'width': width / (w + EPS)
-        })
+    lb_total = int(lb_mask.sum())
+    
+    # Raw features of all candidates (area, bbox and centroid from the labeling stats)
+    area = np.array([comp['area'] for comp in stem_comps], dtype=np.float64)
+    xmin, ymin, xmax, ymax = np.array([comp['bbox'] for comp in stem_comps]).T
+    width = xmax - xmin
+    height = ymax - ymin
+    cx, cy = np.array([comp['centroid'] for comp in stem_comps]).T
+    
+    # Aspect ratio (height / width)
+    aspect = height / (width + EPS)
+    
+    # Verticality from the principal axes (second-order moments)
+    verticality, angle_deg = principal_axes(stem_comps)
+    
+    # Bottom reach: does stem extend to bottom of image?
+    bottom_reach = (ymax >= (h - bottom_margin)).astype(np.float32)
+    
+    # Connected fraction: how much leaf/bud is near this stem?
+    # (leaf/bud pixels only count inside the dilated stem's window; the
+    # dilated stems can overlap, so each candidate is dilated on its own)
+    connected_frac = np.zeros(len(stem_comps))
+    if lb_total > 0:
+        for i, comp in enumerate(stem_comps):
+            window, stem_dil = dilate_component(comp, img_shape, params['DILATE_KERNEL_FRAC'])
+            inter = np.count_nonzero(np.logical_and(stem_dil > 0, lb_mask[window] > 0))
+            connected_frac[i] = inter / (lb_total + EPS)
+    
+    # Distance from center
+    center_dist = np.sqrt((cx - img_center[0])**2 + (cy - img_center[1])**2)
+    max_dist = np.sqrt(img_center[0]**2 + img_center[1]**2)
+    center_dist = center_dist / (max_dist + EPS)
+    
+    area = area / img_area
+    width = width / (w + EPS)
     
     # Normalize features to [0, 1]
     def normalize(values):
-        arr = np.array(values, dtype=np.float32)
+        arr = np.asarray(values, dtype=np.float32)
         mn, mx = arr.min(), arr.max()
         if mx - mn < EPS:
             return np.ones_like(arr) * 0.5
         return (arr - mn) / (mx - mn + EPS)
     
-    n_area = normalize([f['area'] for f in features])
-    n_center = normalize([f['center_dist'] for f in features])
-    n_aspect = normalize([f['aspect'] for f in features])
-    n_vertical = normalize([f['verticality'] for f in features])
-    n_connected = normalize([f['connected_frac'] for f in features])
-    n_width = normalize([f['width'] for f in features])
-    
-    # Compute scores
-    scored = []
-    for i, feat in enumerate(features):
-        # Combine verticality and aspect for vertical score
-        vert_score = (n_vertical[i] + n_aspect[i]) / 2.0
-        
-        score = (
-            params['w_area'] * n_area[i]
-            + params['w_center'] * (1.0 - n_center[i])  # closer to center = higher
-            + params['w_vertical'] * vert_score
-            + params['w_bottom'] * feat['bottom_reach']
-            + params['w_connected'] * n_connected[i]
-            - params['w_width'] * n_width[i]  # penalize very wide blobs
-        )
-        
-        scored.append({
-            'comp': feat['comp'],
-            'score': float(score),
-            'area': feat['area'],
-            'center_dist': feat['center_dist'],
-            'verticality': feat['verticality'],
-            'angle_deg': feat['angle_deg'],
-            'bottom_reach': feat['bottom_reach'],
-            'connected_frac': feat['connected_frac']
-        })
+    n_area = normalize(area)
+    n_center = normalize(center_dist)
+    n_aspect = normalize(aspect)
+    n_vertical = normalize(verticality)
+    n_connected = normalize(connected_frac)
+    n_width = normalize(width)
+    
+    # Combine verticality and aspect for vertical score
+    vert_score = (n_vertical + n_aspect) / 2.0
+    
+    scores = (
+        params['w_area'] * n_area
+        + params['w_center'] * (1.0 - n_center)  # closer to center = higher
+        + params['w_vertical'] * vert_score
+        + params['w_bottom'] * bottom_reach
+        + params['w_connected'] * n_connected
+        - params['w_width'] * n_width  # penalize very wide blobs
+    )
+    
+    scored = [
+        {
+            'comp': comp,
+            'score': score,
+            'area': a,
+            'center_dist': d,
+            'verticality': v,
+            'angle_deg': angle,
+            'bottom_reach': bottom,
+            'connected_frac': frac
+        }
+        for comp, score, a, d, v, angle, bottom, frac in zip(
+            stem_comps, scores.tolist(), area.tolist(), center_dist.tolist(), verticality.tolist(),
+            angle_deg.tolist(), bottom_reach.tolist(), connected_frac.tolist())
+    ]
     
     # Sort by score descending
     scored.sort(key=lambda x: x['score'], reverse=True)
@@ -390,41 +484,32 @@ def get_connected_parts(main_stem_comp, leaf_comps, bud_comps, img_shape, params
     crown_zone[crown_ymin:crown_ymax, crown_xmin:crown_xmax] = 1
     
     # Dilate stem for direct connection
-    stem_dil = dilate_mask(stem_mask, img_shape, params['DILATE_KERNEL_FRAC'])
+    stem_dil = dilate_component_full(main_stem_comp, img_shape, params['DILATE_KERNEL_FRAC'])
     
     # ========== STEP 1: Find buds connected to stem (crown zone) ==========
     bud_connection_zone = np.logical_or(stem_dil > 0, crown_zone > 0).astype(np.uint8)
     
-    kept_buds = np.zeros((h, w), dtype=np.uint8)
-    kept_bud_comps = []
-    
-    for bud in bud_comps:
-        # Bud must be in vertical corridor AND connected to stem/crown
-        in_corridor = overlap_fraction(vertical_corridor, bud['mask']) > 0.3
-        is_connected = overlap_fraction(bud_connection_zone, bud['mask']) > 0.001
-        
-        if in_corridor and is_connected:
-            kept_buds = np.logical_or(kept_buds, bud['mask']).astype(np.uint8)
-            kept_bud_comps.append(bud)
+    # Bud must be in vertical corridor AND connected to stem/crown
+    in_corridor = component_overlaps(vertical_corridor, bud_comps) > 0.3
+    is_connected = component_overlaps(bud_connection_zone, bud_comps) > 0.001
+    kept_bud_comps = [bud for bud, keep in zip(bud_comps, in_corridor & is_connected) if keep]
+    kept_buds = components_mask(kept_bud_comps, img_shape)
     
     # ========== STEP 2: Find leaves connected to buds ==========
     kept_leaves = np.zeros((h, w), dtype=np.uint8)
     
     # Only look for leaves if buds were found
-    if kept_buds.sum() > 0:
+    if kept_bud_comps:
         # Create leaf connection zone: dilated buds + area around buds
         bud_dil = dilate_mask(kept_buds, img_shape, (0.03, 0.03))
         
         # Also allow leaves in the crown zone (above/around stem top)
         leaf_connection_zone = np.logical_or(bud_dil > 0, crown_zone > 0).astype(np.uint8)
         
-        for leaf in leaf_comps:
-            # Leaf must be in vertical corridor AND connected to buds
-            in_corridor = overlap_fraction(vertical_corridor, leaf['mask']) > 0.3
-            is_connected_to_bud = overlap_fraction(leaf_connection_zone, leaf['mask']) > 0.001
-            
-            if in_corridor and is_connected_to_bud:
-                kept_leaves = np.logical_or(kept_leaves, leaf['mask']).astype(np.uint8)
+        # Leaf must be in vertical corridor AND connected to buds
+        in_corridor = component_overlaps(vertical_corridor, leaf_comps) > 0.3
+        is_connected_to_bud = component_overlaps(leaf_connection_zone, leaf_comps) > 0.001
+        kept_leaves = components_mask(leaf_comps, img_shape, in_corridor & is_connected_to_bud)
     
     # If no buds found, check if leaves are directly at stem top (crown close-up)
     # This handles cases where bud is small/not visible but leaves are attached
@@ -435,12 +520,9 @@ def get_connected_parts(main_stem_comp, leaf_comps, bud_comps, img_shape, params
         stem_top_zone[max(0,ymin-top_margin):ymin+int(0.1*stem_h), crown_xmin:crown_xmax] = 1
         stem_top_zone = np.logical_or(stem_top_zone > 0, stem_dil > 0).astype(np.uint8)
         
-        for leaf in leaf_comps:
-            in_corridor = overlap_fraction(vertical_corridor, leaf['mask']) > 0.3
-            at_stem_top = overlap_fraction(stem_top_zone, leaf['mask']) > 0.1  # Strict: 10% overlap
-            
-            if in_corridor and at_stem_top:
-                kept_leaves = np.logical_or(kept_leaves, leaf['mask']).astype(np.uint8)
+        in_corridor = component_overlaps(vertical_corridor, leaf_comps) > 0.3
+        at_stem_top = component_overlaps(stem_top_zone, leaf_comps) > 0.1  # Strict: 10% overlap
+        kept_leaves = components_mask(leaf_comps, img_shape, in_corridor & at_stem_top)
     
     return {
         'stem': stem_mask,
@@ -537,28 +619,23 @@ def smart_postprocess(pred_mask, img_shape, params=None, debug=False):
                       (x['centroid'][0] - img_center[0])**2 + (x['centroid'][1] - img_center[1])**2)
             
             # Use larger dilation for close-ups (5% of image instead of 3%)
-            main_dil = dilate_mask(main['mask'], img_shape, (0.05, 0.05))
+            main_dil = dilate_component_full(main, img_shape, (0.05, 0.05))
             
             # Keep all leaves/buds that overlap with dilated center part
-            for leaf in leaf_comps:
-                if overlap_fraction(main_dil, leaf['mask']) > 0.001:
-                    filtered_leaf = np.logical_or(filtered_leaf, leaf['mask']).astype(np.uint8)
-            
-            for bud in bud_comps:
-                if overlap_fraction(main_dil, bud['mask']) > 0.001:
-                    filtered_bud = np.logical_or(filtered_bud, bud['mask']).astype(np.uint8)
+            keep_leaf = component_overlaps(main_dil, leaf_comps) > 0.001
+            keep_bud = component_overlaps(main_dil, bud_comps) > 0.001
+            filtered_leaf = components_mask(leaf_comps, img_shape, keep_leaf)
+            filtered_bud = components_mask(bud_comps, img_shape, keep_bud)
             
             # Also check for connected stem
-            for stem in stem_comps:
-                if overlap_fraction(main_dil, stem['mask']) > 0.001:
-                    filtered_stem = np.logical_or(filtered_stem, stem['mask']).astype(np.uint8)
+            keep_stem = component_overlaps(main_dil, stem_comps) > 0.001
+            filtered_stem = components_mask(stem_comps, img_shape, keep_stem)
             
             # If we kept buds but no leaves, also check leaves connected to buds
-            if filtered_bud.sum() > 0 and filtered_leaf.sum() == 0:
+            if keep_bud.any() and not keep_leaf.any():
                 bud_dil = dilate_mask(filtered_bud, img_shape, (0.05, 0.05))
-                for leaf in leaf_comps:
-                    if overlap_fraction(bud_dil, leaf['mask']) > 0.001:
-                        filtered_leaf = np.logical_or(filtered_leaf, leaf['mask']).astype(np.uint8)
+                keep_leaf = component_overlaps(bud_dil, leaf_comps) > 0.001
+                filtered_leaf = components_mask(leaf_comps, img_shape, keep_leaf)
 
     else:
         # CASE 3: General case - score stems and pick best
@@ -596,15 +673,12 @@ def smart_postprocess(pred_mask, img_shape, params=None, debug=False):
             all_parts = leaf_comps + bud_comps
             if all_parts:
                 main = max(all_parts, key=lambda x: x['area'])
-                main_dil = dilate_mask(main['mask'], img_shape, (0.03, 0.03))
+                main_dil = dilate_component_full(main, img_shape, (0.03, 0.03))
                 
-                for leaf in leaf_comps:
-                    if overlap_fraction(main_dil, leaf['mask']) > 0.001:
-                        filtered_leaf = np.logical_or(filtered_leaf, leaf['mask']).astype(np.uint8)
-                
-                for bud in bud_comps:
-                    if overlap_fraction(main_dil, bud['mask']) > 0.001:
-                        filtered_bud = np.logical_or(filtered_bud, bud['mask']).astype(np.uint8)
+                keep_leaf = component_overlaps(main_dil, leaf_comps) > 0.001
+                keep_bud = component_overlaps(main_dil, bud_comps) > 0.001
+                filtered_leaf = components_mask(leaf_comps, img_shape, keep_leaf)
+                filtered_bud = components_mask(bud_comps, img_shape, keep_bud)
     
     # Reconstruct filtered mask
     filtered_mask = np.zeros((h, w), dtype=np.uint8)
@@ -712,6 +786,10 @@ class StemTracker:
             # Keep old track for temporal smoothing
             return self.track['bbox'], False
     
+    def is_stable(self):
+        """True once the current track has been matched ``min_consistent`` times."""
+        return self.track is not None and self.track['hits'] >= self.min_consistent
+    
     def reset(self):
         """Reset tracker state."""
         self.track = None
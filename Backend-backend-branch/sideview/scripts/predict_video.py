@@ -21,6 +21,9 @@ Usage:
     python predict_video.py --video "path/to/video.mp4" --debug
     python predict_video.py --folder "path/to/folder"
     python predict_video.py --video video.mp4 --frame-interval 5
+    python predict_video.py --video video.mp4 --runtime onnx --batch-size 8
+    python predict_video.py --video video.mp4 --keyframes --frame-interval 2
+    python predict_video.py --video video.mp4 --model-res
 """
 
 import os
@@ -31,7 +34,6 @@ import torch
 from pathlib import Path
 from datetime import datetime
 import argparse
-from PIL import Image
 from tqdm import tqdm
 import sys
 
@@ -62,6 +64,33 @@ from postprocess_utils import (
     StemTracker,
     PARAMS
 )
+from segmenter_runtime import RUNTIMES, SEGMENTER_BATCH_SIZE, get_segmenter_runtime
+from frame_sources import (
+    FRAME_SOURCES,
+    SAMPLING_MODES,
+    SAMPLING_MODE,
+    FrameFetcher,
+    MotionAdaptiveFrameSource,
+    estimate_gop_size,
+    open_frame_source
+)
+from analysis_proxy import PROXY_ENABLED, make_analysis_proxy
+from stage_pipeline import StagePipeline
+from frame_dedup import DEDUP_ENABLED, FrameDeduplicator
+from frame_quality import QUALITY_GATE_ENABLED, QualityGate
+from mask_propagation import KEYFRAMES_ENABLED, MaskPropagator, propagate_mask
+from roi_inference import (
+    ROI_ENABLED,
+    ROI_INPUT,
+    ROI_REFRESH,
+    roi_input_image,
+    roi_mask,
+    roi_window,
+    tree_bbox
+)
+from model_resolution import MODEL_RES_ENABLED, box_to_frame, mask_shape, window_to_mask
+from crop_utils import mask_bbox, save_frame_crops
+from shm_pool import POSTPROCESS_WORKERS, PostprocessPool
 
 
 # ============ CONFIGURATION ============
@@ -73,9 +102,6 @@ RESULTS_DIR = BASE_DIR / "results"
 IMG_SIZE = 512
 NUM_CLASSES = 4
 
-# Image quality settings
-PNG_COMPRESSION = 0  # Lossless
-
 # Video settings
 VIDEO_FPS = None  # None = use original FPS
 DEFAULT_FRAME_INTERVAL = 1  # 1 = every frame
@@ -100,20 +126,116 @@ VIDEO_TRACKING_PARAMS = {
 }
 
 
+def get_device():
+    """Torch device used for segmentation."""
+    return torch.device("cuda" if torch.cuda.is_available() else "cpu")
+
+
+def load_segmentation_model(model_path=None, device=None):
+    """Load the trained UNet++ model"""
+    if model_path is None:
+        model_path = MODEL_DIR / "coconut_best_dice.pth"
+    if device is None:
+        device = get_device()
+
+    model = smp.UnetPlusPlus(
+        encoder_name="efficientnet-b3",
+        encoder_weights=None,
+        in_channels=3,
+        classes=NUM_CLASSES,
+    )
+    
+    checkpoint = torch.load(model_path, map_location=device, weights_only=False)
+    if 'model_state_dict' in checkpoint:
+        model.load_state_dict(checkpoint['model_state_dict'])
+        print(f"📊 Model mIoU: {checkpoint.get('miou', 'N/A'):.4f}")
+    else:
+        model.load_state_dict(checkpoint)
+    
+    model = model.to(device)
+    model.eval()
+    print(f"✅ Model loaded: {Path(model_path).name}")
+    return model
+
+
 class VideoSegmenter:
     """Segmentation pipeline for coconut tree videos with smart postprocessing and tracking"""
     
-    def __init__(self, model_path=None, debug=False):
-        self.device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
+    def __init__(self, model_path=None, debug=False, model=None, runtime=None, batch_size=None,
+                 frame_source=None, pipelined=True, postprocess_workers=None, sampling=None,
+                 dedup=None, analysis_proxy=None, keyframes=None, roi=None, quality_gate=None,
+                 model_res=None):
+        """
+        Args:
+            model_path: UNet++ checkpoint (default: model/coconut_best_dice.pth)
+            debug: generate debug outputs
+            model: already loaded UNet++ module to reuse (e.g. from the
+                model registry); ``model_path`` is ignored when given
+            runtime: segmenter runtime (see segmenter_runtime.RUNTIMES);
+                defaults to SIDEVIEW_SEGMENTER_RUNTIME
+            batch_size: frames per forward pass; defaults to
+                SIDEVIEW_SEGMENTER_BATCH
+            frame_source: how sampled frames are decoded (see
+                frame_sources.FRAME_SOURCES); defaults to SIDEVIEW_FRAME_SOURCE
+            pipelined: run decode, segmentation, postprocessing, video
+                writing and crop saving on separate threads (see
+                stage_pipeline.py); False runs them serially
+            postprocess_workers: processes for postprocessing and crop
+                saving, with frames passed through shared memory (see
+                shm_pool.py); 0 keeps them in the pipeline threads.
+                Defaults to SIDEVIEW_POSTPROCESS_WORKERS
+            sampling: "fixed" (every frame_interval-th frame) or "adaptive"
+                (motion-driven, see frame_sources.MotionAdaptiveFrameSource);
+                defaults to SIDEVIEW_SAMPLING
+            dedup: reuse the segmentation and crop classifications of the
+                previous frame for near-identical frames (perceptual hash,
+                see frame_dedup.py); defaults to SIDEVIEW_DEDUP
+            analysis_proxy: segment a downscaled copy of large videos and
+                cut only the classified crops from full-resolution frames
+                (see analysis_proxy.py); defaults to SIDEVIEW_ANALYSIS_PROXY
+            keyframes: segment keyframes only and warp their masks onto the
+                frames in between with optical flow (see
+                mask_propagation.py); frames are then segmented and tracked
+                one at a time so a stem lost on a propagated frame makes
+                the next frame a keyframe. Defaults to SIDEVIEW_KEYFRAMES
+            roi: once the stem track is stable, segment a window around the
+                tracked tree with a smaller model input (see
+                roi_inference.py); frames are then segmented and tracked
+                one at a time so each window comes from the previous
+                frame's track. Defaults to SIDEVIEW_ROI_INFERENCE
+            quality_gate: drop blurred, motion-blurred and badly exposed
+                frames before segmentation (see frame_quality.py);
+                defaults to SIDEVIEW_QUALITY_GATE
+            model_res: postprocess and track at model resolution and
+                upscale the filtered mask only inside the crop bboxes (see
+                model_resolution.py); defaults to
+                SIDEVIEW_MODEL_RES_POSTPROCESS
+        """
         self.debug = debug
-        print(f"🔧 Device: {self.device}")
-        
-        # Load model
-        if model_path is None:
-            model_path = MODEL_DIR / "coconut_best_dice.pth"
+        self.batch_size = max(1, batch_size or SEGMENTER_BATCH_SIZE)
+        self.frame_source = frame_source
+        self.pipelined = pipelined
+        self.postprocess_workers = POSTPROCESS_WORKERS if postprocess_workers is None else postprocess_workers
+        self.sampling = sampling or SAMPLING_MODE
+        if self.sampling not in SAMPLING_MODES:
+            raise ValueError(f"Unknown sampling mode '{self.sampling}'. Choose from {SAMPLING_MODES}")
+        self.dedup = DEDUP_ENABLED if dedup is None else dedup
+        self.analysis_proxy = PROXY_ENABLED if analysis_proxy is None else analysis_proxy
+        self.keyframes = KEYFRAMES_ENABLED if keyframes is None else keyframes
+        self.roi = ROI_ENABLED if roi is None else roi
+        self.quality_gate = QUALITY_GATE_ENABLED if quality_gate is None else quality_gate
+        self.model_res = MODEL_RES_ENABLED if model_res is None else model_res
+        
+        if model is not None:
+            self.model = model
+            self.device = next(model.parameters()).device
+        else:
+            self.device = get_device()
+            print(f"🔧 Device: {self.device}")
+            self.model = load_segmentation_model(model_path, self.device)
         
-        self.model = self._load_model(model_path)
-        print(f"✅ Model loaded: {model_path.name}")
+        self.runtime = get_segmenter_runtime(self.model, runtime, IMG_SIZE)
+        self.roi_runtime = get_segmenter_runtime(self.model, runtime, ROI_INPUT) if self.roi else None
         
         # Create output directory
         RESULTS_DIR.mkdir(parents=True, exist_ok=True)
@@ -121,64 +243,76 @@ class VideoSegmenter:
         # Initialize stem tracker (reset per video)
         self.tracker = None
     
-    def _load_model(self, model_path):
-        """Load the trained UNet++ model"""
-        model = smp.UnetPlusPlus(
-            encoder_name="efficientnet-b3",
-            encoder_weights=None,
-            in_channels=3,
-            classes=NUM_CLASSES,
-        )
-        
-        checkpoint = torch.load(model_path, map_location=self.device, weights_only=False)
-        if 'model_state_dict' in checkpoint:
-            model.load_state_dict(checkpoint['model_state_dict'])
-            print(f"📊 Model mIoU: {checkpoint.get('miou', 'N/A'):.4f}")
-        else:
-            model.load_state_dict(checkpoint)
-        
-        model = model.to(self.device)
-        model.eval()
-        return model
+    def _mask_shape(self, frame_shape):
+        """(h, w) of the label masks for frames of ``frame_shape``"""
+        return mask_shape(frame_shape) if self.model_res else tuple(frame_shape[:2])
     
     def _inference(self, img_rgb):
         """Run model inference on single frame"""
-        orig_h, orig_w = img_rgb.shape[:2]
-        
+        return self._inference_batch([img_rgb])[0]
+    
+    def _inference_batch(self, frames_rgb):
+        """Run model inference on a list of frames (one forward pass)"""
         # Preprocess
-        resized = cv2.resize(img_rgb, (IMG_SIZE, IMG_SIZE))
-        tensor = torch.from_numpy(resized).permute(2, 0, 1).float().unsqueeze(0) / 255.0
-        tensor = tensor.to(self.device)
+        batch = np.stack([cv2.resize(img, (IMG_SIZE, IMG_SIZE)) for img in frames_rgb])
         
         # Predict
-        with torch.no_grad():
-            logits = self.model(tensor)
-            pred = logits.argmax(dim=1).cpu().numpy()[0]
-        
-        # Resize to original size
-        pred = cv2.resize(pred.astype(np.uint8), (orig_w, orig_h), 
-                         interpolation=cv2.INTER_NEAREST)
+        preds = self.runtime(batch)
         
-        return pred
+        # Resize to original size (model resolution in model_res mode)
+        return [
+            cv2.resize(pred, self._mask_shape(img.shape)[::-1], interpolation=cv2.INTER_NEAREST)
+            for img, pred in zip(frames_rgb, preds)
+        ]
+    
+    def _inference_windows(self, frames_rgb, windows):
+        """Masks for frames segmented in full (window None) or in an ROI window"""
+        preds = [None] * len(frames_rgb)
+        full = [i for i, window in enumerate(windows) if window is None]
+        roi = [i for i, window in enumerate(windows) if window is not None]
+        if full:
+            for i, pred in zip(full, self._inference_batch([frames_rgb[i] for i in full])):
+                preds[i] = pred
+        if roi:
+            batch = np.stack([roi_input_image(frames_rgb[i], windows[i]) for i in roi])
+            for i, pred in zip(roi, self.roi_runtime(batch)):
+                shape = self._mask_shape(frames_rgb[i].shape)
+                preds[i] = roi_mask(shape, window_to_mask(windows[i], frames_rgb[i].shape, shape), pred)
+        return preds
+    
+    def _iter_frame_batches(self, source, gate=None, batch_size=None):
+        """Yield lists of up to ``batch_size`` (frame_idx, frame_rgb) pairs
+
+        Frames rejected by ``gate`` (a frame_quality.QualityGate) are dropped.
+        """
+        batch_size = batch_size or self.batch_size
+        batch = []
+        # Only frames at the target fps are retrieved; the source decodes
+        # sequentially or seeks, whichever is cheaper for this video
+        for frame_idx, frame_bgr in source:
+            frame_rgb = cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2RGB)
+            if gate is not None and not gate.check(frame_rgb)[0]:
+                continue
+            batch.append((frame_idx, frame_rgb))
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
     
     def _get_main_stem_bbox(self, pred_mask, img_shape):
         """Extract bounding box of the main stem from filtered prediction."""
-        stem_mask = (pred_mask == 3).astype(np.uint8)
-        if stem_mask.sum() == 0:
-            return None
-        
-        coords = np.where(stem_mask > 0)
-        if len(coords[0]) == 0:
-            return None
-        
-        ymin, ymax = coords[0].min(), coords[0].max()
-        xmin, xmax = coords[1].min(), coords[1].max()
-        
-        return (xmin, ymin, xmax, ymax)
+        return mask_bbox(pred_mask, 3)
     
     def predict(self, video_path, output_dir=None, frame_interval=DEFAULT_FRAME_INTERVAL,
-                crop_size=0, pad_bg=(255, 255, 255)):
-        """Process a video file with smart postprocessing and tracking"""
+                crop_size=0, pad_bg=(255, 255, 255), crop_callback=None):
+        """Process a video file with smart postprocessing and tracking
+
+        If ``crop_callback`` is given it is called as
+        ``crop_callback(frame_idx, class_name, rgb_crop, path)`` for every full
+        RGB crop, so callers can classify crops in memory instead of
+        re-reading the saved PNGs.
+        """
         video_path = Path(video_path)
         
         # Open video
@@ -191,6 +325,17 @@ class VideoSegmenter:
         width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
         height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
         total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        full_width, full_height = width, height
+        
+        # Analysis proxy: everything below runs on the downscaled copy; the
+        # full-resolution capture only serves frames for classifier crops
+        full_res = None
+        proxy_path = make_analysis_proxy(video_path) if self.analysis_proxy else None
+        if proxy_path is not None:
+            full_res = FrameFetcher(cap, estimate_gop_size(video_path, fps))
+            cap = cv2.VideoCapture(str(proxy_path))
+            width = int(cap.get(cv2.CAP_PROP_FRAME_WIDTH))
+            height = int(cap.get(cv2.CAP_PROP_FRAME_HEIGHT))
         
         # Calculate frame interval for target fps (default 2 fps)
         if frame_interval <= 0:
@@ -200,11 +345,16 @@ class VideoSegmenter:
         output_fps = min(fps / frame_interval, 2.0)  # Cap at 2 fps for output
         
         print(f"\n📹 Video: {video_path.name}")
-        print(f"   Resolution: {width}x{height}")
+        print(f"   Resolution: {full_width}x{full_height}")
+        if full_res is not None:
+            print(f"   Analysis proxy: {width}x{height} ({proxy_path.name})")
         print(f"   Source FPS: {fps:.2f}")
         print(f"   Total Frames: {total_frames}")
         print(f"   Duration: {total_frames/fps:.1f}s")
-        print(f"   Processing: {frames_to_process} frames (~{output_fps:.1f} fps)")
+        if self.sampling == "adaptive":
+            print(f"   Processing: motion-adaptive sampling (fixed rate would be {frames_to_process} frames)")
+        else:
+            print(f"   Processing: {frames_to_process} frames (~{output_fps:.1f} fps)")
         
         # Create output directory
         if output_dir is None:
@@ -226,13 +376,18 @@ class VideoSegmenter:
         fourcc = cv2.VideoWriter_fourcc(*'mp4v')
         out_fps = output_fps  # Use calculated output fps
         
+        # Videos are written at the mask size (model resolution in model_res mode)
+        mask_height, mask_width = self._mask_shape((height, width))
+        if (mask_width, mask_height) != (width, height):
+            print(f"   Postprocessing at model resolution: {mask_width}x{mask_height}")
+        
         overlay_writer = cv2.VideoWriter(
             str(output_dir / "segmented_overlay.mp4"),
-            fourcc, out_fps, (width, height)
+            fourcc, out_fps, (mask_width, mask_height)
         )
         mask_writer = cv2.VideoWriter(
             str(output_dir / "mask_only.mp4"),
-            fourcc, out_fps, (width, height)
+            fourcc, out_fps, (mask_width, mask_height)
         )
         
         # Initialize stem tracker for this video
@@ -249,8 +404,8 @@ class VideoSegmenter:
             "name": video_path.name,
             "output_dir": str(output_dir),
             "video_info": {
-                "width": width,
-                "height": height,
+                "width": full_width,
+                "height": full_height,
                 "fps": fps,
                 "total_frames": total_frames,
                 "duration_seconds": round(total_frames / fps, 2)
@@ -262,7 +417,9 @@ class VideoSegmenter:
             "tracking_stats": {
                 "track_switches": 0,
                 "frames_tracked": 0,
-                "frames_with_detection": 0
+                "frames_with_detection": 0,
+                "roi_inference_frames": 0,
+                "roi_inference_fraction": 0.0
             },
             "files": {}
         }
@@ -271,28 +428,123 @@ class VideoSegmenter:
         extracted_count = 0
         debug_log = []
         
-        pbar = tqdm(total=frames_to_process, desc=f"Processing ({frames_to_process} frames @ {output_fps:.1f}fps)")
-        
-        # Process only frames at target fps by seeking directly (much faster!)
-        for frame_idx in range(0, total_frames, frame_interval):
-            # Seek directly to the frame we need
-            cap.set(cv2.CAP_PROP_POS_FRAMES, frame_idx)
-            ret, frame_bgr = cap.read()
-            if not ret:
-                break
+        if self.sampling == "adaptive":
+            # Number of frames is only known at the end
+            pbar = tqdm(desc="Processing (adaptive sampling)")
+            source = MotionAdaptiveFrameSource(cap, total_frames, fps)
+        else:
+            pbar = tqdm(total=frames_to_process, desc=f"Processing ({frames_to_process} frames @ {output_fps:.1f}fps)")
+            source = open_frame_source(cap, total_frames, frame_interval, proxy_path or video_path, self.frame_source)
+            print(f"   Frame source: {source.strategy} (GOP ~{source.gop_size} frames)")
+        
+        # Near-identical frames reuse the previous frame's results. Dedup
+        # decisions by frame index: (reused frame index or None, hash
+        # distance), written by the segment stage before a frame moves on.
+        deduplicator = FrameDeduplicator() if self.dedup else None
+        # Unusable frames are dropped before any model runs
+        gate = QualityGate() if self.quality_gate else None
+        dedup_decisions = {}
+        last_postprocessed = None
+        last_saved_results = None
+        
+        def reused_from(frame_idx):
+            return dedup_decisions.get(frame_idx, (None, None))[0]
+        
+        # Keyframe mode: only keyframes are segmented, the masks of the
+        # frames in between are propagated with optical flow. Decisions by
+        # frame index: (keyframe reason or None if propagated, flow
+        # confidence); previous_mask is the raw mask of the last segmented
+        # or propagated frame.
+        propagator = MaskPropagator() if self.keyframes else None
+        keyframe_decisions = {}
+        previous_mask = None
+        
+        def propagated(frame_idx):
+            return frame_idx in keyframe_decisions and keyframe_decisions[frame_idx][0] is None
+        
+        # Keyframe and ROI decisions feed back from the tracker. Threaded
+        # stages, segment batches and postprocessing workers would let the
+        # segment stage plan frames a queue depth ahead of tracking, so
+        # frames go through segment -> postprocess -> track one at a time
+        # instead.
+        feedback = propagator is not None or self.roi
+        
+        # ROI inference: window around the tracked tree, set by the
+        # track/write stage from the previous frame while the track is
+        # stable (None: full frame)
+        roi_target = None
+        roi_run = 0
+        segmented_count = 0
+        
+        def next_window():
+            nonlocal roi_run, segmented_count
+            window = roi_target if roi_run < ROI_REFRESH else None
+            roi_run = roi_run + 1 if window is not None else 0
+            segmented_count += 1
+            if window is not None:
+                results["tracking_stats"]["roi_inference_frames"] += 1
+            return window
+        
+        # Pipeline stages (each on its own thread, bounded queues in between):
+        #   decode -> segment -> postprocess -> track/write videos -> save crops
+        # Single-threaded stages and FIFO queues keep frames in order for
+        # the tracker and the video writers.
+        def segment(frame_batch):
+            nonlocal previous_mask
+            if deduplicator is not None:
+                for frame_idx, frame_rgb in frame_batch:
+                    dedup_decisions[frame_idx] = deduplicator.check(frame_idx, frame_rgb)
+            fresh = [(frame_idx, frame_rgb) for frame_idx, frame_rgb in frame_batch
+                     if reused_from(frame_idx) is None]
             
-            frame_rgb = cv2.cvtColor(frame_bgr, cv2.COLOR_BGR2RGB)
+            flows = {}
+            if propagator is not None:
+                for frame_idx, frame_rgb in fresh:
+                    flow, confidence, reason = propagator.plan(frame_idx, frame_rgb)
+                    keyframe_decisions[frame_idx] = (reason, confidence)
+                    if reason is None:
+                        flows[frame_idx] = flow
             
-            # Run model inference
-            raw_pred = self._inference(frame_rgb)
+            # One forward pass per batch of frames (keyframes only in
+            # keyframe mode, plus one for ROI windows); duplicates get no
+            # prediction (None)
+            keyframes = [frame_rgb for frame_idx, frame_rgb in fresh if frame_idx not in flows]
+            windows = [next_window() for _ in keyframes]
+            raw_preds = iter(self._inference_windows(keyframes, windows) if keyframes else [])
+            items = []
+            for frame_idx, frame_rgb in frame_batch:
+                if reused_from(frame_idx) is not None:
+                    raw_pred = None
+                elif frame_idx in flows:
+                    raw_pred = propagate_mask(previous_mask, flows[frame_idx])
+                else:
+                    raw_pred = next(raw_preds)
+                if raw_pred is not None:
+                    previous_mask = raw_pred
+                items.append((frame_idx, frame_rgb, raw_pred))
+            return items
+        
+        def postprocess(item):
+            nonlocal last_postprocessed
+            frame_idx, frame_rgb, raw_pred = item
+            if raw_pred is None:
+                # Duplicate frame: reuse the previous result
+                return (frame_idx, frame_rgb, *last_postprocessed, None)
             
-            # Apply smart postprocessing
-            filtered_pred, debug_info = smart_postprocess(raw_pred, frame_rgb.shape, debug=True)
+            # Apply smart postprocessing (at the mask's resolution)
+            filtered_pred, debug_info = smart_postprocess(raw_pred, raw_pred.shape, debug=True)
             
             # Get main stem bbox for tracking
             main_bbox = self._get_main_stem_bbox(filtered_pred, frame_rgb.shape)
+            last_postprocessed = filtered_pred, debug_info, main_bbox
+            return frame_idx, frame_rgb, filtered_pred, debug_info, main_bbox, None
+        
+        def track_and_write(item):
+            nonlocal roi_target
+            frame_idx, frame_rgb, filtered_pred, debug_info, main_bbox, saved = item
             
             # Update tracker
+            had_track = self.tracker.track is not None
             if main_bbox is not None:
                 # Simple score: stem area
                 stem_area = (filtered_pred == 3).sum()
@@ -304,8 +556,32 @@ class VideoSegmenter:
             else:
                 smoothed_bbox, accepted = self.tracker.update(None, 0.0)
             
-            # Create overlay and mask frames
-            overlay = self._create_overlay(frame_rgb, filtered_pred)
+            # A propagated mask that loses the tracked stem makes the next
+            # frame a keyframe (segmented after this frame is tracked)
+            if propagator is not None and had_track and not accepted and propagated(frame_idx):
+                propagator.request_keyframe()
+            
+            # Next ROI window around the main tree (stem and crown); misses
+            # and unstable tracks go back to full-frame inference. The
+            # window is in frame coordinates.
+            if self.roi:
+                if accepted and self.tracker.is_stable():
+                    bbox = tree_bbox(filtered_pred)
+                    if bbox is not None and smoothed_bbox is not None:
+                        bbox = (min(bbox[0], smoothed_bbox[0]), min(bbox[1], smoothed_bbox[1]),
+                                max(bbox[2], smoothed_bbox[2]), max(bbox[3], smoothed_bbox[3]))
+                    if bbox is not None:
+                        bbox = box_to_frame(bbox, filtered_pred.shape, frame_rgb.shape)
+                    roi_target = roi_window(bbox, frame_rgb.shape)
+                else:
+                    roi_target = None
+            
+            # Create overlay and mask frames (frame downscaled to a
+            # model-resolution mask)
+            view_rgb = frame_rgb
+            if filtered_pred.shape != frame_rgb.shape[:2]:
+                view_rgb = cv2.resize(frame_rgb, filtered_pred.shape[::-1], interpolation=cv2.INTER_AREA)
+            overlay = self._create_overlay(view_rgb, filtered_pred)
             colored_mask = self._create_colored_mask_bgr(filtered_pred)
             
             # Draw tracking bbox if debug
@@ -321,7 +597,7 @@ class VideoSegmenter:
             
             # Log debug info
             if self.debug:
-                debug_log.append({
+                entry = {
                     "frame": frame_idx,
                     "focus_type": debug_info.get('focus_type', 'unknown'),
                     "stem_detected": main_bbox is not None,
@@ -329,32 +605,126 @@ class VideoSegmenter:
                     "stem_area": int((filtered_pred == 3).sum()),
                     "leaf_area": int((filtered_pred == 2).sum()),
                     "bud_area": int((filtered_pred == 1).sum())
-                })
-            
-            # Extract individual frames with class crops
-            frame_dir = frames_dir / f"frame_{frame_idx:06d}"
-            frame_results = self._save_frame_results(
-                frame_rgb, filtered_pred, frame_dir, frame_idx,
-                crop_size=crop_size, pad_bg=pad_bg
-            )
-            if frame_results["classes_found"]:
-                results["extracted_frames"].append(frame_results)
-                extracted_count += 1
+                }
+                if deduplicator is not None:
+                    reference_idx, distance = dedup_decisions[frame_idx]
+                    entry["dedup"] = {"reused_from": reference_idx, "hash_distance": distance}
+                if frame_idx in keyframe_decisions:
+                    reason, confidence = keyframe_decisions[frame_idx]
+                    entry["keyframe"] = {"reason": reason, "flow_confidence": confidence}
+                debug_log.append(entry)
+            return frame_idx, frame_rgb, filtered_pred, saved
+        
+        def save_crops(item):
+            nonlocal last_saved_results
+            frame_idx, frame_rgb, filtered_pred, saved = item
+            reference_idx = reused_from(frame_idx)
+            if reference_idx is not None:
+                # Duplicate frame: no crops saved or classified again; the
+                # reused frame's predictions are weighted by its reuse_count
+                frame_results = {k: v for k, v in last_saved_results.items()
+                                 if k not in ('padded_files', 'full_files')}
+                frame_results["frame_index"] = frame_idx
+                frame_results["reused_from"] = reference_idx
+                return frame_results
             
-            # Update aggregate stats
-            for cls, stats in frame_results.get("class_stats", {}).items():
-                results["aggregate_stats"][cls] += stats["pixel_count"]
-            
-            processed_count += 1
-            pbar.update(1)
+            if saved is not None:
+                # Crops already saved by a postprocessing worker
+                frame_results, crops = saved
+                if crop_callback is not None:
+                    for class_name, rgb_full, path in crops:
+                        crop_callback(frame_idx, class_name, rgb_full, path)
+            else:
+                # Classified crops come from the full-resolution frame when
+                # segmenting the proxy (decoded only if anything was found)
+                full_frame = None
+                if full_res is not None and filtered_pred.any():
+                    full_bgr = full_res.get(frame_idx)
+                    if full_bgr is not None:
+                        full_frame = cv2.cvtColor(full_bgr, cv2.COLOR_BGR2RGB)
+                
+                # Extract individual frames with class crops
+                frame_dir = frames_dir / f"frame_{frame_idx:06d}"
+                frame_results = self._save_frame_results(
+                    frame_rgb, filtered_pred, frame_dir, frame_idx,
+                    crop_size=crop_size, pad_bg=pad_bg, crop_callback=crop_callback,
+                    full_frame=full_frame
+                )
+            last_saved_results = frame_results
+            return frame_results
+        
+        pool = None
+        pipeline = StagePipeline(threaded=self.pipelined and not feedback)
+        pipeline.add_stage("segment", segment, fan_out=True)
+        if feedback:
+            print("   Tracker feedback: frames segmented and tracked one at a time")
+        if self.postprocess_workers > 0 and not feedback:
+            # Postprocessing + crop saving in worker processes (with a
+            # proxy, crops need full-resolution frames: saved in save_crops)
+            pool = PostprocessPool(self.postprocess_workers)
+            save = (frames_dir, crop_size, pad_bg, crop_callback is not None) if full_res is None else None
+            pipeline.add_stage("postprocess", lambda items: pool.imap(items, save=save), stream=True)
+            print(f"   Postprocessing: {pool.workers} worker processes")
+        else:
+            pipeline.add_stage("postprocess", postprocess)
+        pipeline.add_stage("track_write", track_and_write)
+        pipeline.add_stage("save_crops", save_crops)
         
-        pbar.close()
-        cap.release()
-        overlay_writer.release()
-        mask_writer.release()
+        reuse_counts = {}
+        try:
+            for frame_results in pipeline.run(self._iter_frame_batches(source, gate, 1 if feedback else None)):
+                if "reused_from" in frame_results:
+                    key = str(frame_results["reused_from"])
+                    reuse_counts[key] = reuse_counts.get(key, 0) + 1
+                if frame_results["classes_found"]:
+                    results["extracted_frames"].append(frame_results)
+                    extracted_count += 1
+                
+                # Update aggregate stats
+                for cls, stats in frame_results.get("class_stats", {}).items():
+                    results["aggregate_stats"][cls] += stats["pixel_count"]
+                
+                processed_count += 1
+                pbar.update(1)
+        finally:
+            pbar.close()
+            cap.release()
+            if full_res is not None:
+                full_res.cap.release()
+            overlay_writer.release()
+            mask_writer.release()
+            if pool is not None:
+                pool.close()
         
         results["processed_frames"] = processed_count
+        results["tracking_stats"]["roi_inference_fraction"] = round(
+            results["tracking_stats"]["roi_inference_frames"] / max(segmented_count, 1), 4)
         results["total_source_frames"] = total_frames
+        results["frame_source"] = source.stats()
+        if full_res is not None:
+            results["analysis_proxy"] = {
+                "path": str(proxy_path),
+                "width": width,
+                "height": height,
+                "full_resolution_reads": full_res.stats(),
+            }
+        results["pipeline"] = pipeline.stats()
+        reused_count = sum(reuse_counts.values())
+        results["sampling"] = self._sampling_stats(processed_count, reused_count, frames_to_process, results["pipeline"])
+        results["dedup"] = {
+            "enabled": deduplicator is not None,
+            "max_distance": deduplicator.max_distance if deduplicator else None,
+            "reused_frames": reused_count,
+            # Segmented frame index -> number of later frames that reused its results
+            "reuse_counts": reuse_counts,
+        }
+        results["quality_gate"] = {"enabled": gate is not None, **(gate.stats() if gate else {"gated_frames": 0})}
+        results["keyframes"] = {"enabled": propagator is not None, **(propagator.stats() if propagator else {})}
+        results["model_resolution"] = {
+            "enabled": self.model_res,
+            "mask_width": mask_width,
+            "mask_height": mask_height,
+        }
         results["files"] = {
             "segmented_video": str(output_dir / "segmented_overlay.mp4"),
             "mask_video": str(output_dir / "mask_only.mp4"),
@@ -382,105 +752,54 @@ class VideoSegmenter:
         
         print(f"\n✅ Video processed!")
         print(f"   Source frames: {total_frames}")
-        print(f"   Processed: {processed_count} frames (2 fps)")
+        print(f"   Processed: {processed_count} frames ({self.sampling} sampling)")
+        if reused_count:
+            print(f"   Reused: {reused_count} near-duplicate frames")
+        if gate is not None:
+            print(f"   Gated: {gate.gated_frames} low-quality frames "
+                  f"({', '.join(f'{k} {v}' for k, v in gate.reasons.items() if v) or 'none'})")
+        if self.roi:
+            print(f"   ROI inference: {results['tracking_stats']['roi_inference_frames']} of "
+                  f"{segmented_count} segmented frames")
+        if propagator is not None:
+            print(f"   Keyframes: {results['keyframes']['keyframes']} segmented, "
+                  f"{results['keyframes']['propagated_frames']} propagated")
+        if self.sampling == "adaptive":
+            print(f"   Skipped vs fixed rate: {results['sampling']['frames_skipped']} frames "
+                  f"(~{results['sampling']['inference_seconds_saved']:.1f}s inference saved)")
         print(f"   Detected: {results['tracking_stats']['frames_with_detection']} frames")
         print(f"   Tracked: {results['tracking_stats']['frames_tracked']} frames (stable)")
         print(f"   Extracted: {extracted_count} frames with detections")
         
         return results
     
+    def _sampling_stats(self, processed_count, reused_count, fixed_rate_frames, pipeline_stats):
+        """Frames skipped and inference time saved against fixed-interval sampling."""
+        segment_seconds = pipeline_stats["stages"]["segment"]["busy_seconds"]
+        segmented = processed_count - reused_count
+        seconds_per_frame = segment_seconds / segmented if segmented else 0.0
+        # Negative on fast pans: more frames than the fixed rate
+        frames_skipped = fixed_rate_frames - processed_count
+        return {
+            "mode": self.sampling,
+            "sampled_frames": processed_count,
+            "fixed_rate_frames": fixed_rate_frames,
+            "frames_skipped": frames_skipped,
+            "inference_seconds_per_frame": round(seconds_per_frame, 4),
+            "inference_seconds_saved": round(frames_skipped * seconds_per_frame, 2),
+            "dedup_seconds_saved": round(reused_count * seconds_per_frame, 2),
+        }
+    
     def _save_frame_results(self, frame_rgb, pred_mask, frame_dir, frame_idx,
-                            crop_size=0, pad_bg=(255, 255, 255)):
+                            crop_size=0, pad_bg=(255, 255, 255), crop_callback=None, full_frame=None):
         """Save results for a single video frame"""
-        results = {
-            "frame_index": frame_idx,
-            "classes_found": [],
-            "class_stats": {}
-        }
-        
-        total_pixels = pred_mask.size
-        
-        for class_id in [1, 2, 3]:
-            class_info = CLASSES[class_id]
-            class_name = class_info["name"]
-            
-            class_mask = (pred_mask == class_id).astype(np.uint8)
-            pixel_count = np.sum(class_mask)
-            
-            if pixel_count == 0:
-                continue
-            
-            results["classes_found"].append(class_name)
-            results["class_stats"][class_name] = {
-                "pixel_count": int(pixel_count),
-                "percentage": round(pixel_count / total_pixels * 100, 2)
-            }
-            
-            # Create class folder
-            class_dir = frame_dir / class_name
-            class_dir.mkdir(parents=True, exist_ok=True)
-            
-            # Save cropped (transparent) - bbox only to save space
-            cropped = self._extract_with_transparency(frame_rgb, class_mask)
-            bbox_crop = self._crop_to_bbox(cropped, class_mask)
-
-            if bbox_crop is not None:
-                self._save_rgba_lossless(bbox_crop, class_dir / f"{class_name}.png")
-
-                # Also optionally save fixed-size centered padded crop (RGB)
-                if crop_size and crop_size > 0:
-                    # Obtain RGB crop (no alpha)
-                    rgba = bbox_crop
-                    if rgba.shape[2] == 4:
-                        rgb_crop = rgba[:, :, :3]
-                        alpha = rgba[:, :, 3]
-                    else:
-                        rgb_crop = rgba
-                        alpha = np.ones((rgba.shape[0], rgba.shape[1]), dtype=np.uint8) * 255
-
-                    ch_h, ch_w = rgb_crop.shape[0], rgb_crop.shape[1]
-
-                    # Resize to fit within crop_size while preserving aspect ratio
-                    scale = min(crop_size / max(ch_w, ch_h), 1.0)
-                    if scale < 1.0:
-                        new_w = int(ch_w * scale)
-                        new_h = int(ch_h * scale)
-                        resized = cv2.resize(rgb_crop, (new_w, new_h), interpolation=cv2.INTER_AREA)
-                    else:
-                        resized = rgb_crop
-                        new_h, new_w = ch_h, ch_w
-
-                    # Build background
-                    if isinstance(pad_bg, int):
-                        bg_color = (pad_bg, pad_bg, pad_bg)
-                    else:
-                        bg_color = tuple(int(x) for x in pad_bg)
-
-                    pad_img = np.zeros((crop_size, crop_size, 3), dtype=np.uint8)
-                    pad_img[:, :] = bg_color
-
-                    x_off = (crop_size - new_w) // 2
-                    y_off = (crop_size - new_h) // 2
-                    pad_img[y_off:y_off+new_h, x_off:x_off+new_w] = resized
-
-                    padded_filename = f"{class_name}_frame{frame_idx:06d}_pad_{crop_size}px.png"
-                    padded_path = class_dir / padded_filename
-                    Image.fromarray(pad_img).save(str(padded_path), 'PNG', compress_level=PNG_COMPRESSION)
-                    # Record file in results
-                    results.setdefault('padded_files', {}).setdefault(class_name, []).append(str(padded_path))
-                # Also save a full RGB crop (original bbox size) with background (no transparency)
-                try:
-                    if bbox_crop.shape[2] == 4:
-                        rgb_full = bbox_crop[:, :, :3]
-                    else:
-                        rgb_full = bbox_crop
-
-                    full_filename = f"{class_name}_frame{frame_idx:06d}_full.png"
-                    full_path = class_dir / full_filename
-                    Image.fromarray(rgb_full).save(str(full_path), 'PNG', compress_level=PNG_COMPRESSION)
-                    results.setdefault('full_files', {}).setdefault(class_name, []).append(str(full_path))
-                except Exception:
-                    pass
+        results, crops = save_frame_crops(
+            frame_rgb, pred_mask, frame_dir, frame_idx, crop_size=crop_size, pad_bg=pad_bg,
+            full_frame=full_frame
+        )
+        if crop_callback is not None:
+            for class_name, rgb_full, path in crops:
+                crop_callback(frame_idx, class_name, rgb_full, path)
         
         return results
     
@@ -513,11 +832,6 @@ class VideoSegmenter:
     
     # ==================== UTILITY FUNCTIONS ====================
     
-    def _save_rgba_lossless(self, img_rgba, path):
-        """Save RGBA image as lossless PNG"""
-        img_pil = Image.fromarray(img_rgba, 'RGBA')
-        img_pil.save(str(path), 'PNG', compress_level=PNG_COMPRESSION)
-    
     def _create_colored_mask_bgr(self, pred_mask):
         """Create BGR colored mask for video"""
         h, w = pred_mask.shape
@@ -538,31 +852,6 @@ class VideoSegmenter:
                 color = CLASSES[class_id]["color"][:3]
                 overlay[mask] = (0.6 * img_rgb[mask] + 0.4 * np.array(color)).astype(np.uint8)
         return overlay
-    
-    def _extract_with_transparency(self, img_rgb, mask):
-        """Extract image region with transparent background"""
-        h, w = img_rgb.shape[:2]
-        rgba = np.zeros((h, w, 4), dtype=np.uint8)
-        rgba[:, :, :3] = img_rgb
-        rgba[:, :, 3] = mask * 255
-        return rgba
-    
-    def _crop_to_bbox(self, rgba_img, mask):
-        """Crop to bounding box"""
-        coords = np.where(mask > 0)
-        if len(coords[0]) == 0:
-            return None
-        
-        y_min, y_max = coords[0].min(), coords[0].max()
-        x_min, x_max = coords[1].min(), coords[1].max()
-        
-        pad = 10
-        y_min = max(0, y_min - pad)
-        y_max = min(rgba_img.shape[0], y_max + pad)
-        x_min = max(0, x_min - pad)
-        x_max = min(rgba_img.shape[1], x_max + pad)
-        
-        return rgba_img[y_min:y_max, x_min:x_max]
 
 
 def main():
@@ -589,12 +878,43 @@ Examples:
                         help='Optional fixed crop size (px). 0 = disabled. Default: 0')
     parser.add_argument('--pad-bg', type=str, default='255,255,255',
                         help='Background color for padded crops as R,G,B (default white)')
+    parser.add_argument('--runtime', choices=RUNTIMES, default=None,
+                        help='Segmenter runtime (default: SIDEVIEW_SEGMENTER_RUNTIME or optimized)')
+    parser.add_argument('--batch-size', type=int, default=None,
+                        help='Frames per forward pass (default: SIDEVIEW_SEGMENTER_BATCH or 4)')
+    parser.add_argument('--frame-source', choices=FRAME_SOURCES, default=None,
+                        help='Frame decoding strategy (default: SIDEVIEW_FRAME_SOURCE or auto)')
+    parser.add_argument('--sampling', choices=SAMPLING_MODES, default=None,
+                        help='Frame sampling: fixed interval or motion-adaptive (default: SIDEVIEW_SAMPLING or fixed)')
+    parser.add_argument('--dedup', action='store_true', default=None,
+                        help='Reuse results for near-identical frames (default: SIDEVIEW_DEDUP)')
+    parser.add_argument('--proxy', action='store_true', default=None,
+                        help='Segment a downscaled analysis proxy, classify full-resolution crops (default: SIDEVIEW_ANALYSIS_PROXY)')
+    parser.add_argument('--keyframes', action='store_true', default=None,
+                        help='Segment keyframes only, propagate masks with optical flow (default: SIDEVIEW_KEYFRAMES)')
+    parser.add_argument('--roi', action='store_true', default=None,
+                        help='Segment a window around the tracked tree once tracking is stable (default: SIDEVIEW_ROI_INFERENCE)')
+    parser.add_argument('--quality-gate', action='store_true', default=None,
+                        help='Drop blurred / badly exposed frames before segmentation (default: SIDEVIEW_QUALITY_GATE)')
+    parser.add_argument('--model-res', action='store_true', default=None,
+                        help='Postprocess and track at model resolution, upscale masks only inside crops (default: SIDEVIEW_MODEL_RES_POSTPROCESS)')
+    parser.add_argument('--serial', action='store_true',
+                        help='Run all stages in one thread instead of the threaded pipeline')
+    parser.add_argument('--postprocess-workers', type=int, default=None,
+                        help='Worker processes for postprocessing/crop saving (default: SIDEVIEW_POSTPROCESS_WORKERS, 0 = off)')
     
     args = parser.parse_args()
     
     # Initialize segmenter
     model_path = Path(args.model) if args.model else None
-    segmenter = VideoSegmenter(model_path, debug=args.debug)
+    segmenter = VideoSegmenter(model_path, debug=args.debug, runtime=args.runtime,
+                               batch_size=args.batch_size, frame_source=args.frame_source,
+                               pipelined=not args.serial,
+                               postprocess_workers=args.postprocess_workers,
+                               sampling=args.sampling, dedup=args.dedup,
+                               analysis_proxy=args.proxy, keyframes=args.keyframes,
+                               roi=args.roi, quality_gate=args.quality_gate,
+                               model_res=args.model_res)
     
     print()
     
@@ -0,0 +1,183 @@
+"""Export the transfer classifier to TFLite or ONNX, optionally int8 quantized.
+
+The int8 models use static post-training quantization calibrated on real
+crops: the *_full.png files written by predict_video.py / video_to_phase2.py
+(or any directory of images). Use classifier_parity.py afterwards to check
+top-1 agreement and probability drift against the Keras model before
+switching SIDEVIEW_CLASSIFIER_BACKEND.
+
+Usage:
+    python quantize_transfer_model.py --runtime tflite --int8 --calibration-dir ../results
+    python quantize_transfer_model.py --runtime onnx --int8 --calibration-dir ../results
+    python quantize_transfer_model.py --runtime onnx          # fp32 export only
+
+Requires tensorflow for the export; tf2onnx and onnxruntime for --runtime onnx.
+"""
+import argparse
+import random
+import sys
+import tempfile
+from pathlib import Path
+
+from PIL import Image
+
+# Ensure project root (containing test_transfer_model.py) is on sys.path
+project_root = Path(__file__).resolve().parents[1]
+if str(project_root) not in sys.path:
+    sys.path.insert(0, str(project_root))
+
+from test_transfer_model import (
+    INPUT_SIZE,
+    MODEL_FILENAMES,
+    KerasBackend,
+    TransferModelPredictor,
+    find_model_path,
+    load_labels,
+)
+
+DEFAULT_LABELS = project_root / "labels.json"
+IMAGE_EXTENSIONS = {".png", ".jpg", ".jpeg"}
+
+
+def find_crop_files(calibration_dir, limit=None, seed=0):
+    """Collect calibration images.
+
+    Prefers the *_full.png crops written by the video pipeline and falls back
+    to every image under ``calibration_dir``. A random subset of ``limit``
+    files is returned so all classes/videos are represented.
+    """
+    calibration_dir = Path(calibration_dir)
+    files = sorted(calibration_dir.rglob("*_full.png"))
+    if not files:
+        files = sorted(p for p in calibration_dir.rglob("*") if p.suffix.lower() in IMAGE_EXTENSIONS)
+    if limit and len(files) > limit:
+        files = sorted(random.Random(seed).sample(files, limit))
+    return files
+
+
+def load_calibration_batches(files):
+    """Yield preprocessed (1, H, W, 3) float32 batches, skipping unreadable files."""
+    for path in files:
+        try:
+            with Image.open(path) as img:
+                arr = TransferModelPredictor.preprocess_image(img)
+        except Exception as e:
+            print(f"⚠️  Skipping {path}: {e}")
+            continue
+        yield arr[None, ...]
+
+
+def load_keras_model(model_path, labels_path):
+    import tensorflow as tf
+
+    if Path(model_path).is_dir():
+        raise ValueError("Export needs a Keras model (.keras or .h5), not a SavedModel directory")
+    num_classes = len(load_labels(str(labels_path)))
+    return KerasBackend._load_model(tf, str(model_path), num_classes)
+
+
+def export_tflite(model, output_path, calibration_files=None):
+    import tensorflow as tf
+
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+    if calibration_files is not None:
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.representative_dataset = lambda: ([b] for b in load_calibration_batches(calibration_files))
+        # Full integer kernels; keep float input/output so callers need no changes
+        converter.target_spec.supported_ops = [tf.lite.OpsSet.TFLITE_BUILTINS_INT8]
+    Path(output_path).write_bytes(converter.convert())
+
+
+class _CalibrationReader:
+    """onnxruntime.quantization.CalibrationDataReader over the crop files."""
+
+    def __init__(self, input_name, files):
+        self._input_name = input_name
+        self._batches = load_calibration_batches(files)
+
+    def get_next(self):
+        batch = next(self._batches, None)
+        return None if batch is None else {self._input_name: batch}
+
+
+def export_onnx(model, output_path, calibration_files=None):
+    import tensorflow as tf
+    import tf2onnx
+
+    spec = (tf.TensorSpec((None, INPUT_SIZE, INPUT_SIZE, 3), tf.float32, name="input"),)
+    if calibration_files is None:
+        tf2onnx.convert.from_keras(model, input_signature=spec, opset=13, output_path=str(output_path))
+        return
+
+    from onnxruntime.quantization import QuantFormat, QuantType, quantize_static
+    from onnxruntime.quantization.shape_inference import quant_pre_process
+
+    with tempfile.TemporaryDirectory() as tmp:
+        fp32_path = Path(tmp) / "model_fp32.onnx"
+        prep_path = Path(tmp) / "model_prep.onnx"
+        tf2onnx.convert.from_keras(model, input_signature=spec, opset=13, output_path=str(fp32_path))
+        quant_pre_process(str(fp32_path), str(prep_path))
+        quantize_static(
+            str(prep_path),
+            str(output_path),
+            _CalibrationReader("input", calibration_files),
+            quant_format=QuantFormat.QDQ,
+            activation_type=QuantType.QInt8,
+            weight_type=QuantType.QInt8,
+            per_channel=True,
+        )
+
+
+EXPORTERS = {
+    "tflite": export_tflite,
+    "onnx": export_onnx,
+}
+
+
+def quantize(model_path, output_path, runtime="tflite", int8=False,
+             calibration_dir=None, calibration_samples=200, labels_path=DEFAULT_LABELS):
+    """Export the Keras model at ``model_path`` (.keras/.h5) for ``runtime``."""
+    calibration_files = None
+    if int8:
+        if calibration_dir is None:
+            raise ValueError("--int8 needs --calibration-dir with representative crops")
+        calibration_files = find_crop_files(calibration_dir, calibration_samples)
+        if not calibration_files:
+            raise FileNotFoundError(f"No calibration images found under {calibration_dir}")
+        print(f"Calibrating on {len(calibration_files)} images from {calibration_dir}")
+
+    model = load_keras_model(model_path, labels_path)
+    EXPORTERS[runtime](model, output_path, calibration_files)
+
+    size_mb = Path(output_path).stat().st_size / 1e6
+    print(f"✅ Saved {runtime}{' int8' if int8 else ''} model: {output_path} ({size_mb:.1f} MB)")
+    return Path(output_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Export the transfer model to TFLite / ONNX (optionally int8)')
+    parser.add_argument('--input', default=None, help='Keras model (.keras or .h5)')
+    parser.add_argument('--labels', default=str(DEFAULT_LABELS), help='Path to labels.json')
+    parser.add_argument('--runtime', choices=sorted(EXPORTERS), default='tflite', help='Target runtime')
+    parser.add_argument('--int8', action='store_true', help='Static int8 post-training quantization')
+    parser.add_argument('--calibration-dir', default=None,
+                        help='Directory with representative crops (e.g. predict_video results)')
+    parser.add_argument('--calibration-samples', type=int, default=200,
+                        help='Max calibration images (default: 200)')
+    parser.add_argument('--output', default=None, help='Output path (default: next to the model)')
+
+    args = parser.parse_args()
+
+    model_path = args.input or find_model_path(str(project_root), "keras")
+    # MODEL_FILENAMES lists the int8 file first for each runtime
+    default_name = MODEL_FILENAMES[args.runtime][0 if args.int8 else 1]
+    output = args.output or str(project_root / default_name)
+
+    quantize(model_path, output, runtime=args.runtime, int8=args.int8,
+             calibration_dir=args.calibration_dir,
+             calibration_samples=args.calibration_samples,
+             labels_path=args.labels)
+
+
+if __name__ == '__main__':
+    main()
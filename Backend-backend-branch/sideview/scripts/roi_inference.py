@@ -0,0 +1,98 @@
+"""
+Tracker-guided ROI inference for the segmenter.
+
+smart_postprocess keeps only the main tree, so once StemTracker has a
+stable track most of a full-frame forward pass goes to background trees
+and sky. In ROI mode the segmenter runs on a window around the tracked
+tree instead, with a smaller model input: ROI_INPUT (height, width).
+
+The window is the part of the frame that ROI_INPUT covers at the
+full-frame pixel density (frame size * ROI_INPUT / IMG_SIZE), so the
+model sees the tree at the same scale as without ROI. It is centered on
+the main tree's bbox (stem and crown, plus ROI_MARGIN) and only used if
+that bbox fits in it. The default input, 512 x 256, is a full-height
+strip half the frame wide: tall trees fit, at half the compute.
+
+Full-frame inference is used:
+    - until the track is stable and after every frame it misses
+    - when the tree does not fit in the window
+    - after ROI_REFRESH consecutive ROI frames, so trees entering the
+      frame are seen
+
+Outside the window the mask is background.
+
+Usage:
+    window = roi_window(tree_bbox(filtered_mask), frame.shape)   # None: full frame
+    mask = roi_mask(frame.shape, window, roi_pred)
+"""
+
+import os
+
+import cv2
+import numpy as np
+
+ROI_ENABLED = os.environ.get("SIDEVIEW_ROI_INFERENCE", "0") == "1"
+
+# Model input (height, width) for ROI inference, e.g. "512x256"; both multiples of 32
+ROI_INPUT = tuple(int(v) for v in os.environ.get("SIDEVIEW_ROI_INPUT", "512x256").split("x"))
+
+# Consecutive ROI frames before a full-frame inference
+ROI_REFRESH = max(1, int(os.environ.get("SIDEVIEW_ROI_REFRESH", "10")))
+
+# Margin around the tree bbox, as a fraction of its size
+ROI_MARGIN = 0.15
+
+# Full-frame model input (predict_video.IMG_SIZE)
+FULL_INPUT = 512
+
+
+def tree_bbox(mask):
+    """(xmin, ymin, xmax, ymax) of all labelled pixels of a mask, or None."""
+    rows = np.flatnonzero(mask.any(axis=1))
+    if len(rows) == 0:
+        return None
+    cols = np.flatnonzero(mask.any(axis=0))
+    return int(cols[0]), int(rows[0]), int(cols[-1]), int(rows[-1])
+
+
+def roi_window(bbox, frame_shape, roi_input=ROI_INPUT, full_input=FULL_INPUT, margin=ROI_MARGIN):
+    """
+    (x0, y0, x1, y1) window of the frame for ROI inference around ``bbox``,
+    or None if the bbox (plus margin) does not fit or the window would be
+    the whole frame.
+    """
+    if bbox is None:
+        return None
+    frame_h, frame_w = frame_shape[:2]
+    win_w = min(frame_w, int(round(frame_w * roi_input[1] / full_input)))
+    win_h = min(frame_h, int(round(frame_h * roi_input[0] / full_input)))
+    if (win_w, win_h) == (frame_w, frame_h):
+        return None
+
+    # Tree bbox plus margin, within the frame
+    xmin, ymin, xmax, ymax = bbox
+    pad_x = (xmax - xmin) * margin
+    pad_y = (ymax - ymin) * margin
+    xmin, xmax = max(0, xmin - pad_x), min(frame_w, xmax + pad_x)
+    ymin, ymax = max(0, ymin - pad_y), min(frame_h, ymax + pad_y)
+    if xmax - xmin > win_w or ymax - ymin > win_h:
+        return None
+
+    # Centered on the tree, shifted inside the frame
+    x0 = int(np.clip(round((xmin + xmax - win_w) / 2), 0, frame_w - win_w))
+    y0 = int(np.clip(round((ymin + ymax - win_h) / 2), 0, frame_h - win_h))
+    return x0, y0, x0 + win_w, y0 + win_h
+
+
+def roi_input_image(frame_rgb, window, roi_input=ROI_INPUT):
+    """The window of the frame resized to the ROI model input."""
+    x0, y0, x1, y1 = window
+    return cv2.resize(frame_rgb[y0:y1, x0:x1], (roi_input[1], roi_input[0]))
+
+
+def roi_mask(frame_shape, window, pred):
+    """Full-frame label mask from an ROI prediction (background outside the window)."""
+    x0, y0, x1, y1 = window
+    mask = np.zeros(frame_shape[:2], dtype=np.uint8)
+    mask[y0:y1, x0:x1] = cv2.resize(pred, (x1 - x0, y1 - y0), interpolation=cv2.INTER_NEAREST)
+    return mask
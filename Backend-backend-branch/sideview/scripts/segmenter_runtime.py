@@ -0,0 +1,241 @@
+"""
+Execution runtimes for the UNet++ segmenter.
+
+VideoSegmenter hands batches of resized frames (N, H, W, 3 uint8) to a
+runtime and gets class-index masks (N, H, W uint8) back at model
+resolution. Runtimes:
+
+    eager        torch.no_grad, fp32, NCHW (the original behaviour)
+    optimized    torch.inference_mode + channels_last (+ optional bf16 autocast)
+    torchscript  optimized, traced and frozen with torch.jit
+    onnx         ONNX export executed by ONNX Runtime (CPU)
+
+Configuration (environment):
+    SIDEVIEW_SEGMENTER_RUNTIME   runtime name (default: optimized)
+    SIDEVIEW_SEGMENTER_BATCH     frames per forward pass (default: 4)
+    SIDEVIEW_SEGMENTER_BF16      0 / 1 / auto - bf16 autocast on CPU for the
+                                 torch runtimes (default: 0; auto = only if
+                                 the CPU has native bf16 support)
+    SIDEVIEW_SEGMENTER_ONNX      .onnx file to load, or to write the export
+                                 to so later processes skip the export
+                                 (other input sizes, e.g. ROI inference,
+                                 use <stem>_<H>x<W>.onnx next to it)
+
+Dynamic int8 quantization is not offered: torch's dynamic quantization
+only covers Linear/RNN layers and the segmenter is all convolutions.
+
+Use scripts/benchmark_segmenter.py to compare latency and mask IoU of the
+runtimes against the fp32 eager model.
+"""
+
+import io
+import os
+import threading
+import weakref
+from contextlib import nullcontext
+
+import numpy as np
+import torch
+
+RUNTIMES = ("eager", "optimized", "torchscript", "onnx")
+
+SEGMENTER_RUNTIME = os.environ.get("SIDEVIEW_SEGMENTER_RUNTIME", "optimized")
+SEGMENTER_BATCH_SIZE = max(1, int(os.environ.get("SIDEVIEW_SEGMENTER_BATCH", "4")))
+SEGMENTER_BF16 = os.environ.get("SIDEVIEW_SEGMENTER_BF16", "0")
+SEGMENTER_ONNX_PATH = os.environ.get("SIDEVIEW_SEGMENTER_ONNX") or None
+
+
+def cpu_supports_bf16():
+    """True if oneDNN reports native bf16 kernels on this CPU (AVX512-BF16 / AMX)."""
+    try:
+        return bool(torch.ops.mkldnn._is_mkldnn_bf16_supported())
+    except Exception:
+        return False
+
+
+def _resolve_bf16(bf16, device):
+    if device.type != "cpu":
+        return False
+    if bf16 is None:
+        bf16 = SEGMENTER_BF16
+    bf16 = str(bf16).lower()
+    if bf16 == "auto":
+        return cpu_supports_bf16()
+    return bf16 in ("1", "true", "yes")
+
+
+def input_hw(input_size):
+    """(height, width) of a square size or an (height, width) pair."""
+    if isinstance(input_size, int):
+        return input_size, input_size
+    return tuple(input_size)
+
+
+def _sized_onnx_path(onnx_path, input_size):
+    """SIDEVIEW_SEGMENTER_ONNX for the default 512 input, a sibling file otherwise."""
+    h, w = input_hw(input_size)
+    if (h, w) == (512, 512):
+        return onnx_path
+    root, ext = os.path.splitext(onnx_path)
+    return f"{root}_{h}x{w}{ext}"
+
+
+def _export_ready(model):
+    """Swap efficientnet's MemoryEfficientSwish (a custom autograd Function
+    that neither traces nor exports) for the numerically identical Swish."""
+    encoder = getattr(model, "encoder", None)
+    if hasattr(encoder, "set_swish"):
+        encoder.set_swish(memory_efficient=False)
+    return model
+
+
+def _to_tensor(batch, device):
+    """(N, H, W, 3) uint8 -> (N, 3, H, W) float in [0, 1].
+
+    The permuted view of the NHWC array already has channels_last strides;
+    ``.float()`` preserves them.
+    """
+    tensor = torch.from_numpy(np.ascontiguousarray(batch)).to(device)
+    return tensor.permute(0, 3, 1, 2).float().div_(255.0)
+
+
+class EagerRuntime:
+    """Original execution: torch.no_grad, fp32, contiguous NCHW input."""
+
+    name = "eager"
+
+    def __init__(self, model):
+        self.model = model
+        self.device = next(model.parameters()).device
+
+    def __call__(self, batch):
+        tensor = _to_tensor(batch, self.device).contiguous()
+        with torch.no_grad():
+            logits = self.model(tensor)
+            return logits.argmax(dim=1).to(torch.uint8).cpu().numpy()
+
+
+class TorchRuntime:
+    """inference_mode + channels_last, optionally bf16 autocast and TorchScript."""
+
+    def __init__(self, model, script=False, bf16=None):
+        self.device = next(model.parameters()).device
+        self.name = "torchscript" if script else "optimized"
+        self.bf16 = _resolve_bf16(bf16, self.device)
+        self._lock = threading.Lock()
+
+        # In-place: the module is shared, but every caller goes through a
+        # runtime and channels_last weights give the same results
+        self.model = model.to(memory_format=torch.channels_last)
+        self._script = script
+        self._module = None if script else self.model
+
+    def _autocast(self):
+        if self.bf16:
+            return torch.autocast("cpu", dtype=torch.bfloat16)
+        return nullcontext()
+
+    def _trace(self, example):
+        # Called under the lock on the first batch. With bf16 the casts are
+        # recorded in the trace, so the frozen module runs without autocast.
+        _export_ready(self.model)
+        with torch.no_grad(), self._autocast():
+            traced = torch.jit.trace(self.model, example, check_trace=False)
+            traced = torch.jit.freeze(traced)
+        self._module = torch.jit.optimize_for_inference(traced)
+
+    def __call__(self, batch):
+        tensor = _to_tensor(batch, self.device)
+        if self._module is None:
+            with self._lock:
+                if self._module is None:
+                    self._trace(tensor)
+        autocast = nullcontext() if self._script else self._autocast()
+        with torch.inference_mode(), autocast:
+            logits = self._module(tensor)
+            return logits.argmax(dim=1).to(torch.uint8).cpu().numpy()
+
+
+class OnnxRuntime:
+    """ONNX export of the segmenter run by an ONNX Runtime CPU session."""
+
+    name = "onnx"
+
+    def __init__(self, model, input_size, onnx_path=None, num_threads=0):
+        import onnxruntime as ort
+
+        if onnx_path is None and SEGMENTER_ONNX_PATH:
+            onnx_path = _sized_onnx_path(SEGMENTER_ONNX_PATH, input_size)
+        if onnx_path and os.path.exists(onnx_path):
+            source = onnx_path
+        else:
+            source = self.export(model, input_size, onnx_path)
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.session = ort.InferenceSession(source, sess_options=options,
+                                            providers=["CPUExecutionProvider"])
+        self._input_name = self.session.get_inputs()[0].name
+
+    @staticmethod
+    def export(model, input_size, onnx_path=None):
+        """Export ``model`` with a dynamic batch axis.
+
+        Returns ``onnx_path`` when given (the file is written there),
+        otherwise the serialized model bytes.
+        """
+        _export_ready(model)
+        device = next(model.parameters()).device
+        example = torch.zeros(1, 3, *input_hw(input_size), device=device)
+        target = onnx_path or io.BytesIO()
+        with torch.no_grad():
+            torch.onnx.export(
+                model, example, target,
+                input_names=["input"], output_names=["logits"],
+                dynamic_axes={"input": {0: "batch"}, "logits": {0: "batch"}},
+                opset_version=17,
+            )
+        return onnx_path if onnx_path else target.getvalue()
+
+    def __call__(self, batch):
+        tensor = np.ascontiguousarray(batch.transpose(0, 3, 1, 2), dtype=np.float32)
+        tensor /= 255.0
+        logits = self.session.run(None, {self._input_name: tensor})[0]
+        return logits.argmax(axis=1).astype(np.uint8)
+
+
+def build_segmenter_runtime(model, runtime=None, input_size=512, bf16=None):
+    """Create a runtime for ``model`` (uncached; see get_segmenter_runtime).
+
+    ``input_size`` is the square model input, or (height, width); the
+    traced and ONNX runtimes only accept batches of that size.
+    """
+    runtime = runtime or SEGMENTER_RUNTIME
+    if runtime == "eager":
+        return EagerRuntime(model)
+    if runtime == "optimized":
+        return TorchRuntime(model, script=False, bf16=bf16)
+    if runtime == "torchscript":
+        return TorchRuntime(model, script=True, bf16=bf16)
+    if runtime == "onnx":
+        return OnnxRuntime(model, input_size)
+    raise ValueError(f"Unknown segmenter runtime '{runtime}'. Choose from {RUNTIMES}")
+
+
+# Runtimes are cached per model instance so every VideoSegmenter built on
+# the shared (registry) model reuses the same traced module / ORT session
+_runtime_cache = weakref.WeakKeyDictionary()
+_runtime_cache_lock = threading.Lock()
+
+
+def get_segmenter_runtime(model, runtime=None, input_size=512):
+    """Shared runtime of the given kind and input size for ``model``, built on first use."""
+    runtime = runtime or SEGMENTER_RUNTIME
+    key = (runtime, input_hw(input_size))
+    with _runtime_cache_lock:
+        per_model = _runtime_cache.setdefault(model, {})
+        if key not in per_model:
+            per_model[key] = build_segmenter_runtime(model, runtime, input_size)
+        return per_model[key]
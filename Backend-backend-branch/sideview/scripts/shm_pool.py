@@ -0,0 +1,247 @@
+"""
+Process-pool postprocessing with shared-memory frame buffers.
+
+smart_postprocess and crop extraction are NumPy / SciPy / OpenCV / PIL
+code that holds the GIL for long stretches, so threads do not scale them.
+PostprocessPool runs them in worker processes instead. Frames and label
+masks are not pickled: they travel through a ring of shared-memory slots
+(one RGB frame + one label mask each), only the slot index and small
+results (debug info, crop summary, crops for the callback) go through the
+task queue.
+
+    parent: copy frame + raw mask into a free slot -> submit(slot)
+    worker: smart_postprocess(mask) -> filtered mask written back into the
+            slot, class crops saved to disk
+    parent: read the filtered mask back, free the slot
+
+At most ``slots`` frames are in flight; results come back in input order.
+
+Usage:
+    with PostprocessPool(workers=8) as pool:
+        for frame_idx, frame_rgb, filtered, debug_info, main_bbox, saved in pool.imap(items):
+            ...
+"""
+
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from pathlib import Path
+
+import cv2
+import numpy as np
+
+from crop_utils import mask_bbox, save_frame_crops
+from postprocess_utils import smart_postprocess
+
+# Worker processes for postprocessing; 0 = run it in the pipeline thread
+POSTPROCESS_WORKERS = int(os.environ.get("SIDEVIEW_POSTPROCESS_WORKERS", "0"))
+
+# fork is cheapest (workers only need NumPy/OpenCV, not the model); use
+# spawn or forkserver if the parent process must not be forked
+POSTPROCESS_START_METHOD = os.environ.get(
+    "SIDEVIEW_POSTPROCESS_START",
+    "fork" if "fork" in multiprocessing.get_all_start_methods() else "spawn",
+)
+
+# Slots per worker: one being processed, one queued
+SLOTS_PER_WORKER = 2
+
+STEM_CLASS_ID = 3
+
+
+class SharedFrameRing:
+    """
+    Fixed set of shared-memory slots, each holding one (H, W, 3) uint8
+    frame and one uint8 label mask, in a single shared block. The mask is
+    (H, W) unless ``mask_shape`` is given (model-resolution masks).
+    """
+
+    def __init__(self, slots, frame_shape, mask_shape=None, name=None):
+        self.slots = slots
+        self.height, self.width = int(frame_shape[0]), int(frame_shape[1])
+        mask_shape = frame_shape if mask_shape is None else mask_shape
+        self.mask_height, self.mask_width = int(mask_shape[0]), int(mask_shape[1])
+        self.frame_nbytes = self.height * self.width * 3
+        self.mask_nbytes = self.mask_height * self.mask_width
+        self.slot_nbytes = self.frame_nbytes + self.mask_nbytes
+
+        self.owner = name is None
+        if self.owner:
+            self.shm = shared_memory.SharedMemory(create=True, size=slots * self.slot_nbytes)
+        else:
+            self.shm = _attach(name)
+
+    @property
+    def layout(self):
+        """Picklable description used by workers to attach."""
+        return self.shm.name, self.slots, (self.height, self.width), (self.mask_height, self.mask_width)
+
+    @classmethod
+    def attach(cls, layout):
+        name, slots, frame_shape, mask_shape = layout
+        return cls(slots, frame_shape, mask_shape, name=name)
+
+    @property
+    def shapes(self):
+        """((H, W), (mask H, mask W)) of the slots."""
+        return (self.height, self.width), (self.mask_height, self.mask_width)
+
+    def frame(self, slot):
+        offset = slot * self.slot_nbytes
+        return np.ndarray((self.height, self.width, 3), dtype=np.uint8,
+                          buffer=self.shm.buf, offset=offset)
+
+    def mask(self, slot):
+        offset = slot * self.slot_nbytes + self.frame_nbytes
+        return np.ndarray((self.mask_height, self.mask_width), dtype=np.uint8,
+                          buffer=self.shm.buf, offset=offset)
+
+    def close(self):
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
+
+
+def _attach(name):
+    # The parent owns (and unlinks) the block. Before Python 3.13 attaching
+    # registers it again with the pool's shared resource tracker, a no-op.
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        return shared_memory.SharedMemory(name=name)
+
+
+# ==================== WORKER SIDE ====================
+
+_rings = {}
+
+
+def _init_worker():
+    # One process per core already; avoid oversubscribing with OpenCV threads
+    cv2.setNumThreads(1)
+
+
+def _worker_ring(layout):
+    ring = _rings.get(layout[0])
+    if ring is None:
+        # A new ring replaces the previous one (new frame or mask size)
+        for old in list(_rings):
+            _rings.pop(old).close()
+        ring = _rings[layout[0]] = SharedFrameRing.attach(layout)
+    return ring
+
+
+def _postprocess_slot(layout, slot, frame_idx, params, save):
+    ring = _worker_ring(layout)
+    frame_rgb = ring.frame(slot)
+    mask = ring.mask(slot)
+
+    filtered, debug_info = smart_postprocess(mask, mask.shape, params=params, debug=True)
+    mask[...] = filtered
+    main_bbox = mask_bbox(filtered, STEM_CLASS_ID)
+
+    saved = None
+    if save is not None:
+        frames_dir, crop_size, pad_bg, keep_crops = save
+        frame_results, crops = save_frame_crops(
+            frame_rgb, filtered, Path(frames_dir) / f"frame_{frame_idx:06d}", frame_idx,
+            crop_size=crop_size, pad_bg=pad_bg,
+        )
+        saved = (frame_results, crops if keep_crops else [])
+    return debug_info, main_bbox, saved
+
+
+# ==================== PARENT SIDE ====================
+
+class PostprocessPool:
+    """smart_postprocess (+ crop saving) in worker processes."""
+
+    def __init__(self, workers, slots=None, start_method=POSTPROCESS_START_METHOD):
+        self.workers = max(1, int(workers))
+        self.slots = slots or self.workers * SLOTS_PER_WORKER
+        self.ring = None  # created for the frame / mask size of the first item
+        self.executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context(start_method),
+            initializer=_init_worker,
+        )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def close(self):
+        self.executor.shutdown(wait=True, cancel_futures=True)
+        if self.ring is not None:
+            self.ring.close()
+            self.ring = None
+
+    def _ring_for(self, frame_shape, mask_shape):
+        shapes = (tuple(frame_shape[:2]), tuple(mask_shape[:2]))
+        if self.ring is None or self.ring.shapes != shapes:
+            if self.ring is not None:
+                self.ring.close()
+            self.ring = SharedFrameRing(self.slots, frame_shape, mask_shape)
+        return self.ring
+
+    def imap(self, items, params=None, save=None):
+        """
+        Postprocess (frame_idx, frame_rgb, raw_pred) items, in order. An
+        item with ``raw_pred`` None reuses the result of the item before it
+        (frame deduplication) and is not sent to a worker.
+
+        ``save`` = (frames_dir, crop_size, pad_bg, keep_crops) also saves
+        the class crops in the workers (crop_utils.save_frame_crops).
+
+        Yields (frame_idx, frame_rgb, filtered_pred, debug_info, main_bbox,
+        saved) where ``saved`` is (frame_results, crops) or None.
+        """
+        if save is not None:
+            frames_dir, crop_size, pad_bg, keep_crops = save
+            save = (str(frames_dir), crop_size, pad_bg, keep_crops)
+
+        ring = None
+        free = deque()
+        pending = deque()
+        last = None
+
+        def collect():
+            nonlocal last
+            slot, frame_idx, frame_rgb, future = pending.popleft()
+            if future is None:
+                filtered, debug_info, main_bbox = last
+                return frame_idx, frame_rgb, filtered, debug_info, main_bbox, None
+            try:
+                debug_info, main_bbox, saved = future.result()
+                filtered = ring.mask(slot).copy()
+            finally:
+                free.append(slot)
+            last = filtered, debug_info, main_bbox
+            return frame_idx, frame_rgb, filtered, debug_info, main_bbox, saved
+
+        for frame_idx, frame_rgb, raw_pred in items:
+            if raw_pred is None:
+                pending.append((None, frame_idx, frame_rgb, None))
+                continue
+            if ring is None or ring.shapes != (frame_rgb.shape[:2], raw_pred.shape[:2]):
+                # Frame or mask size changed: drain the old ring before replacing it
+                while pending:
+                    yield collect()
+                ring = self._ring_for(frame_rgb.shape, raw_pred.shape)
+                free = deque(range(ring.slots))
+            while not free:
+                yield collect()
+            slot = free.popleft()
+            ring.frame(slot)[...] = frame_rgb
+            ring.mask(slot)[...] = raw_pred
+            future = self.executor.submit(
+                _postprocess_slot, ring.layout, slot, frame_idx, params, save
+            )
+            pending.append((slot, frame_idx, frame_rgb, future))
+
+        while pending:
+            yield collect()
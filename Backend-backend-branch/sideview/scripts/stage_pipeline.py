@@ -0,0 +1,240 @@
+"""
+Bounded-queue, multi-threaded stage pipeline.
+
+    source -> stage 1 -> stage 2 -> ... -> caller
+
+The source is iterated on its own thread and every stage runs on its own
+thread, connected by queues of ``maxsize`` items: a slow stage blocks the
+ones before it (backpressure), so memory stays bounded. One thread per
+stage and FIFO queues keep items in source order, which stateful stages
+(e.g. a tracker or a video writer) rely on.
+
+Heavy stages (OpenCV, NumPy, PyTorch) release the GIL, so decode,
+inference, postprocessing and disk writes overlap.
+
+Usage:
+    pipeline = StagePipeline(maxsize=4)
+    pipeline.add_stage("segment", segment_batch, fan_out=True)
+    pipeline.add_stage("postprocess", postprocess)
+    for item in pipeline.run(frame_batches):
+        save(item)
+
+A stage can also consume the whole item stream (``stream=True``): it gets
+an iterator of inputs and yields outputs, which lets it keep several items
+in flight, e.g. in a process pool (see shm_pool.PostprocessPool.imap).
+
+An exception in any stage stops the pipeline and is re-raised in the
+caller. ``threaded=False`` runs the same stages inline (serial), which is
+handy for debugging and benchmarking.
+"""
+
+import os
+import queue
+import threading
+import time
+
+PIPELINE_QUEUE_SIZE = max(1, int(os.environ.get("SIDEVIEW_PIPELINE_QUEUE", "4")))
+
+_DONE = object()
+
+# Poll interval for blocked queue operations, so a failing stage can stop the others
+_POLL_SECONDS = 0.1
+
+
+class _Stage:
+    def __init__(self, name, fn, fan_out, stream):
+        self.name = name
+        self.fn = fn
+        self.fan_out = fan_out
+        self.stream = stream
+        self.items = 0
+        self.busy_seconds = 0.0
+
+    def outputs(self, items):
+        """Generator of the stage outputs for an iterable of inputs."""
+        if self.stream:
+            yield from self._stream(items)
+        else:
+            for item in items:
+                yield from self.process(item)
+
+    def process(self, item):
+        """Outputs for one input item (a list, possibly empty)."""
+        start = time.perf_counter()
+        out = self.fn(item)
+        if self.fan_out:
+            out = list(out)
+        else:
+            out = [] if out is None else [out]
+        self.busy_seconds += time.perf_counter() - start
+        self.items += 1
+        return out
+
+    def _stream(self, items):
+        # Busy time excludes the time spent waiting for inputs
+        waited = 0.0
+
+        def inputs():
+            nonlocal waited
+            it = iter(items)
+            while True:
+                start = time.perf_counter()
+                try:
+                    item = next(it)
+                except StopIteration:
+                    return
+                finally:
+                    waited += time.perf_counter() - start
+                self.items += 1
+                yield item
+
+        outputs = iter(self.fn(inputs()))
+        while True:
+            waited = 0.0
+            start = time.perf_counter()
+            try:
+                out = next(outputs)
+            except StopIteration:
+                return
+            finally:
+                self.busy_seconds += time.perf_counter() - start - waited
+            yield out
+
+
+class StagePipeline:
+    """Chain of stages run on separate threads with bounded queues."""
+
+    def __init__(self, maxsize=PIPELINE_QUEUE_SIZE, threaded=True):
+        self.maxsize = maxsize
+        self.threaded = threaded
+        self.stages = []
+        self.source_seconds = 0.0
+        self.wall_seconds = 0.0
+
+    def add_stage(self, name, fn, fan_out=False, stream=False):
+        """
+        Append a stage. ``fn(item)`` returns one output item (None drops
+        it), or an iterable of outputs when ``fan_out`` is set. With
+        ``stream`` set, ``fn(items)`` takes the iterator of all inputs and
+        returns an iterable of outputs.
+        """
+        self.stages.append(_Stage(name, fn, fan_out, stream))
+        return self
+
+    def stats(self):
+        """Per-stage item counts and busy time (seconds)."""
+        return {
+            "threaded": self.threaded,
+            "wall_seconds": round(self.wall_seconds, 3),
+            "source_seconds": round(self.source_seconds, 3),
+            "stages": {
+                s.name: {"items": s.items, "busy_seconds": round(s.busy_seconds, 3)}
+                for s in self.stages
+            },
+        }
+
+    def run(self, source):
+        """Generator of the last stage's outputs, in source order."""
+        start = time.perf_counter()
+        try:
+            if self.threaded:
+                yield from self._run_threaded(source)
+            else:
+                yield from self._run_serial(source)
+        finally:
+            self.wall_seconds = time.perf_counter() - start
+
+    # ------------------------------------------------------------------
+
+    def _timed_source(self, source):
+        it = iter(source)
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(it)
+            except StopIteration:
+                return
+            finally:
+                self.source_seconds += time.perf_counter() - start
+            yield item
+
+    def _run_serial(self, source):
+        items = self._timed_source(source)
+        for stage in self.stages:
+            items = stage.outputs(items)
+        yield from items
+
+    def _run_threaded(self, source):
+        stop = threading.Event()
+        errors = []
+        queues = [queue.Queue(maxsize=self.maxsize) for _ in range(len(self.stages) + 1)]
+
+        def put(q, item):
+            while not stop.is_set():
+                try:
+                    q.put(item, timeout=_POLL_SECONDS)
+                    return True
+                except queue.Full:
+                    continue
+            return False
+
+        def get(q):
+            while not stop.is_set():
+                try:
+                    return q.get(timeout=_POLL_SECONDS)
+                except queue.Empty:
+                    continue
+            return _DONE
+
+        def fail(e):
+            errors.append(e)
+            stop.set()
+
+        def feed():
+            try:
+                for item in self._timed_source(source):
+                    if not put(queues[0], item):
+                        return
+                put(queues[0], _DONE)
+            except BaseException as e:
+                fail(e)
+
+        def inputs(q_in):
+            while True:
+                item = get(q_in)
+                if item is _DONE:
+                    return
+                yield item
+
+        def work(stage, q_in, q_out):
+            try:
+                for out in stage.outputs(inputs(q_in)):
+                    if not put(q_out, out):
+                        return
+                put(q_out, _DONE)
+            except BaseException as e:
+                fail(e)
+
+        threads = [threading.Thread(target=feed, name="pipeline-source", daemon=True)]
+        for i, stage in enumerate(self.stages):
+            threads.append(threading.Thread(
+                target=work, args=(stage, queues[i], queues[i + 1]),
+                name=f"pipeline-{stage.name}", daemon=True,
+            ))
+        for t in threads:
+            t.start()
+
+        try:
+            while True:
+                item = get(queues[-1])
+                if item is _DONE:
+                    break
+                yield item
+        finally:
+            # Normal end, caller error or generator closed early: stop all stages
+            stop.set()
+            for t in threads:
+                t.join()
+
+        if errors:
+            raise errors[0]
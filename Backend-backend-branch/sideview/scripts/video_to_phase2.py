@@ -5,9 +5,11 @@ Usage:
         --phase2 path/to/plant_disease_transfer_model.h5 --output results.json
 
 This script runs the existing VideoSegmenter to produce per-frame crops
-and then runs the TransferModelPredictor (Keras MobileNetV2 transfer model)
-on each `*_full.png` crop. Predictions are saved to an aggregated JSON
-file in the video result folder, ready for dashboard/report generation.
+and runs the TransferModelPredictor (Keras MobileNetV2 transfer model)
+on each full crop. Crops are classified in memory, in batches, as the
+segmenter produces them; the `*_full.png` files are still written for the
+report. Predictions are saved to an aggregated JSON file in the video
+result folder, ready for dashboard/report generation.
 """
 import argparse
 import json
@@ -25,57 +27,87 @@ spec = importlib.util.spec_from_file_location("predict_video_mod", str(pv_path))
 pv_mod = importlib.util.module_from_spec(spec)
 spec.loader.exec_module(pv_mod)
 VideoSegmenter = pv_mod.VideoSegmenter
+load_segmentation_model = pv_mod.load_segmentation_model
 
 # Ensure project root (containing test_transfer_model.py) is on sys.path
 project_root = Path(__file__).resolve().parents[1]
 if str(project_root) not in sys.path:
     sys.path.insert(0, str(project_root))
 
-from test_transfer_model import TransferModelPredictor
+from test_transfer_model import TransferModelPredictor, DEFAULT_BATCH_SIZE, find_model_path
 
 
-def run_pipeline(video_path, phase2_model, frame_interval=0, debug=False, output_json=None):
+def run_pipeline(video_path, phase2_model, frame_interval=0, debug=False, output_json=None,
+                 batch_size=DEFAULT_BATCH_SIZE, predictor=None, segmentation_model=None):
+    """Segment a video and classify every crop.
+
+    ``predictor`` (a TransferModelPredictor) and ``segmentation_model`` (a
+    loaded UNet++ module) let callers such as the API reuse shared,
+    already-loaded models; when omitted they are loaded from disk.
+    """
     video_path = Path(video_path)
     if not video_path.exists():
         raise FileNotFoundError(f"Video not found: {video_path}")
 
-    # 1) Run video segmentation
-    seg = VideoSegmenter(model_path=None, debug=debug)
-    print(f"Running segmentation on {video_path} ...")
-    seg_result = seg.predict(str(video_path), frame_interval=frame_interval)
-
-    output_dir = Path(seg_result.get('output_dir', '.'))
-
-    # 2) Load transfer model predictor
-    print(f"Loading transfer model: {phase2_model}")
-    predictor = TransferModelPredictor(model_path=str(phase2_model))
+    # 1) Load transfer model predictor (crops are classified while the
+    #    segmenter is still running, so it has to be ready first)
+    if predictor is None:
+        print(f"Loading transfer model: {phase2_model}")
+        predictor = TransferModelPredictor(model_path=str(phase2_model))
 
     predictions = []
+    pending = []
+
+    def flush():
+        if not pending:
+            return
+        try:
+            preds = predictor.predict_batch(
+                [item['crop'] for item in pending],
+                forced_parts=[item['part'] for item in pending],
+                batch_size=batch_size,
+            )
+        except Exception as e:
+            for item in pending:
+                print(f"  ❌ Prediction failed for {item['file']}: {e}")
+        else:
+            for item, pred in zip(pending, preds):
+                predictions.append({
+                    'frame_index': item['frame_index'],
+                    'class': item['class'],
+                    'file': item['file'],
+                    'prediction': pred
+                })
+        pending.clear()
+
+    def on_crop(frame_idx, cls, crop, fpath):
+        # Normalize segmentation class to match dashboard expected keys
+        norm_part = 'leaves' if cls == 'leaf' else cls
+        pending.append({
+            'frame_index': frame_idx,
+            'class': cls,
+            'file': fpath,
+            'part': norm_part,
+            'crop': crop,
+        })
+        if len(pending) >= batch_size:
+            flush()
+
+    # 2) Run video segmentation; every full crop is handed to the predictor
+    #    in memory (batched) instead of being re-read from its PNG
+    seg = VideoSegmenter(model_path=None, debug=debug, model=segmentation_model)
+    print(f"Running segmentation on {video_path} ...")
+    seg_result = seg.predict(str(video_path), frame_interval=frame_interval, crop_callback=on_crop)
+    flush()
 
-    # 3) Iterate extracted frames and predict on full crops
-    for frame_res in seg_result.get('extracted_frames', []):
-        frame_idx = frame_res.get('frame_index')
-        full_files = frame_res.get('full_files', {})
-        # full_files is a dict mapping class_name -> list of file paths
-        for cls, files in full_files.items():
-            for fpath in files:
-                try:
-                    # Normalize segmentation class to match dashboard expected keys
-                    norm_part = cls
-                    if cls == 'leaf':
-                        norm_part = 'leaves'
-
-                    print(f"Predicting frame {frame_idx} {cls}: {fpath}")
-                    # Force part to segmentation class (normalized)
-                    pred = predictor.predict(fpath, forced_part=norm_part)
-                    predictions.append({
-                        'frame_index': frame_idx,
-                        'class': cls,
-                        'file': fpath,
-                        'prediction': pred
-                    })
-                except Exception as e:
-                    print(f"  ❌ Prediction failed for {fpath}: {e}")
+    # Frames deduplicated by the segmenter reuse these predictions; the
+    # dashboard weights every prediction by 1 + reuse_count
+    reuse_counts = seg_result.get('dedup', {}).get('reuse_counts', {})
+    for p in predictions:
+        p['reuse_count'] = reuse_counts.get(str(p['frame_index']), 0)
+
+    output_dir = Path(seg_result.get('output_dir', '.'))
+    print(f"Predicted {len(predictions)} crops")
 
     # 4) Save aggregated predictions
     if output_json is None:
@@ -94,8 +126,8 @@ def main():
     parser = argparse.ArgumentParser(description='Run video -> transfer-model prediction pipeline')
     parser.add_argument('--video', required=True, help='Path to video file')
     # Default to the transfer model at the project root (one level above scripts/)
-    default_phase2 = Path(__file__).resolve().parents[1] / "plant_disease_transfer_model.h5"
-    parser.add_argument('--phase2', default=str(default_phase2), help='Path to transfer model (.h5)')
+    default_phase2 = find_model_path(str(Path(__file__).resolve().parents[1]))
+    parser.add_argument('--phase2', default=default_phase2, help='Path to transfer model (.keras, .h5 or SavedModel dir)')
     parser.add_argument('--frame-interval', type=int, default=0, help='Frame interval to process (0 = auto)')
     parser.add_argument('--debug', action='store_true', help='Enable debug in video segmentation')
     parser.add_argument('--output', help='Optional output JSON path')
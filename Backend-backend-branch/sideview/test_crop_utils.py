@@ -0,0 +1,50 @@
+"""Checks for the crop windows of model-resolution masks.
+
+Run with:
+    python test_crop_utils.py
+
+Raises AssertionError if something is inconsistent.
+"""
+import cv2
+import numpy as np
+
+from scripts.crop_utils import class_mask_window, upscale_nearest
+
+
+def _mask(shape=(72, 128)):
+    rng = np.random.default_rng(0)
+    mask = np.zeros(shape, dtype=np.uint8)
+    cv2.rectangle(mask, (60, 30), (66, 71), 3, -1)       # stem touching the bottom edge
+    cv2.circle(mask, (63, 26), 6, 1, -1)
+    cv2.line(mask, (63, 26), (127, 0), 2, 3)             # leaf touching the corner
+    mask[rng.random(shape) < 0.01] = 2
+    return mask
+
+
+def test_upscale_nearest():
+    """Windows match a full cv2 nearest-neighbour resize."""
+    mask = _mask()
+    for h, w in ((2160, 3840), (1080, 1920), (1000, 1777), (73, 129)):
+        full = cv2.resize(mask, (w, h), interpolation=cv2.INTER_NEAREST)
+        for bounds in ((0, h, 0, w), (h // 3, h - 1, 5, w // 2)):
+            y0, y1, x0, x1 = bounds
+            assert np.array_equal(upscale_nearest(mask, bounds, (h, w)), full[y0:y1, x0:x1])
+
+
+def test_class_mask_window():
+    """A low-resolution mask gives the window of its full upscale."""
+    mask = _mask()
+    for h, w in ((2160, 3840), (1000, 1777)):
+        full = cv2.resize(mask, (w, h), interpolation=cv2.INTER_NEAREST)
+        for class_id in (1, 2, 3):
+            lazy_mask, lazy_bounds = class_mask_window(mask, class_id, (h, w, 3))
+            eager_mask, eager_bounds = class_mask_window(full, class_id, (h, w, 3))
+            assert lazy_bounds == eager_bounds
+            assert np.array_equal(lazy_mask, eager_mask)
+    assert class_mask_window(np.zeros((9, 16), dtype=np.uint8), 1, (90, 160)) is None
+
+
+if __name__ == "__main__":
+    test_upscale_nearest()
+    test_class_mask_window()
+    print("All crop checks passed.")
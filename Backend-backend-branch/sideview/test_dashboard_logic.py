@@ -105,7 +105,67 @@ def test_dashboard_aggregation_minimal():
     assert dashboard["tree"]["primary_disease"] == "Grey leaf rot"
 
 
+def test_dashboard_reuse_weighting():
+    """A prediction reused for deduplicated frames counts once per frame."""
+    def frame(idx, part, status, health, reliability, reuse_count=0):
+        return {
+            "frame_index": idx,
+            "class": part,
+            "image_path": f"{part}{idx}.png",
+            "part": {"prediction": part, "confidence": reliability},
+            "status": {"prediction": status, "confidence": reliability},
+            "health": health,
+            "combined": f"{part}_{status}",
+            "is_out_of_distribution": False,
+            "ood_reason": None,
+            "ood_signals": None,
+            "reliability": reliability,
+            "reuse_count": reuse_count,
+        }
+
+    deduped = [
+        frame(0, "stem", "healthy", "healthy", 90.0, reuse_count=3),
+        frame(4, "stem", "stem bleeding", "unhealthy", 80.0),
+    ]
+    expanded = [frame(0, "stem", "healthy", "healthy", 90.0) for _ in range(4)] + [
+        frame(4, "stem", "stem bleeding", "unhealthy", 80.0),
+    ]
+
+    dashboard = aggregate_dashboard(deduped)
+    reference = aggregate_dashboard(expanded)
+
+    assert dashboard["meta"]["total_frames"] == 5
+    assert dashboard["meta"]["reused_frames"] == 3
+    assert dashboard["tree"] == reference["tree"]
+    assert dashboard["parts"] == reference["parts"]
+
+
+def test_dashboard_gated_frames():
+    """Frames rejected by the quality gate are reported, not aggregated."""
+    assert aggregate_dashboard([], gated_frames=7)["meta"]["gated_frames"] == 7
+
+    preds = [{
+        "frame_index": 0,
+        "class": "stem",
+        "image_path": "stem0.png",
+        "part": {"prediction": "stem", "confidence": 90.0},
+        "status": {"prediction": "healthy", "confidence": 90.0},
+        "health": "healthy",
+        "combined": "stem_healthy",
+        "is_out_of_distribution": False,
+        "ood_reason": None,
+        "ood_signals": None,
+        "reliability": 90.0,
+    }]
+    dashboard = aggregate_dashboard(preds, gated_frames=3)
+    assert dashboard["meta"]["gated_frames"] == 3
+    assert dashboard["meta"]["total_frames"] == 1
+    assert aggregate_dashboard(preds)["meta"]["gated_frames"] == 0
+
+
 if __name__ == "__main__":
     test_label_to_disease_mapping()
     test_dashboard_aggregation_minimal()
+    test_dashboard_reuse_weighting()
+    test_dashboard_gated_frames()
     print("All dashboard/label mapping checks passed.")
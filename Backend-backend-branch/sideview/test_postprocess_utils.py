@@ -0,0 +1,135 @@
+"""Checks for smart_postprocess and the connected components it uses.
+
+Run with:
+    python test_postprocess_utils.py
+
+Raises AssertionError if something is inconsistent.
+"""
+import hashlib
+
+import cv2
+import numpy as np
+
+from scripts.postprocess_utils import connected_components_props, smart_postprocess
+
+
+def _mask():
+    mask = np.zeros((40, 60), dtype=np.uint8)
+    mask[30:38, 2:6] = 1     # lowest component, listed last
+    mask[5:20, 40:44] = 1    # starts on the same row as the next one, further right
+    mask[5:9, 10:14] = 1
+    mask[10, 10] = 1         # diagonal-only neighbours stay separate (4-connectivity)
+    mask[11, 11] = 1
+    return mask
+
+
+def test_components_properties():
+    """Area, bbox, centroid, mask and coords match the pixels of each component."""
+    mask = _mask()
+    comps = connected_components_props(mask)
+
+    assert [c['bbox'] for c in comps] == [
+        (10, 5, 13, 8), (40, 5, 43, 19), (10, 10, 10, 10), (11, 11, 11, 11), (2, 30, 5, 37),
+    ]
+
+    for comp in comps:
+        rows, cols = np.where(comp['mask'] > 0)
+        xmin, ymin, xmax, ymax = comp['bbox']
+        assert comp['area'] == len(rows)
+        assert (xmin, ymin, xmax, ymax) == (cols.min(), rows.min(), cols.max(), rows.max())
+        assert comp['centroid'] == ((xmin + xmax) / 2, (ymin + ymax) / 2)
+        assert np.array_equal(comp['coords'], np.stack([rows, cols], axis=1))
+        assert np.array_equal(comp['local_mask'], comp['mask'][comp['slice']] > 0)
+
+    # Every foreground pixel belongs to exactly one component
+    assert np.array_equal(sum(c['mask'] for c in comps), mask)
+
+
+def test_components_lazy_masks():
+    """Full-frame masks and coordinates are only built when looked up."""
+    comps = connected_components_props(_mask())
+    assert all('mask' not in c and 'coords' not in c for c in comps)
+    assert comps[0]['mask'] is comps[0]['mask']
+    assert connected_components_props(np.zeros((8, 8), dtype=np.uint8)) == []
+
+
+def _tree(mask, cx, top, stem_w, crown_r, leaf_len, bud=True):
+    """Stem from ``top`` to the bottom edge, five leaves and a bud at the crown."""
+    h = mask.shape[0]
+    cv2.rectangle(mask, (cx - stem_w // 2, top), (cx + stem_w // 2, h - 1), 3, -1)
+    for dx, dy in ((-1, -1), (1, -1), (-1, 0), (1, 0), (0, -1)):
+        cv2.line(mask, (cx, top - crown_r), (cx + dx * leaf_len, top - crown_r + dy * leaf_len // 2 - 6), 2, 5)
+    if bud:
+        cv2.circle(mask, (cx, top - crown_r), crown_r, 1, -1)
+
+
+def _scenes():
+    """Synthetic label masks (0=bg, 1=bud, 2=leaf, 3=stem), one per postprocess branch."""
+    h, w = 240, 320
+
+    full = np.zeros((h, w), np.uint8)
+    _tree(full, 160, 100, 14, 10, 70)
+    _tree(full, 24, 120, 8, 6, 20)                       # background tree
+    cv2.circle(full, (300, 20), 6, 2, -1)               # detached leaf
+    cv2.circle(full, (290, 200), 4, 1, -1)              # detached bud
+    cv2.rectangle(full, (150, 180), (154, 186), 2, -1)  # leaf on the stem, below the crown
+
+    no_bud = np.zeros((h, w), np.uint8)
+    _tree(no_bud, 150, 100, 16, 8, 60, bud=False)
+    cv2.circle(no_bud, (40, 40), 10, 2, -1)
+
+    close = np.zeros((h, w), np.uint8)
+    for angle in range(0, 360, 45):
+        end = (int(160 + 130 * np.cos(np.radians(angle))), int(120 + 130 * np.sin(np.radians(angle))))
+        cv2.line(close, (160, 120), end, 2, 12)
+    cv2.circle(close, (160, 120), 40, 1, -1)            # bud drawn over the leaves
+    cv2.rectangle(close, (150, 160), (170, 239), 3, -1)
+    cv2.circle(close, (20, 220), 8, 2, -1)
+    cv2.circle(close, (300, 15), 5, 1, -1)
+
+    stem = np.zeros((h, w), np.uint8)
+    cv2.rectangle(stem, (140, 0), (180, 239), 3, -1)
+    cv2.rectangle(stem, (20, 60), (30, 239), 3, -1)
+    cv2.circle(stem, (60, 30), 12, 2, -1)
+
+    leaves = np.zeros((h, w), np.uint8)
+    cv2.circle(leaves, (60, 60), 30, 2, -1)
+    cv2.circle(leaves, (95, 60), 10, 1, -1)
+    cv2.circle(leaves, (250, 180), 15, 2, -1)
+
+    buds = np.zeros((h, w), np.uint8)
+    cv2.circle(buds, (160, 120), 30, 1, -1)
+    cv2.rectangle(buds, (193, 118), (260, 122), 1, -1)   # second bud, reaching out of the center
+    cv2.circle(buds, (268, 120), 6, 2, -1)              # leaf only touching the second bud
+    cv2.circle(buds, (30, 30), 6, 2, -1)
+
+    return {'bud_chain': buds, 'full_tree': full, 'no_bud': no_bud,
+            'close_up': close, 'stem_only': stem, 'no_stem': leaves}
+
+
+# Output of smart_postprocess on _scenes(): focus type, kept (bud, leaf, stem)
+# pixels and the first 16 hex digits of the sha256 of the filtered mask
+GOLDEN = {
+    'bud_chain': ('leaf_bud', (3161, 113, 0), '1d6ac59201f0f96f'),
+    'full_tree': ('full_tree', (317, 2170, 2085), 'dadd7b480cec5627'),
+    'no_bud': ('full_tree', (0, 2031, 2380), '6babd61487fcea9d'),
+    'close_up': ('leaf_bud', (5024, 8128, 1680), 'af1957d2a01153af'),
+    'stem_only': ('stem_only', (0, 0, 9840), 'ad03939a805ad470'),
+    'no_stem': ('full_tree', (317, 2767, 0), '39a9ec26004efd17'),
+}
+
+
+def test_smart_postprocess_golden():
+    """Filtered masks stay bit-identical to the recorded ones."""
+    for name, mask in _scenes().items():
+        filtered, debug_info = smart_postprocess(mask, mask.shape, debug=True)
+        counts = tuple(int(np.count_nonzero(filtered == c)) for c in (1, 2, 3))
+        digest = hashlib.sha256(filtered.tobytes()).hexdigest()[:16]
+        assert (debug_info['focus_type'], counts, digest) == GOLDEN[name], name
+
+
+if __name__ == "__main__":
+    test_components_properties()
+    test_components_lazy_masks()
+    test_smart_postprocess_golden()
+    print("All postprocess checks passed.")
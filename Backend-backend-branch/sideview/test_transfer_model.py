@@ -1,12 +1,13 @@
 import os
 import sys
 import json
+import threading
 
 import numpy as np
-import tensorflow as tf
-from tensorflow.keras.applications import MobileNetV2
-from tensorflow.keras import layers, models
-from tensorflow.keras.preprocessing import image
+from PIL import Image
+
+# TensorFlow is imported lazily (build_model / KerasBackend) so the TFLite
+# and ONNX Runtime backends do not pay for loading the full TF runtime.
 
 
 def load_labels(labels_path: str):
@@ -16,11 +17,90 @@ def load_labels(labels_path: str):
     return {int(k): v for k, v in data.items()}
 
 
-def build_model(num_classes: int):
+# Classifier input resolution (square)
+INPUT_SIZE = 224
+
+# Number of crops per forward pass in predict_batch
+DEFAULT_BATCH_SIZE = 32
+
+# Inference backend: "keras", "tflite" or "onnx" ("auto" = from file extension)
+CLASSIFIER_BACKEND = os.environ.get("SIDEVIEW_CLASSIFIER_BACKEND", "keras")
+
+# Optional explicit model file for the selected backend
+CLASSIFIER_MODEL = os.environ.get("SIDEVIEW_CLASSIFIER_MODEL") or None
+
+# CPU threads for the TFLite / ONNX Runtime backends (0 = runtime default)
+CLASSIFIER_THREADS = int(os.environ.get("SIDEVIEW_CLASSIFIER_THREADS", "0"))
+
+# Model files looked up (in order) next to this script when no path is given.
+# For Keras the full-model .keras file loads without rebuilding the
+# architecture; the .h5 file only holds weights. TFLite / ONNX files are
+# produced by scripts/quantize_transfer_model.py; int8 is preferred.
+MODEL_FILENAMES = {
+    "keras": (
+        "plant_disease_transfer_model.keras",
+        "plant_disease_transfer_model.h5",
+    ),
+    "tflite": (
+        "plant_disease_transfer_model_int8.tflite",
+        "plant_disease_transfer_model.tflite",
+    ),
+    "onnx": (
+        "plant_disease_transfer_model_int8.onnx",
+        "plant_disease_transfer_model.onnx",
+    ),
+}
+
+
+def backend_for_path(model_path: str) -> str:
+    """Infer the inference backend from a model file name."""
+    if model_path.endswith(".tflite"):
+        return "tflite"
+    if model_path.endswith(".onnx"):
+        return "onnx"
+    return "keras"
+
+
+def find_model_path(model_dir: str = None, backend: str = None) -> str:
+    """Return the preferred transfer model file in ``model_dir``.
+
+    ``SIDEVIEW_CLASSIFIER_MODEL`` overrides the lookup when its extension
+    fits the requested backend, so asking for the Keras reference still
+    finds the Keras file while the override points at a quantized model.
+    Falls back to the last candidate (which may not exist) so callers can
+    report a meaningful "not found" error.
+    """
+    if backend is None or backend == "auto":
+        if CLASSIFIER_MODEL and CLASSIFIER_BACKEND == "auto":
+            return CLASSIFIER_MODEL
+        backend = CLASSIFIER_BACKEND if CLASSIFIER_BACKEND != "auto" else "keras"
+    if CLASSIFIER_MODEL and backend_for_path(CLASSIFIER_MODEL) == backend:
+        return CLASSIFIER_MODEL
+    if model_dir is None:
+        model_dir = os.path.dirname(os.path.abspath(__file__))
+
+    candidates = MODEL_FILENAMES[backend]
+    for name in candidates:
+        path = os.path.join(model_dir, name)
+        if os.path.exists(path):
+            return path
+    return os.path.join(model_dir, candidates[-1])
+
+
+def build_model(num_classes: int, weights: str | None = "imagenet"):
+    """Build the MobileNetV2 transfer architecture.
+
+    Pass ``weights=None`` when the trained weights are loaded afterwards:
+    the ImageNet weights would be downloaded (or read from cache) only to be
+    overwritten, and the download fails on air-gapped machines.
+    """
+    from tensorflow.keras.applications import MobileNetV2
+    from tensorflow.keras import layers, models
+
     base_model = MobileNetV2(
-        input_shape=(224, 224, 3),
+        input_shape=(INPUT_SIZE, INPUT_SIZE, 3),
         include_top=False,
-        weights="imagenet",
+        weights=weights,
     )
     base_model.trainable = False
 
@@ -38,6 +118,158 @@ def build_model(num_classes: int):
     return model
 
 
+class KerasBackend:
+    """Full TensorFlow/Keras runtime (.keras, .h5 weights or SavedModel dir)."""
+
+    name = "keras"
+
+    def __init__(self, model_path: str, num_classes: int):
+        import tensorflow as tf
+
+        self._tf = tf
+        self.model = self._load_model(tf, model_path, num_classes)
+        self._infer = self._make_infer_fn(tf, self.model)
+
+    @staticmethod
+    def _load_model(tf, model_path: str, num_classes: int):
+        """Load a SavedModel directory, a full .keras model or .h5 weights."""
+        if os.path.isdir(model_path):
+            return tf.saved_model.load(model_path)
+        if model_path.endswith(".keras"):
+            return tf.keras.models.load_model(model_path, compile=False)
+
+        # Legacy weights-only file: the architecture has to be rebuilt, but
+        # without fetching the ImageNet weights that load_weights replaces.
+        model = build_model(num_classes, weights=None)
+        model.load_weights(model_path)
+        return model
+
+    @staticmethod
+    def _make_infer_fn(tf, model):
+        """Trace inference once with a fixed input signature.
+
+        Unlike repeated ``model.predict`` calls, this never retraces for new
+        batch sizes and does not build a new data pipeline per call.
+        """
+        signature = [tf.TensorSpec(shape=(None, INPUT_SIZE, INPUT_SIZE, 3), dtype=tf.float32)]
+
+        if isinstance(model, tf.keras.Model):
+            @tf.function(input_signature=signature)
+            def infer(batch):
+                return model(batch, training=False)
+            return infer
+
+        # SavedModel: use its exported serving function
+        serve = getattr(model, "serve", None) or model.signatures["serving_default"]
+
+        @tf.function(input_signature=signature)
+        def infer(batch):
+            out = serve(batch)
+            if isinstance(out, dict):
+                out = next(iter(out.values()))
+            return out
+        return infer
+
+    @property
+    def nbytes(self):
+        weights = getattr(self.model, "weights", None) or getattr(self.model, "variables", [])
+        return int(sum(
+            int(np.prod(w.shape)) * (getattr(w.dtype, "size", None) or np.dtype(w.dtype).itemsize)
+            for w in weights
+        ))
+
+    def __call__(self, batch: np.ndarray) -> np.ndarray:
+        return self._infer(self._tf.constant(batch)).numpy()
+
+
+class TFLiteBackend:
+    """TFLite interpreter (fp32 or int8 post-training quantized model)."""
+
+    name = "tflite"
+
+    def __init__(self, model_path: str, num_threads: int = CLASSIFIER_THREADS):
+        try:
+            from ai_edge_litert.interpreter import Interpreter
+        except ImportError:
+            try:
+                from tflite_runtime.interpreter import Interpreter
+            except ImportError:
+                from tensorflow.lite import Interpreter
+
+        self.model = Interpreter(model_path=model_path, num_threads=num_threads or None)
+        self.model.allocate_tensors()
+        self._input = self.model.get_input_details()[0]
+        self._output = self.model.get_output_details()[0]
+        self._batch = None
+        # The interpreter holds mutable tensors: one call at a time
+        self._lock = threading.Lock()
+        self.nbytes = os.path.getsize(model_path)
+
+    def __call__(self, batch: np.ndarray) -> np.ndarray:
+        with self._lock:
+            if self._batch != len(batch):
+                self.model.resize_tensor_input(self._input["index"], list(batch.shape))
+                self.model.allocate_tensors()
+                self._input = self.model.get_input_details()[0]
+                self._output = self.model.get_output_details()[0]
+                self._batch = len(batch)
+
+            in_dtype = self._input["dtype"]
+            if in_dtype != np.float32:
+                # Fully integer model: quantize the input
+                scale, zero_point = self._input["quantization"]
+                info = np.iinfo(in_dtype)
+                batch = np.clip(np.round(batch / scale + zero_point), info.min, info.max).astype(in_dtype)
+
+            self.model.set_tensor(self._input["index"], batch)
+            self.model.invoke()
+            out = self.model.get_tensor(self._output["index"])
+
+            if out.dtype != np.float32:
+                scale, zero_point = self._output["quantization"]
+                out = (out.astype(np.float32) - zero_point) * scale
+            return out
+
+
+class OnnxBackend:
+    """ONNX Runtime CPU session (fp32 or int8 QDQ model)."""
+
+    name = "onnx"
+
+    def __init__(self, model_path: str, num_threads: int = CLASSIFIER_THREADS):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if num_threads:
+            options.intra_op_num_threads = num_threads
+        self.model = ort.InferenceSession(model_path, sess_options=options,
+                                          providers=["CPUExecutionProvider"])
+        self._input_name = self.model.get_inputs()[0].name
+        self.nbytes = os.path.getsize(model_path)
+
+    def __call__(self, batch: np.ndarray) -> np.ndarray:
+        return self.model.run(None, {self._input_name: batch})[0]
+
+
+BACKENDS = {
+    "keras": KerasBackend,
+    "tflite": TFLiteBackend,
+    "onnx": OnnxBackend,
+}
+
+
+def load_backend(model_path: str, num_classes: int, backend: str = "auto"):
+    """Instantiate the inference backend for ``model_path``."""
+    if backend == "auto":
+        backend = backend_for_path(model_path)
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown classifier backend '{backend}'. Choose from {sorted(BACKENDS)}")
+    if backend == "keras":
+        return KerasBackend(model_path, num_classes)
+    return BACKENDS[backend](model_path)
+
+
 # Indices that correspond to healthy classes
 HEALTHY_INDICES = {2, 5, 7}
 
@@ -58,11 +290,22 @@ class TransferModelPredictor:
     video pipeline (scripts/video_to_phase2.py).
     """
 
-    def __init__(self, model_path: str = None, labels_path: str = None):
+    def __init__(self, model_path: str = None, labels_path: str = None, backend: str = None):
+        """
+        Args:
+            model_path: model file; defaults to the preferred file for the
+                backend next to this script (see find_model_path)
+            labels_path: labels.json path
+            backend: "keras", "tflite", "onnx" or "auto" (from the file
+                extension); defaults to SIDEVIEW_CLASSIFIER_BACKEND
+        """
         script_dir = os.path.dirname(os.path.abspath(__file__))
 
+        if backend is None:
+            # An explicit model file selects its own backend
+            backend = CLASSIFIER_BACKEND if model_path is None else "auto"
         if model_path is None:
-            model_path = os.path.join(script_dir, "plant_disease_transfer_model.h5")
+            model_path = find_model_path(script_dir, backend)
         if labels_path is None:
             labels_path = os.path.join(script_dir, "labels.json")
 
@@ -74,12 +317,15 @@ class TransferModelPredictor:
         self.model_path = model_path
         self.labels_path = labels_path
 
-        # Load labels and build the model once
+        # Load labels and the model once
         self.index_to_class = load_labels(labels_path)
-        num_classes = len(self.index_to_class)
+        self.backend = load_backend(model_path, len(self.index_to_class), backend)
+        self.model = self.backend.model
 
-        self.model = build_model(num_classes)
-        self.model.load_weights(model_path)
+    @property
+    def nbytes(self) -> int:
+        """Approximate model memory (weights or model file size)."""
+        return self.backend.nbytes
 
     @staticmethod
     def _index_to_part(predicted_index: int, label: str) -> str:
@@ -116,6 +362,52 @@ class TransferModelPredictor:
         # Convert underscores to spaces: 'Grey_leaf_rot' -> 'Grey leaf rot'
         return rest.replace("_", " ")
 
+    @staticmethod
+    def preprocess_image(img) -> np.ndarray:
+        """Convert an RGB array (or PIL image) to a normalized 224x224 input.
+
+        Mirrors ``keras.preprocessing.image.load_img(target_size=(224, 224))``
+        (RGB conversion + nearest-neighbour resize) so that predictions on
+        in-memory crops match predictions on the same crop saved as PNG.
+        """
+        if not isinstance(img, Image.Image):
+            img = Image.fromarray(np.asarray(img, dtype=np.uint8))
+        if img.mode != "RGB":
+            img = img.convert("RGB")
+        if img.size != (INPUT_SIZE, INPUT_SIZE):
+            img = img.resize((INPUT_SIZE, INPUT_SIZE), Image.NEAREST)
+        return np.asarray(img, dtype=np.float32) / 255.0
+
+    def predict_batch(self, images, forced_parts=None, batch_size: int = DEFAULT_BATCH_SIZE) -> list:
+        """Run the transfer model on a list of decoded RGB images.
+
+        Args:
+            images: list of HxWx3 (or HxWx4) uint8 RGB arrays or PIL images
+            forced_parts: optional list (aligned with ``images``) of trusted
+                part names, or a single part name applied to every image
+            batch_size: maximum number of images per forward pass
+
+        Returns:
+            List of result dicts, same shape as :meth:`predict`.
+        """
+        images = list(images)
+        if not images:
+            return []
+
+        if forced_parts is None or isinstance(forced_parts, str):
+            forced_parts = [forced_parts] * len(images)
+        elif len(forced_parts) != len(images):
+            raise ValueError("forced_parts must have the same length as images")
+
+        results = []
+        for start in range(0, len(images), batch_size):
+            chunk = images[start:start + batch_size]
+            batch = np.stack([self.preprocess_image(img) for img in chunk])
+            probs = self.backend(batch)
+            for row, forced_part in zip(probs, forced_parts[start:start + batch_size]):
+                results.append(self._build_result(row, forced_part))
+        return results
+
     def predict(self, img_path: str, forced_part: str | None = None) -> dict:
         """Run the transfer model on a single image path.
 
@@ -132,14 +424,11 @@ class TransferModelPredictor:
         if not os.path.exists(img_path):
             raise FileNotFoundError(f"Image not found at {img_path}")
 
-        # Load and preprocess image
-        img = image.load_img(img_path, target_size=(224, 224))
-        img_array = image.img_to_array(img) / 255.0
-        img_array = np.expand_dims(img_array, axis=0)
-
-        # Predict probabilities
-        probs = self.model.predict(img_array, verbose=0)[0]
+        with Image.open(img_path) as img:
+            return self.predict_batch([img.convert("RGB")], forced_parts=[forced_part])[0]
 
+    def _build_result(self, probs: np.ndarray, forced_part: str | None = None) -> dict:
+        """Turn one row of class probabilities into a prediction dict."""
         predicted_index = int(np.argmax(probs))
         predicted_label = self.index_to_class.get(predicted_index, str(predicted_index))
         confidence = float(np.max(probs) * 100.0)
@@ -213,7 +502,7 @@ def main():
         sys.exit(1)
 
     script_dir = os.path.dirname(os.path.abspath(__file__))
-    model_path = os.path.join(script_dir, "plant_disease_transfer_model.h5")
+    model_path = find_model_path(script_dir)
     labels_path = os.path.join(script_dir, "labels.json")
 
     try:
@@ -1,7 +1,26 @@
+import logging
 import os
-from topview.config import MODEL_PATH
+from topview.config import MODEL_PATH, MODEL_FORMAT, EXPORTED_MODEL_PATHS
+
+logger = logging.getLogger(__name__)
+
+
+def get_model_path(model_format=None):
+    """Path of the detector for ``model_format`` (default: TOPVIEW_MODEL_FORMAT).
+
+    Falls back to the PyTorch weights when the exported model is missing.
+    """
+    model_format = model_format or MODEL_FORMAT
+    if model_format not in EXPORTED_MODEL_PATHS:
+        raise ValueError(f"Unknown TopView model format '{model_format}'. "
+                         f"Choose from {sorted(EXPORTED_MODEL_PATHS)}")
+
+    exported = EXPORTED_MODEL_PATHS[model_format]
+    if model_format != "pt":
+        if os.path.exists(exported):
+            return exported
+        logger.warning(f"TopView {model_format} model not found at {exported}; using {MODEL_PATH}")
 
-def get_model_path():
     if not os.path.exists(MODEL_PATH):
         raise FileNotFoundError(f"TopView YOLO model not found: {MODEL_PATH}")
     return MODEL_PATH
@@ -1,24 +1,56 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException
+import json
+import zipfile
+from contextlib import ExitStack
+from pathlib import Path
+from typing import List, Optional
+
+from fastapi import APIRouter, UploadFile, File, HTTPException, Query
+from fastapi.concurrency import run_in_threadpool
 from fastapi.responses import StreamingResponse, Response
 import numpy as np
 import cv2
 import io
 import base64
 
-from topview.api.model_path import get_model_path
-from topview.model import TopViewModel
+from topview.config import DETECT_BATCH_SIZE, MAX_BATCH_IMAGES, MAX_ZIP_MEMBER_BYTES, MAX_ZIP_TOTAL_BYTES
+from topview.model import TOPVIEW_MODEL_NAME
 from topview.utils import assign_numbers, draw_overlay
+from utils.model_registry import model_registry
 
 router = APIRouter(prefix="/topview", tags=["Top-View Detection"])
 
-# Load YOLO model using model_path.py
-model = TopViewModel(get_model_path())
+# Shared YOLO model, loaded on first request through the model registry
+_model = None
+
+
+def get_model():
+    """Return the shared TopViewModel, loading it on first use."""
+    global _model
+    if _model is None:
+        try:
+            _model = model_registry.acquire(TOPVIEW_MODEL_NAME)
+        except FileNotFoundError as e:
+            raise HTTPException(503, str(e))
+    return _model
+
+
+# Query parameter shared by the detect endpoints
+TILED_QUERY = Query(None, description="Force tiled inference on/off (default: automatic for orthomosaic-sized images)")
+
+
+def _detect_numbered(img, tiled):
+    """
+    Numbered trees of one image. Blocking: the endpoints run it in the
+    threadpool so a batch holding the model does not stall the event loop.
+    """
+    boxes = get_model().detect_trees(img, tiled=tiled)
+    return assign_numbers(boxes, img.shape[0])
 
 # ---------------------------------------------------------
 # 1️⃣ JSON Only
 # ---------------------------------------------------------
 @router.post("/detect")
-async def detect_json(file: UploadFile = File(...)):
+async def detect_json(file: UploadFile = File(...), tiled: Optional[bool] = TILED_QUERY):
     img_bytes = await file.read()
 
     img = cv2.imdecode(np.frombuffer(img_bytes, np.uint8), cv2.IMREAD_COLOR)
@@ -26,8 +58,7 @@ async def detect_json(file: UploadFile = File(...)):
     if img is None:
         raise HTTPException(400, "Invalid image")
 
-    boxes = model.detect_trees(img)
-    numbered = assign_numbers(boxes, img.shape[0])
+    numbered = await run_in_threadpool(_detect_numbered, img, tiled)
 
     return {"count": len(numbered), "trees": numbered}
 
@@ -47,7 +78,7 @@ async def detect_json(file: UploadFile = File(...)):
         }
     },
 )
-async def detect_image(file: UploadFile = File(...)):
+async def detect_image(file: UploadFile = File(...), tiled: Optional[bool] = TILED_QUERY):
     img_bytes = await file.read()
 
     img = cv2.imdecode(np.frombuffer(img_bytes, np.uint8), cv2.IMREAD_COLOR)
@@ -55,8 +86,7 @@ async def detect_image(file: UploadFile = File(...)):
     if img is None:
         raise HTTPException(400, "Invalid image")
 
-    boxes = model.detect_trees(img)
-    numbered = assign_numbers(boxes, img.shape[0])
+    numbered = await run_in_threadpool(_detect_numbered, img, tiled)
     annotated = draw_overlay(img, numbered)
 
     ok, buf = cv2.imencode(".png", annotated)
@@ -74,7 +104,7 @@ async def detect_image(file: UploadFile = File(...)):
 # 3️⃣ JSON + Base64 Image (Full response)
 # ---------------------------------------------------------
 @router.post("/detect/full")
-async def detect_full(file: UploadFile = File(...)):
+async def detect_full(file: UploadFile = File(...), tiled: Optional[bool] = TILED_QUERY):
     img_bytes = await file.read()
 
     img = cv2.imdecode(np.frombuffer(img_bytes, np.uint8), cv2.IMREAD_COLOR)
@@ -82,8 +112,7 @@ async def detect_full(file: UploadFile = File(...)):
     if img is None:
         raise HTTPException(400, "Invalid image")
 
-    boxes = model.detect_trees(img)
-    numbered = assign_numbers(boxes, img.shape[0])
+    numbered = await run_in_threadpool(_detect_numbered, img, tiled)
     annotated = draw_overlay(img, numbered)
 
     ok, buf = cv2.imencode(".png", annotated)
@@ -97,3 +126,126 @@ async def detect_full(file: UploadFile = File(...)):
         "trees": numbered,
         "image_base64": b64
     }
+
+# ---------------------------------------------------------
+# 4️⃣ Batch detection (NDJSON stream)
+# ---------------------------------------------------------
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".tif", ".tiff", ".bmp", ".webp"}
+
+
+def _expand_uploads(uploads):
+    """
+    (filename, bytes) for every uploaded image; zip archives are unpacked.
+
+    The image count and the uncompressed sizes are checked from the zip
+    directories before any member is decompressed.
+    """
+    with ExitStack() as archives:
+        # Every opened archive is closed on return and on any rejection
+        sources, count = [], 0
+        for name, data in uploads:
+            if Path(name or "").suffix.lower() == ".zip" or zipfile.is_zipfile(io.BytesIO(data)):
+                try:
+                    zf = archives.enter_context(zipfile.ZipFile(io.BytesIO(data)))
+                except zipfile.BadZipFile:
+                    raise HTTPException(400, f"Invalid zip archive: {name}")
+                members = [info for info in sorted(zf.infolist(), key=lambda i: i.filename)
+                           if not info.is_dir() and Path(info.filename).suffix.lower() in IMAGE_EXTENSIONS]
+                sources.append((name, zf, members))
+                count += len(members)
+            else:
+                sources.append((name, data, None))
+                count += 1
+
+        if count > MAX_BATCH_IMAGES:
+            raise HTTPException(413, f"Too many images ({count}); the limit is {MAX_BATCH_IMAGES}")
+
+        total = 0
+        for name, _, members in sources:
+            for info in members or []:
+                if info.file_size > MAX_ZIP_MEMBER_BYTES:
+                    raise HTTPException(413, f"{info.filename} in {name} is too large "
+                                             f"({info.file_size} bytes); the limit is {MAX_ZIP_MEMBER_BYTES}")
+                total += info.file_size
+        if total > MAX_ZIP_TOTAL_BYTES:
+            raise HTTPException(413, f"Zip archives expand to {total} bytes; the limit is {MAX_ZIP_TOTAL_BYTES}")
+
+        items = []
+        for name, source, members in sources:
+            if members is None:
+                items.append((name, source))
+                continue
+            try:
+                items.extend((info.filename, source.read(info)) for info in members)
+            except zipfile.BadZipFile:
+                raise HTTPException(400, f"Invalid zip archive: {name}")
+    return items
+
+
+def _batch_results(model, items, tiled):
+    """Yield one NDJSON line per image, a batch of images per forward pass."""
+    total_trees = 0
+    failed = 0
+
+    for start in range(0, len(items), DETECT_BATCH_SIZE):
+        chunk = items[start:start + DETECT_BATCH_SIZE]
+        imgs = [cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR) for _, data in chunk]
+
+        valid = [i for i, img in enumerate(imgs) if img is not None]
+        errors = {}
+        try:
+            by_index = dict(zip(valid, model.detect_trees_batch([imgs[i] for i in valid], tiled=tiled)))
+        except Exception:
+            # Retry one image at a time so only the failing images get an error
+            by_index = {}
+            for i in valid:
+                try:
+                    by_index[i] = model.detect_trees(imgs[i], tiled=tiled)
+                except Exception as e:
+                    errors[i] = str(e)
+
+        for i, (name, _) in enumerate(chunk):
+            line = {"index": start + i, "filename": name}
+            if imgs[i] is None:
+                line["error"] = "Invalid image"
+            elif i in errors:
+                line["error"] = f"Detection failed: {errors[i]}"
+            else:
+                numbered = assign_numbers(by_index[i], imgs[i].shape[0])
+                line.update({"count": len(numbered), "trees": numbered})
+                total_trees += len(numbered)
+            failed += "error" in line
+            yield json.dumps(line) + "\n"
+
+    yield json.dumps({"summary": {"images": len(items), "failed": failed, "trees": total_trees}}) + "\n"
+
+
+@router.post(
+    "/detect/batch",
+    responses={
+        200: {
+            "description": "One JSON object per line: per-image results in upload order, then a summary",
+            "content": {"application/x-ndjson": {}},
+        }
+    },
+)
+async def detect_batch(files: List[UploadFile] = File(...), tiled: Optional[bool] = TILED_QUERY):
+    """
+    Detect trees in many images (multipart files and/or zip archives).
+
+    Images are run through YOLO in batches of DETECT_BATCH_SIZE and results
+    are streamed as NDJSON as each batch finishes:
+    {"index", "filename", "count", "trees"} or {"index", "filename", "error"}
+    per image, then {"summary": {...}}.
+    """
+    uploads = [(f.filename, await f.read()) for f in files]
+    items = await run_in_threadpool(_expand_uploads, uploads)
+
+    if not items:
+        raise HTTPException(400, "No images found in upload")
+
+    model = get_model()
+
+    # Sync generator: Starlette iterates it in a worker thread, so decoding
+    # and inference do not block the event loop
+    return StreamingResponse(_batch_results(model, items, tiled), media_type="application/x-ndjson")
@@ -5,6 +5,16 @@ MODEL_DIR = os.path.join(os.path.dirname(__file__), "api", "models")
 MODEL_NAME = "final_best.pt"
 MODEL_PATH = os.path.join(MODEL_DIR, MODEL_NAME)
 
+# Runtime format of the detector: "pt" (ultralytics PyTorch), "onnx"
+# (ONNX Runtime) or "openvino". Exported files are created next to
+# final_best.pt by topview/scripts/export_model.py.
+MODEL_FORMAT = os.environ.get("TOPVIEW_MODEL_FORMAT", "pt")
+EXPORTED_MODEL_PATHS = {
+    "pt": MODEL_PATH,
+    "onnx": os.path.join(MODEL_DIR, "final_best.onnx"),
+    "openvino": os.path.join(MODEL_DIR, "final_best_openvino_model"),
+}
+
 # YOLO settings (optional)
 CONFIDENCE_THRESHOLD = 0.40
 IOU_THRESHOLD = 0.45
@@ -12,7 +22,35 @@ IOU_THRESHOLD = 0.45
 # Minimum detected tree area as fraction of image area (friend logic used 0.018)
 MIN_TREE_AREA_RATIO = 0.018
 
-# Vertical grouping tolerance in pixels (friend logic used 150)
-ROW_TOLERANCE = 150
-
+# Inference size; exported models are built with this fixed input size
 IMGSZ = 640
+
+# Tiled (sliced) inference for large orthomosaics. Images whose longer side
+# exceeds TILED_MIN_SIDE are cut into overlapping TILE_SIZE tiles; each tile
+# is predicted at IMGSZ and boxes are merged back in image coordinates.
+# The automatic threshold sits above drone stills (up to 8000x6000 for
+# 48 MP cameras), which keep whole-image inference unless tiled=True.
+TILE_SIZE = 1280
+TILE_OVERLAP = 0.20             # fraction of TILE_SIZE shared by neighbouring tiles
+TILED_MIN_SIDE = 10000
+TILE_BATCH = 8                  # tiles per predict call (bounds memory)
+TILE_WORKERS = 2                # tile batches predicted in parallel
+TILE_NMS_IOU = 0.45             # global NMS across tile seams
+TILE_CONTAINMENT_THRESHOLD = 0.80  # drop boxes mostly inside a better box (cut at a seam)
+
+# Row grouping / tree numbering (topview/rows.py), shared by detect_trees
+# and assign_numbers. Row tolerance = max(ROW_TOLERANCE_MIN_PX,
+# ROW_TOLERANCE_RATIO * image height). Tiled detection caps the height at
+# ROW_TOLERANCE_TILED_MAX_HEIGHT so orthomosaic rows are not merged.
+ROW_TOLERANCE_RATIO = 0.07
+ROW_TOLERANCE_MIN_PX = 25
+ROW_TOLERANCE_TILED_MAX_HEIGHT = 2 * TILE_SIZE
+ROW_STRATEGY = "tolerance"      # "tolerance" (running row mean) or "gap" (adaptive gap detection)
+ROW_ORDERING = "reading"        # "reading" (left->right every row) or "serpentine"
+
+# /topview/detect/batch: images per batched forward pass and per request
+DETECT_BATCH_SIZE = 8
+MAX_BATCH_IMAGES = 200
+# Uncompressed size limits for zip uploads, checked before decompressing
+MAX_ZIP_MEMBER_BYTES = 200 * 1024 * 1024
+MAX_ZIP_TOTAL_BYTES = 1024 * 1024 * 1024
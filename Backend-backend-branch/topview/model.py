@@ -1,3 +1,6 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
 import cv2
 import numpy as np
 from ultralytics import YOLO
@@ -7,85 +10,216 @@ from topview.config import (
     CONFIDENCE_THRESHOLD,
     IOU_THRESHOLD,
     MIN_TREE_AREA_RATIO,
-    ROW_TOLERANCE
+    IMGSZ,
+    TILE_SIZE,
+    TILE_OVERLAP,
+    TILED_MIN_SIDE,
+    TILE_BATCH,
+    TILE_WORKERS,
+    TILE_NMS_IOU,
+    TILE_CONTAINMENT_THRESHOLD,
+    ROW_TOLERANCE_TILED_MAX_HEIGHT
 )
 
-from topview.utils import compute_iou
+from topview.utils import tree_box_mask, greedy_dedup, contained_boxes
+from topview.rows import row_tolerance, number_trees
+from topview.api.model_path import get_model_path
+from utils.model_registry import model_registry
+
+# Registry name of the shared YOLO detector
+TOPVIEW_MODEL_NAME = "topview_yolo"
 
 
 class TopViewModel:
 
     def __init__(self, model_path=MODEL_PATH):
-        self.model = YOLO(model_path)
-
-    def detect_trees(self, img):
-
-        H, W = img.shape[:2]
-
-        results = self.model.predict(
-            source=img,
+        # .pt, exported .onnx or *_openvino_model/ dir; ultralytics picks
+        # the runtime (PyTorch, ONNX Runtime, OpenVINO) from the path
+        self.model_path = str(model_path)
+        self.model = YOLO(self.model_path, task="detect")
+
+        # Tiled mode: ultralytics predictors are not thread-safe, so each
+        # worker thread gets its own YOLO instance
+        self._tile_pool = None
+        self._tile_local = threading.local()
+        self._tile_lock = threading.Lock()
+        # Serializes use of self.model across request threads
+        self._predict_lock = threading.Lock()
+
+    def _predict(self, model, source):
+        return model.predict(
+            source=source,
             conf=CONFIDENCE_THRESHOLD,
             iou=IOU_THRESHOLD,
+            imgsz=IMGSZ,
             verbose=False
-        )[0]
-
-        boxes = results.boxes.xyxy.cpu().numpy()
-        scores = results.boxes.conf.cpu().numpy()
-
-        filtered = []
-
-        for (x1, y1, x2, y2), sc in zip(boxes, scores):
-
-            w, h = x2 - x1, y2 - y1
-            area = w * h
-
-            if area < MIN_TREE_AREA_RATIO * (H * W):
-                continue
-
-            if w < 120 or h < 120:
-                continue
-
-            ratio = w / h
-            if ratio < 0.45 or ratio > 1.80:
-                continue
-
-            filtered.append((float(x1), float(y1), float(x2), float(y2)))
-
-        cleaned = []
-        for box in filtered:
-            if all(compute_iou(box, kept) <= 0.40 for kept in cleaned):
-                cleaned.append(box)
-
-        rows = []
-        for box in cleaned:
-            x1, y1, x2, y2 = box
-            cy = (y1 + y2) / 2
-            placed = False
-
-            for r in rows:
-                if abs(r["cy"] - cy) < ROW_TOLERANCE:
-                    r["items"].append(box)
-                    placed = True
-                    break
-
-            if not placed:
-                rows.append({"cy": cy, "items": [box]})
-
-        rows = sorted(rows, key=lambda r: r["cy"])
-
-        ordered = []
-        for r in rows:
-            ordered.extend(sorted(r["items"], key=lambda b: (b[0] + b[2]) / 2))
+        )
+
+    def predict_boxes(self, img):
+        """Raw YOLO boxes (xyxy) and scores, before the tree filters."""
+        return self.predict_boxes_batch([img])[0]
+
+    def predict_boxes_batch(self, imgs):
+        """Raw (boxes, scores) per image, from one batched forward pass."""
+        with self._predict_lock:
+            results = self._predict(self.model, list(imgs))
+
+        return [(res.boxes.xyxy.cpu().numpy(), res.boxes.conf.cpu().numpy()) for res in results]
+
+    @staticmethod
+    def tile_grid(H, W, tile=TILE_SIZE, overlap=TILE_OVERLAP):
+        """Top-left corners of overlapping tiles covering an H x W image."""
+        stride = max(1, int(tile * (1 - overlap)))
+
+        def starts(length):
+            if length <= tile:
+                return [0]
+            # Last tile is aligned to the border instead of padding
+            return list(range(0, length - tile, stride)) + [length - tile]
+
+        return [(x, y) for y in starts(H) for x in starts(W)]
+
+    def _worker_model(self):
+        model = getattr(self._tile_local, "model", None)
+        if model is None:
+            model = YOLO(self.model_path, task="detect")
+            self._tile_local.model = model
+        return model
+
+    def _predict_tile_batch(self, img, origins):
+        tiles = [np.ascontiguousarray(img[y:y + TILE_SIZE, x:x + TILE_SIZE]) for x, y in origins]
+        results = self._predict(self._worker_model(), tiles)
+
+        boxes, scores = [], []
+        for (x, y), res in zip(origins, results):
+            b = res.boxes.xyxy.cpu().numpy()
+            boxes.append(b + np.array([x, y, x, y], dtype=b.dtype))
+            scores.append(res.boxes.conf.cpu().numpy())
+        return boxes, scores
+
+    def predict_boxes_tiled(self, img):
+        """
+        Raw boxes/scores for a large image from overlapping tiles.
+
+        Tiles are predicted in batches of TILE_BATCH on TILE_WORKERS threads,
+        so memory depends on the tile size, not on the image size. Boxes are
+        shifted to image coordinates and merged across tile seams with a
+        global NMS that also drops boxes cut off at a seam (mostly contained
+        in a higher-scoring box).
+        """
+        H, W = img.shape[:2]
+        origins = self.tile_grid(H, W)
+        batches = [origins[i:i + TILE_BATCH] for i in range(0, len(origins), TILE_BATCH)]
+
+        with self._tile_lock:
+            if self._tile_pool is None:
+                self._tile_pool = ThreadPoolExecutor(max_workers=TILE_WORKERS,
+                                                     thread_name_prefix="topview-tile")
+
+        boxes, scores = [], []
+        for b, s in self._tile_pool.map(lambda batch: self._predict_tile_batch(img, batch), batches):
+            boxes.extend(b)
+            scores.extend(s)
+
+        if not boxes:
+            return np.zeros((0, 4), dtype=np.float32), np.zeros(0, dtype=np.float32)
+        boxes = np.concatenate(boxes)
+        scores = np.concatenate(scores)
+
+        keep = self._merge_tile_boxes(boxes, scores)
+        return boxes[keep], scores[keep]
+
+    @staticmethod
+    def _merge_tile_boxes(boxes, scores, iou_thresh=TILE_NMS_IOU,
+                          containment_thresh=TILE_CONTAINMENT_THRESHOLD):
+        """Global NMS across tiles; returns kept indices in score order.
+
+        After the usual greedy IoU suppression, a box lying mostly inside a
+        larger kept box is a tree cut off at a tile seam and is dropped,
+        whatever its score.
+        """
+        keep = greedy_dedup(boxes, iou_thresh, order=np.argsort(-scores, kind="stable"))
+        return keep[~contained_boxes(boxes[keep], containment_thresh)]
+
+    @staticmethod
+    def _use_tiles(img, tiled):
+        return max(img.shape[:2]) > TILED_MIN_SIDE if tiled is None else tiled
+
+    def detect_trees(self, img, tiled=None):
+        """
+        Detect trees and return them in row order.
+
+        tiled: True/False to force tiled inference on or off; None (default)
+            tiles only images whose longer side exceeds TILED_MIN_SIDE.
+        """
+        if self._use_tiles(img, tiled):
+            boxes, _ = self.predict_boxes_tiled(img)
+            return self._postprocess(boxes, img.shape[:2], tiled=True)
+
+        boxes, _ = self.predict_boxes(img)
+        return self._postprocess(boxes, img.shape[:2])
+
+    def detect_trees_batch(self, imgs, tiled=None):
+        """
+        detect_trees for several images; results are in input order.
+
+        Images below the tiling threshold share one batched forward pass,
+        large ones go through tiled inference individually.
+        """
+        results = [None] * len(imgs)
+        direct = []
+        for i, img in enumerate(imgs):
+            if self._use_tiles(img, tiled):
+                boxes, _ = self.predict_boxes_tiled(img)
+                results[i] = self._postprocess(boxes, img.shape[:2], tiled=True)
+            else:
+                direct.append(i)
+
+        if direct:
+            raw = self.predict_boxes_batch([imgs[i] for i in direct])
+            for i, (boxes, _) in zip(direct, raw):
+                results[i] = self._postprocess(boxes, imgs[i].shape[:2])
+        return results
+
+    def _postprocess(self, boxes, shape, tiled=False):
+        """Tree filters, de-duplication and row ordering of raw boxes."""
+
+        H, W = shape
+
+        if tiled:
+            # The area filter is relative to what the model saw: one tile
+            # rather than the whole orthomosaic
+            ref_area = min(H, TILE_SIZE) * min(W, TILE_SIZE)
+        else:
+            ref_area = H * W
+
+        # Area / size / aspect filters
+        valid = tree_box_mask(boxes, MIN_TREE_AREA_RATIO * ref_area)
+        filtered = boxes[valid].astype(np.float64)
+
+        # Drop duplicates: keep a box only if IoU <= 0.40 with every kept one
+        cleaned = [tuple(float(v) for v in filtered[i]) for i in greedy_dedup(filtered, 0.40)]
+
+        centroids = [(int((x1 + x2) / 2), int((y1 + y2) / 2)) for x1, y1, x2, y2 in cleaned]
+
+        # Row grouping / numbering shared with assign_numbers
+        order, _ = number_trees(
+            [cx for cx, _ in centroids],
+            [cy for _, cy in centroids],
+            row_tolerance(H, ROW_TOLERANCE_TILED_MAX_HEIGHT if tiled else None)
+        )
 
         detections = []
-        for idx, (x1, y1, x2, y2) in enumerate(ordered, 1):
-            cx = int((x1 + x2) / 2)
-            cy = int((y1 + y2) / 2)
+        for idx, i in enumerate(order, 1):
+            x1, y1, x2, y2 = cleaned[i]
 
             detections.append({
                 "id": idx,
                 "bbox": [float(x1), float(y1), float(x2), float(y2)],
-                "centroid": [cx, cy]
+                "centroid": list(centroids[i])
             })
 
         return detections
+
+
+model_registry.register(TOPVIEW_MODEL_NAME, lambda: TopViewModel(get_model_path()))
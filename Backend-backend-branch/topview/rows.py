@@ -0,0 +1,116 @@
+"""
+Row clustering and tree numbering for top-view detections.
+
+Trees are grouped into rows by 1-D clustering of their centroid y after a
+single sort (O(n log n)), then numbered row by row. Used by both
+TopViewModel.detect_trees and topview.utils.assign_numbers so ids and tree
+numbers agree on row membership.
+
+Strategies (how rows are formed):
+    tolerance  a tree joins the current row if |y - row mean y| <= tolerance
+    gap        rows are split at the gaps in sorted y that are clearly larger
+               than the within-row spread (adaptive; tolerance / 2 is the
+               smallest gap treated as a row break)
+
+Orderings (how trees are numbered):
+    reading     every row left -> right, rows top -> bottom
+    serpentine  alternate left -> right / right -> left (how a field team
+                walks the rows)
+"""
+
+import numpy as np
+
+from topview.config import (
+    ROW_TOLERANCE_RATIO,
+    ROW_TOLERANCE_MIN_PX,
+    ROW_STRATEGY,
+    ROW_ORDERING
+)
+
+# Smallest ratio between consecutive sorted gaps accepted as the
+# within-row / between-row boundary by the "gap" strategy
+GAP_MIN_RATIO = 2.0
+
+
+def row_tolerance(img_height, max_height=None):
+    """Row tolerance in pixels for an image of the given height (optionally capped)."""
+    if max_height is not None:
+        img_height = min(img_height, max_height)
+    return max(ROW_TOLERANCE_MIN_PX, int(img_height * ROW_TOLERANCE_RATIO))
+
+
+def _tolerance_rows(ys_sorted, tolerance):
+    labels = np.zeros(len(ys_sorted), dtype=int)
+    row, total, count = 0, ys_sorted[0], 1
+    for k in range(1, len(ys_sorted)):
+        y = ys_sorted[k]
+        if abs(y - total / count) <= tolerance:
+            total += y
+            count += 1
+        else:
+            row += 1
+            total, count = y, 1
+        labels[k] = row
+    return labels
+
+
+def _gap_rows(ys_sorted, tolerance):
+    gaps = np.diff(np.asarray(ys_sorted, dtype=np.float64))
+    min_break = tolerance / 2
+
+    threshold = tolerance
+    sorted_gaps = np.sort(gaps)
+    if sorted_gaps.size >= 2:
+        ratios = (sorted_gaps[1:] + 1.0) / (sorted_gaps[:-1] + 1.0)
+        k = int(np.argmax(ratios))
+        if ratios[k] >= GAP_MIN_RATIO:
+            threshold = (sorted_gaps[k] + sorted_gaps[k + 1]) / 2
+    threshold = max(threshold, min_break)
+
+    return np.concatenate([[0], np.cumsum(gaps > threshold)]).astype(int)
+
+
+ROW_STRATEGIES = {
+    "tolerance": _tolerance_rows,
+    "gap": _gap_rows,
+}
+
+ROW_ORDERINGS = ("reading", "serpentine")
+
+
+def cluster_rows(ys, tolerance, strategy=ROW_STRATEGY):
+    """
+    Row label (0 = top row) for every y, plus the stable y-sort order.
+
+    Returns (labels, order): ``labels[k]`` is the row of ``ys[order[k]]``.
+    """
+    if strategy not in ROW_STRATEGIES:
+        raise ValueError(f"Unknown row strategy '{strategy}'. Choose from {sorted(ROW_STRATEGIES)}")
+    order = np.argsort(np.asarray(ys), kind="stable")
+    if order.size == 0:
+        return np.zeros(0, dtype=int), order
+    ys_sorted = [ys[i] for i in order]
+    return ROW_STRATEGIES[strategy](ys_sorted, tolerance), order
+
+
+def number_trees(xs, ys, tolerance, strategy=ROW_STRATEGY, ordering=ROW_ORDERING):
+    """
+    Numbering order of trees given their centroid coordinates.
+
+    Returns (order, rows): ``order`` lists tree indices in numbering order
+    and ``rows[k]`` is the 0-based row of tree ``order[k]``.
+    """
+    if ordering not in ROW_ORDERINGS:
+        raise ValueError(f"Unknown row ordering '{ordering}'. Choose from {ROW_ORDERINGS}")
+
+    labels, by_y = cluster_rows(ys, tolerance, strategy)
+    if by_y.size == 0:
+        return by_y, labels
+
+    x_key = np.asarray(xs, dtype=np.float64)[by_y]
+    if ordering == "serpentine":
+        x_key = np.where(labels % 2 == 1, -x_key, x_key)
+
+    # Stable: trees with equal x keep their y order
+    within = np.lexsort((x_key, labels))
+    return by_y[within], labels[within]
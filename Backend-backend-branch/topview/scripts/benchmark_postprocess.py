@@ -0,0 +1,111 @@
+"""Micro-benchmark of the topview box post-processing.
+
+Compares the original pure-Python filters + O(n^2) de-duplication loop
+(compute_iou against every kept box) with the NumPy versions used by
+detect_trees (tree_box_mask + greedy_dedup), on synthetic orthomosaic-like
+box sets: a jittered grid of crowns with ~30% near-duplicate boxes and
+some boxes failing the size/aspect filters. Results are checked to be
+identical wherever the legacy path runs.
+
+Usage:
+    python topview/scripts/benchmark_postprocess.py
+    python topview/scripts/benchmark_postprocess.py --sizes 100 1000 50000 --legacy-max 10000
+"""
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+# Ensure the backend root (containing the topview package) is on sys.path
+backend_root = Path(__file__).resolve().parents[2]
+if str(backend_root) not in sys.path:
+    sys.path.insert(0, str(backend_root))
+
+from topview.utils import compute_iou, tree_box_mask, greedy_dedup
+
+DEDUP_IOU = 0.40
+MIN_AREA = 150 * 150
+
+
+def synthetic_boxes(n, seed=0):
+    """~n float32 xyxy boxes laid out like tree crowns on a large mosaic."""
+    rng = np.random.default_rng(seed)
+    n_trees = max(1, int(n / 1.3))
+    cols = int(np.ceil(np.sqrt(n_trees)))
+    pitch = 260.0
+
+    idx = np.arange(n_trees)
+    cx = (idx % cols) * pitch + rng.normal(0, 20, n_trees)
+    cy = (idx // cols) * pitch + rng.normal(0, 20, n_trees)
+    w = rng.uniform(100, 240, n_trees)
+    h = w * rng.uniform(0.4, 1.9, n_trees)
+    boxes = np.stack([cx - w / 2, cy - h / 2, cx + w / 2, cy + h / 2], axis=1)
+
+    # Near-duplicates of random trees (detections of the same crown)
+    dup = rng.choice(n_trees, n - n_trees, replace=True)
+    jitter = rng.normal(0, 12, (len(dup), 4))
+    boxes = np.concatenate([boxes, boxes[dup] + jitter])
+    return boxes[rng.permutation(len(boxes))].astype(np.float32)
+
+
+def legacy(boxes, min_area):
+    filtered = []
+    for x1, y1, x2, y2 in boxes:
+        w, h = x2 - x1, y2 - y1
+        if w * h < min_area:
+            continue
+        if w < 120 or h < 120:
+            continue
+        ratio = w / h
+        if ratio < 0.45 or ratio > 1.80:
+            continue
+        filtered.append((float(x1), float(y1), float(x2), float(y2)))
+
+    cleaned = []
+    for box in filtered:
+        if all(compute_iou(box, kept) <= DEDUP_IOU for kept in cleaned):
+            cleaned.append(box)
+    return cleaned
+
+
+def vectorized(boxes, min_area):
+    filtered = boxes[tree_box_mask(boxes, min_area)].astype(np.float64)
+    return [tuple(float(v) for v in filtered[i]) for i in greedy_dedup(filtered, DEDUP_IOU)]
+
+
+def timed(fn, *args, repeat=3):
+    best, out = float("inf"), None
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        out = fn(*args)
+        best = min(best, time.perf_counter() - t0)
+    return out, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark topview box filtering and de-duplication')
+    parser.add_argument('--sizes', nargs='+', type=int, default=[100, 1000, 5000, 10000, 50000])
+    parser.add_argument('--legacy-max', type=int, default=5000,
+                        help='Largest size the O(n^2) legacy loop is run for (default: 5000)')
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per measurement (best reported)')
+
+    args = parser.parse_args()
+
+    print(f"{'boxes':>8}{'kept':>8}{'legacy ms':>12}{'numpy ms':>12}{'speedup':>10}  match")
+    for n in args.sizes:
+        boxes = synthetic_boxes(n)
+        fast, t_fast = timed(vectorized, boxes, MIN_AREA, repeat=args.repeat)
+
+        if n <= args.legacy_max:
+            slow, t_slow = timed(legacy, boxes, MIN_AREA, repeat=1)
+            match = "yes" if slow == fast else "NO"
+            print(f"{n:>8}{len(fast):>8}{t_slow * 1000:>12.1f}{t_fast * 1000:>12.1f}"
+                  f"{t_slow / t_fast:>9.1f}x  {match}")
+        else:
+            print(f"{n:>8}{len(fast):>8}{'-':>12}{t_fast * 1000:>12.1f}{'-':>10}  -")
+
+
+if __name__ == '__main__':
+    main()
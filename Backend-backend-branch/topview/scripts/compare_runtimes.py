@@ -0,0 +1,129 @@
+"""Latency / accuracy comparison of the topview detector runtimes.
+
+Runs TopViewModel.detect_trees with the PyTorch weights and with every
+exported model (ONNX, OpenVINO) on the same images, at IMGSZ from
+topview/config.py. For each runtime it reports median latency per image
+and, against the PyTorch detections, the tree count difference, matched
+recall / precision (IoU >= 0.5) and the mean IoU of matched boxes.
+
+Usage:
+    python topview/scripts/compare_runtimes.py --images ./drone_images
+    python topview/scripts/compare_runtimes.py --images ./drone_images --formats pt onnx --json cmp.json
+"""
+import argparse
+import json
+import statistics
+import sys
+import time
+from pathlib import Path
+
+import cv2
+
+# Ensure the backend root (containing the topview package) is on sys.path
+backend_root = Path(__file__).resolve().parents[2]
+if str(backend_root) not in sys.path:
+    sys.path.insert(0, str(backend_root))
+
+from topview.config import IMGSZ, EXPORTED_MODEL_PATHS
+from topview.model import TopViewModel
+from topview.utils import compute_iou
+
+IMAGE_EXTENSIONS = {".jpg", ".jpeg", ".png", ".tif", ".tiff"}
+MATCH_IOU = 0.5
+
+
+def match_boxes(reference, candidate, iou_thresh=MATCH_IOU):
+    """Greedy one-to-one matching; returns the IoUs of matched pairs."""
+    unmatched = list(candidate)
+    ious = []
+    for ref in reference:
+        if not unmatched:
+            break
+        best = max(unmatched, key=lambda box: compute_iou(ref, box))
+        iou = compute_iou(ref, best)
+        if iou >= iou_thresh:
+            ious.append(iou)
+            unmatched.remove(best)
+    return ious
+
+
+def run_format(model_path, images):
+    """Detections per image and median seconds per detect_trees call."""
+    model = TopViewModel(model_path)
+    model.detect_trees(images[0][1])  # warm-up
+    detections, times = [], []
+    for _, img in images:
+        t0 = time.perf_counter()
+        detections.append([d["bbox"] for d in model.detect_trees(img)])
+        times.append(time.perf_counter() - t0)
+    return detections, statistics.median(times)
+
+
+def compare(images, formats):
+    results = {}
+    for fmt in formats:
+        path = EXPORTED_MODEL_PATHS[fmt]
+        if not Path(path).exists():
+            print(f"⚠️  {fmt}: {path} not found, skipping (run export_model.py --format {fmt})")
+            continue
+        print(f"Running {fmt} ({Path(path).name}) ...")
+        results[fmt] = run_format(path, images)
+
+    if "pt" not in results:
+        raise FileNotFoundError("The PyTorch reference model (final_best.pt) is required")
+    reference, ref_latency = results["pt"]
+
+    rows = []
+    for fmt, (detections, latency) in results.items():
+        n_ref = sum(len(r) for r in reference)
+        n_cand = sum(len(c) for c in detections)
+        matched = [iou for ref, cand in zip(reference, detections) for iou in match_boxes(ref, cand)]
+        rows.append({
+            "format": fmt,
+            "ms_per_image": latency * 1000.0,
+            "speedup": ref_latency / latency,
+            "trees": n_cand,
+            "trees_reference": n_ref,
+            "images_same_count": sum(len(r) == len(c) for r, c in zip(reference, detections)),
+            "recall": len(matched) / n_ref if n_ref else 1.0,
+            "precision": len(matched) / n_cand if n_cand else 1.0,
+            "mean_iou": statistics.mean(matched) if matched else None,
+        })
+    return rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Compare topview detector runtimes (latency / accuracy)')
+    parser.add_argument('--images', required=True, help='Directory with top-view images')
+    parser.add_argument('--formats', nargs='+', choices=list(EXPORTED_MODEL_PATHS),
+                        default=list(EXPORTED_MODEL_PATHS))
+    parser.add_argument('--limit', type=int, default=None, help='Max images to use')
+    parser.add_argument('--json', default=None, help='Also write the results to this JSON file')
+
+    args = parser.parse_args()
+
+    files = sorted(p for p in Path(args.images).iterdir() if p.suffix.lower() in IMAGE_EXTENSIONS)
+    images = [(p, cv2.imread(str(p))) for p in files[:args.limit]]
+    images = [(p, img) for p, img in images if img is not None]
+    if not images:
+        raise SystemExit(f"No readable images in {args.images}")
+    print(f"Images: {len(images)} | imgsz: {IMGSZ}\n")
+
+    formats = args.formats if "pt" in args.formats else ["pt"] + args.formats
+    rows = compare(images, formats)
+
+    print(f"\n{'format':<10}{'ms/img':>9}{'speedup':>9}{'trees':>8}{'same n':>8}"
+          f"{'recall':>8}{'prec':>8}{'mIoU':>8}")
+    for row in rows:
+        miou = f"{row['mean_iou']:.3f}" if row['mean_iou'] is not None else "-"
+        print(f"{row['format']:<10}{row['ms_per_image']:>9.1f}{row['speedup']:>8.2f}x{row['trees']:>8}"
+              f"{row['images_same_count']:>5}/{len(images):<2}{row['recall']:>8.3f}{row['precision']:>8.3f}{miou:>8}")
+
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump(rows, f, indent=2)
+        print(f"\n✅ Results written to {args.json}")
+
+
+if __name__ == '__main__':
+    main()
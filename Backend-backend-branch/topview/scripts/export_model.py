@@ -0,0 +1,80 @@
+"""Export the topview YOLO detector for CPU runtimes.
+
+Writes the exported model next to final_best.pt, where TopViewModel picks
+it up when TOPVIEW_MODEL_FORMAT is set:
+
+    onnx      -> api/models/final_best.onnx              (ONNX Runtime)
+    openvino  -> api/models/final_best_openvino_model/   (OpenVINO)
+
+The export uses a fixed input size of IMGSZ (topview/config.py), the same
+size detect_trees predicts at.
+
+Usage:
+    python topview/scripts/export_model.py --format onnx
+    python topview/scripts/export_model.py --format openvino
+    python topview/scripts/export_model.py --format openvino --int8 --data coconut.yaml
+
+Check the result with topview/scripts/compare_runtimes.py before switching
+TOPVIEW_MODEL_FORMAT.
+"""
+import argparse
+import shutil
+import sys
+from pathlib import Path
+
+# Ensure the backend root (containing the topview package) is on sys.path
+backend_root = Path(__file__).resolve().parents[2]
+if str(backend_root) not in sys.path:
+    sys.path.insert(0, str(backend_root))
+
+from ultralytics import YOLO
+
+from topview.config import MODEL_PATH, IMGSZ, EXPORTED_MODEL_PATHS
+
+EXPORT_FORMATS = [fmt for fmt in EXPORTED_MODEL_PATHS if fmt != "pt"]
+
+
+def export(model_format, weights=MODEL_PATH, output=None, int8=False, data=None):
+    """Export ``weights`` to ``model_format`` and return the exported path."""
+    if not Path(weights).exists():
+        raise FileNotFoundError(f"TopView YOLO weights not found: {weights}")
+    if int8 and model_format != "openvino":
+        raise ValueError("--int8 is only supported for the openvino export")
+
+    kwargs = {"format": model_format, "imgsz": IMGSZ, "device": "cpu"}
+    if model_format == "onnx":
+        kwargs.update(simplify=True, dynamic=False)
+    if int8:
+        kwargs.update(int8=True, data=data)
+
+    exported = Path(YOLO(str(weights)).export(**kwargs))
+
+    # ultralytics names the export after the weights file; move it if a
+    # different location was requested
+    target = Path(output or EXPORTED_MODEL_PATHS[model_format])
+    if exported.resolve() != target.resolve():
+        if target.is_dir():
+            shutil.rmtree(target)
+        elif target.exists():
+            target.unlink()
+        shutil.move(str(exported), str(target))
+
+    print(f"✅ Exported {model_format}{' int8' if int8 else ''} model: {target}")
+    return target
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Export the topview YOLO model to ONNX / OpenVINO')
+    parser.add_argument('--format', choices=EXPORT_FORMATS, default='onnx', help='Export format')
+    parser.add_argument('--weights', default=MODEL_PATH, help='YOLO .pt weights')
+    parser.add_argument('--output', default=None, help='Output path (default: next to the weights)')
+    parser.add_argument('--int8', action='store_true', help='OpenVINO int8 post-training quantization')
+    parser.add_argument('--data', default=None, help='Dataset YAML used for int8 calibration')
+
+    args = parser.parse_args()
+
+    export(args.format, weights=args.weights, output=args.output, int8=args.int8, data=args.data)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+"""Checks for the vectorized box utilities against the compute_iou loop.
+
+Run from the backend root with:
+    python -m topview.test_box_utils
+
+Raises AssertionError if something is inconsistent.
+"""
+import numpy as np
+
+from topview.utils import (
+    compute_iou,
+    pairwise_iou,
+    overlapping_pairs,
+    contained_boxes,
+    greedy_dedup,
+    box_areas,
+    _x_overlapping_pairs,
+)
+
+
+def _random_boxes(rng, n, extent=1500):
+    xy = rng.uniform(0, extent, (n, 2))
+    wh = rng.uniform(30, 400, (n, 2))
+    return np.hstack([xy, xy + wh])
+
+
+def _pair_set(i, j):
+    return {(min(a, b), max(a, b)) for a, b in zip(i.tolist(), j.tolist())}
+
+
+def test_pairwise_iou():
+    """Every entry equals compute_iou of the pair."""
+    rng = np.random.default_rng(0)
+    a, b = _random_boxes(rng, 40), _random_boxes(rng, 25)
+    iou = pairwise_iou(a, b)
+    assert iou.shape == (40, 25)
+    for i in range(len(a)):
+        for j in range(len(b)):
+            assert np.isclose(iou[i, j], compute_iou(a[i], b[j]))
+    assert pairwise_iou(np.zeros((0, 4)), b).shape == (0, 25)
+
+
+def test_overlapping_pairs():
+    """Pairs above the threshold, each listed once, chunked or not."""
+    rng = np.random.default_rng(1)
+    boxes = _random_boxes(rng, 150)
+    for thresh in (0.0, 0.2, 0.45):
+        expected = {(i, j) for i in range(len(boxes)) for j in range(i + 1, len(boxes))
+                    if compute_iou(boxes[i], boxes[j]) > thresh}
+        i, j = overlapping_pairs(boxes, thresh)
+        assert len(i) == len(expected) and _pair_set(i, j) == expected
+
+    full = set()
+    for i, j in _x_overlapping_pairs(boxes):
+        full |= _pair_set(i, j)
+    chunked = set()
+    for i, j in _x_overlapping_pairs(boxes, max_pairs=7):
+        chunked |= _pair_set(i, j)
+    assert chunked == full
+
+
+def test_contained_boxes():
+    """A box is flagged when a strictly larger box covers enough of it."""
+    rng = np.random.default_rng(2)
+    boxes = _random_boxes(rng, 150)
+    areas = box_areas(boxes)
+    expected = np.zeros(len(boxes), dtype=bool)
+    for i in range(len(boxes)):
+        for k in range(len(boxes)):
+            if areas[k] > areas[i]:
+                iw = min(boxes[i][2], boxes[k][2]) - max(boxes[i][0], boxes[k][0])
+                ih = min(boxes[i][3], boxes[k][3]) - max(boxes[i][1], boxes[k][1])
+                if max(0, iw) * max(0, ih) / areas[i] > 0.8:
+                    expected[i] = True
+    assert np.array_equal(contained_boxes(boxes, 0.8), expected)
+
+
+def test_greedy_dedup():
+    """Same kept boxes as the original loop over compute_iou, in any visiting order."""
+    rng = np.random.default_rng(3)
+    for n in (0, 1, 2, 60, 250):
+        boxes = _random_boxes(rng, n)
+        for order in (None, rng.permutation(n)):
+            visit = range(n) if order is None else order
+            kept = []
+            for i in visit:
+                if all(compute_iou(boxes[i], boxes[k]) <= 0.40 for k in kept):
+                    kept.append(i)
+            assert greedy_dedup(boxes, 0.40, order=order).tolist() == kept
+
+
+if __name__ == "__main__":
+    test_pairwise_iou()
+    test_overlapping_pairs()
+    test_contained_boxes()
+    test_greedy_dedup()
+    print("All box utility checks passed.")
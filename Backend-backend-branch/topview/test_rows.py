@@ -0,0 +1,75 @@
+"""Checks for row grouping and tree numbering against the original loop.
+
+Run from the backend root with:
+    python -m topview.test_rows
+
+Raises AssertionError if something is inconsistent.
+"""
+import numpy as np
+
+from topview.rows import row_tolerance, number_trees
+from topview.utils import assign_numbers
+
+
+def _legacy_assign_numbers(dets, img_height):
+    """assign_numbers before topview/rows.py: running row mean, reading order."""
+    centroids = [{"cx": int(d["centroid"][0]), "cy": int(d["centroid"][1])} for d in dets]
+    row_eps_px = max(25, int(img_height * 0.07))
+
+    centroids_sorted = sorted(centroids, key=lambda c: c["cy"])
+    rows, current_row = [], [centroids_sorted[0]]
+    for c in centroids_sorted[1:]:
+        avg_y = sum(p["cy"] for p in current_row) / len(current_row)
+        if abs(c["cy"] - avg_y) <= row_eps_px:
+            current_row.append(c)
+        else:
+            rows.append(sorted(current_row, key=lambda p: p["cx"]))
+            current_row = [c]
+    rows.append(sorted(current_row, key=lambda p: p["cx"]))
+    return [(c["cx"], c["cy"]) for row in rows for c in row]
+
+
+def _random_layout(rng, n, width, height):
+    n_rows = rng.integers(1, 12)
+    row_y = rng.uniform(0, height, n_rows)
+    ys = row_y[rng.integers(0, n_rows, n)] + rng.normal(0, height * 0.02, n)
+    xs = rng.uniform(0, width, n)
+    return [{"id": i + 1, "bbox": None, "centroid": [int(x), int(y)]} for i, (x, y) in enumerate(zip(xs, ys))]
+
+
+def test_assign_numbers_matches_legacy():
+    """Default settings number trees exactly like the original loop, at any height."""
+    rng = np.random.default_rng(0)
+    for width, height in ((1280, 720), (4000, 3000), (5280, 3956), (20000, 15000)):
+        for _ in range(50):
+            dets = _random_layout(rng, int(rng.integers(1, 80)), width, height)
+            numbered = assign_numbers(dets, height)
+            assert [(c["cx"], c["cy"]) for c in numbered] == _legacy_assign_numbers(dets, height)
+            assert [c["tree_number"] for c in numbered] == list(range(1, len(dets) + 1))
+
+
+def test_number_trees_matches_legacy():
+    """number_trees with the uncapped tolerance gives the legacy order."""
+    rng = np.random.default_rng(1)
+    for height in (3000, 3956):
+        for _ in range(50):
+            dets = _random_layout(rng, int(rng.integers(1, 80)), 4000, height)
+            xs = [d["centroid"][0] for d in dets]
+            ys = [d["centroid"][1] for d in dets]
+            order, _ = number_trees(xs, ys, row_tolerance(height))
+            assert [(xs[i], ys[i]) for i in order] == _legacy_assign_numbers(dets, height)
+
+
+def test_row_tolerance_cap():
+    """The height cap applies only when asked for (tiled detection)."""
+    assert row_tolerance(3956) == int(3956 * 0.07)
+    assert row_tolerance(100) == 25
+    assert row_tolerance(20000, max_height=2560) == int(2560 * 0.07)
+    assert row_tolerance(1000, max_height=2560) == row_tolerance(1000)
+
+
+if __name__ == "__main__":
+    test_assign_numbers_matches_legacy()
+    test_number_trees_matches_legacy()
+    test_row_tolerance_cap()
+    print("All row numbering checks passed.")
@@ -0,0 +1,91 @@
+"""Checks for the tile grid and the merge of boxes across tile seams.
+
+Run from the backend root with:
+    python -m topview.test_tiling
+
+Raises AssertionError if something is inconsistent.
+"""
+import numpy as np
+
+from topview.config import TILE_SIZE, TILE_OVERLAP, TILE_NMS_IOU, TILE_CONTAINMENT_THRESHOLD
+from topview.model import TopViewModel
+from topview.utils import box_areas, compute_iou
+
+
+def _random_boxes(rng, n, extent=6000):
+    xy = rng.uniform(0, extent, (n, 2))
+    wh = rng.uniform(30, 400, (n, 2))
+    return np.hstack([xy, xy + wh]), rng.random(n)
+
+
+def test_tile_grid():
+    """Tiles stay inside the image, cover every pixel and overlap their neighbours."""
+    for H, W in ((800, 600), (TILE_SIZE, TILE_SIZE), (3000, 4000), (10001, 12345)):
+        origins = TopViewModel.tile_grid(H, W)
+        covered = np.zeros((H, W), dtype=bool)
+        for x, y in origins:
+            assert 0 <= x and 0 <= y
+            assert x + TILE_SIZE <= max(W, TILE_SIZE) and y + TILE_SIZE <= max(H, TILE_SIZE)
+            covered[y:y + TILE_SIZE, x:x + TILE_SIZE] = True
+        assert covered.all()
+
+        xs = sorted({x for x, _ in origins})
+        ys = sorted({y for _, y in origins})
+        for starts in (xs, ys):
+            assert (np.diff(starts) <= TILE_SIZE * (1 - TILE_OVERLAP)).all()
+    assert TopViewModel.tile_grid(500, 700) == [(0, 0)]
+
+
+def test_auto_tiling_threshold():
+    """Drone stills keep whole-image inference unless tiling is forced."""
+    for shape in ((3000, 4000), (3956, 5280), (6000, 8000)):
+        img = np.zeros(shape + (3,), dtype=np.uint8)
+        assert not TopViewModel._use_tiles(img, None)
+        assert TopViewModel._use_tiles(img, True)
+    assert TopViewModel._use_tiles(np.zeros((9000, 12000, 3), dtype=np.uint8), None)
+    assert not TopViewModel._use_tiles(np.zeros((9000, 12000, 3), dtype=np.uint8), False)
+
+
+def _legacy_merge(boxes, scores):
+    kept = []
+    for i in sorted(range(len(boxes)), key=lambda k: -scores[k]):
+        if all(compute_iou(boxes[i], boxes[k]) <= TILE_NMS_IOU for k in kept):
+            kept.append(i)
+
+    areas = box_areas(boxes)
+    merged = []
+    for i in kept:
+        contained = False
+        for k in kept:
+            if areas[k] > areas[i]:
+                x1, y1 = max(boxes[i][0], boxes[k][0]), max(boxes[i][1], boxes[k][1])
+                x2, y2 = min(boxes[i][2], boxes[k][2]), min(boxes[i][3], boxes[k][3])
+                inter = max(0, x2 - x1) * max(0, y2 - y1)
+                contained = contained or inter / areas[i] > TILE_CONTAINMENT_THRESHOLD
+        if not contained:
+            merged.append(i)
+    return merged
+
+
+def test_merge_tile_boxes():
+    """Same boxes as score-ordered NMS plus the containment filter, pair by pair."""
+    rng = np.random.default_rng(0)
+    for n in (0, 1, 50, 300):
+        boxes, scores = _random_boxes(rng, n, extent=1500)
+        keep = TopViewModel._merge_tile_boxes(boxes, scores)
+        assert list(keep) == _legacy_merge(boxes, scores)
+
+
+def test_merge_drops_seam_cut():
+    """A tree cut off at a seam is dropped even when it scores higher."""
+    boxes = np.array([[100, 100, 400, 400], [100, 100, 220, 400], [600, 600, 800, 800]], dtype=np.float64)
+    scores = np.array([0.6, 0.9, 0.7])
+    assert list(TopViewModel._merge_tile_boxes(boxes, scores)) == [2, 0]
+
+
+if __name__ == "__main__":
+    test_tile_grid()
+    test_auto_tiling_threshold()
+    test_merge_tile_boxes()
+    test_merge_drops_seam_cut()
+    print("All tiling checks passed.")
@@ -1,4 +1,8 @@
 import cv2
+import numpy as np
+
+from topview.config import ROW_STRATEGY, ROW_ORDERING
+from topview.rows import row_tolerance, number_trees
 
 def compute_iou(boxA, boxB):
     xA = max(boxA[0], boxB[0])
@@ -16,11 +20,150 @@ def compute_iou(boxA, boxB):
     return inter / (areaA + areaB - inter)
 
 
-def assign_numbers(dets, img_height, row_eps_px=None):
+def box_areas(boxes):
+    boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+    return (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+
+
+def pairwise_iou(boxesA, boxesB):
+    """
+    IoU matrix between two box sets (N x 4 and M x 4, xyxy) -> N x M.
+    Same values as compute_iou for every pair.
+    """
+    a = np.asarray(boxesA, dtype=np.float64).reshape(-1, 4)
+    b = np.asarray(boxesB, dtype=np.float64).reshape(-1, 4)
+
+    iw = np.minimum(a[:, None, 2], b[None, :, 2]) - np.maximum(a[:, None, 0], b[None, :, 0])
+    ih = np.minimum(a[:, None, 3], b[None, :, 3]) - np.maximum(a[:, None, 1], b[None, :, 1])
+    inter = np.clip(iw, 0, None) * np.clip(ih, 0, None)
+
+    union = box_areas(a)[:, None] + box_areas(b)[None, :] - inter
+    return np.divide(inter, union, out=np.zeros_like(inter), where=inter > 0)
+
+
+def tree_box_mask(boxes, min_area, min_side=120, min_ratio=0.45, max_ratio=1.80):
+    """Mask of boxes passing the tree size / shape filters of detect_trees."""
+    boxes = np.asarray(boxes).reshape(-1, 4)
+    w = boxes[:, 2] - boxes[:, 0]
+    h = boxes[:, 3] - boxes[:, 1]
+    ratio = np.divide(w, h, out=np.zeros_like(w), where=h > 0)
+    return (
+        (w * h >= min_area)
+        & (w >= min_side) & (h >= min_side)
+        & (ratio >= min_ratio) & (ratio <= max_ratio)
+    )
+
+
+def _x_overlapping_pairs(boxes, max_pairs=1_000_000):
+    """
+    Yield (i, j) index arrays of box pairs whose x-ranges overlap, in chunks
+    of about ``max_pairs``. A sweep over boxes sorted by x1 avoids the full
+    N x N comparison: only boxes starting before box i ends can touch it.
+    """
+    n = len(boxes)
+    order = np.argsort(boxes[:, 0], kind="stable")
+    x1_sorted = boxes[order, 0]
+    ends = np.searchsorted(x1_sorted, boxes[order, 2], side="left")
+    counts = np.maximum(ends - np.arange(n) - 1, 0)
+
+    start = 0
+    cum = np.cumsum(counts)
+    while start < n:
+        stop = max(int(np.searchsorted(cum, cum[start] - counts[start] + max_pairs, side="right")), start + 1)
+        c = counts[start:stop]
+        a = np.repeat(np.arange(start, stop), c)
+        if a.size:
+            offsets = np.arange(a.size) - np.repeat(np.cumsum(c) - c, c)
+            yield order[a], order[a + 1 + offsets]
+        start = stop
+
+
+def _pair_overlaps(boxes, i, j):
+    iw = np.minimum(boxes[i, 2], boxes[j, 2]) - np.maximum(boxes[i, 0], boxes[j, 0])
+    ih = np.minimum(boxes[i, 3], boxes[j, 3]) - np.maximum(boxes[i, 1], boxes[j, 1])
+    return np.clip(iw, 0, None) * np.clip(ih, 0, None)
+
+
+def overlapping_pairs(boxes, iou_thresh):
+    """All index pairs (i, j), i != j listed once, with IoU > iou_thresh."""
+    boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+    areas = box_areas(boxes)
+    found_i, found_j = [np.zeros(0, dtype=int)], [np.zeros(0, dtype=int)]
+    for i, j in _x_overlapping_pairs(boxes):
+        inter = _pair_overlaps(boxes, i, j)
+        union = areas[i] + areas[j] - inter
+        iou = np.divide(inter, union, out=np.zeros_like(inter), where=inter > 0)
+        mask = iou > iou_thresh
+        found_i.append(i[mask])
+        found_j.append(j[mask])
+    return np.concatenate(found_i), np.concatenate(found_j)
+
+
+def contained_boxes(boxes, containment_thresh):
+    """
+    Boolean mask of boxes whose intersection with some larger box covers
+    more than ``containment_thresh`` of their own area.
+    """
+    boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+    areas = box_areas(boxes)
+    contained = np.zeros(len(boxes), dtype=bool)
+    for i, j in _x_overlapping_pairs(boxes):
+        inter = _pair_overlaps(boxes, i, j)
+        # Attribute the pair to its smaller box
+        small = np.where(areas[i] < areas[j], i, j)
+        larger_exists = areas[i] != areas[j]
+        ratio = inter / np.maximum(areas[small], 1e-9)
+        contained[small[larger_exists & (ratio > containment_thresh)]] = True
+    return contained
+
+
+def greedy_dedup(boxes, iou_thresh, order=None):
+    """
+    Greedy duplicate removal (NMS without score sorting).
+
+    Boxes are visited in ``order`` (default: as given); a box is kept if its
+    IoU with every previously kept box is <= iou_thresh. Returns the kept
+    indices in visiting order - the same result as
+
+        kept = []
+        for box in boxes:
+            if all(compute_iou(box, k) <= iou_thresh for k in kept):
+                kept.append(box)
+
+    but only overlapping pairs are ever compared.
+    """
+    boxes = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+    n = len(boxes)
+    order = np.arange(n) if order is None else np.asarray(order, dtype=int)
+    rank = np.empty(n, dtype=int)
+    rank[order] = np.arange(n)
+
+    i, j = overlapping_pairs(boxes, iou_thresh)
+    if i.size == 0:
+        return order.copy()
+
+    # Directed edges earlier -> later (in visiting order), grouped by source
+    src = np.where(rank[i] < rank[j], i, j)
+    dst = np.where(rank[i] < rank[j], j, i)
+    by_src = np.argsort(src, kind="stable")
+    src, dst = src[by_src], dst[by_src]
+    starts = np.searchsorted(src, np.arange(n), side="left")
+    stops = np.searchsorted(src, np.arange(n), side="right")
+
+    suppressed = np.zeros(n, dtype=bool)
+    for idx in order[np.isin(order, src)]:
+        if not suppressed[idx]:
+            suppressed[dst[starts[idx]:stops[idx]]] = True
+    return order[~suppressed[order]]
+
+
+def assign_numbers(dets, img_height, row_eps_px=None,
+                   strategy=ROW_STRATEGY, ordering=ROW_ORDERING):
     """
     dets: list of {"id": int, "bbox": [...], "centroid": [cx, cy]}
     Converts detections into per-row numbering based on centroid Y coordinate.
-    Returns list of centroids with keys: `cx`, `cy`, `bbox`, `tree_number`.
+    Returns list of centroids with keys: `cx`, `cy`, `bbox`, `tree_number`, `row`.
+    Row grouping and ordering come from topview/rows.py.
     """
 
     if not dets:
@@ -44,35 +187,23 @@ def assign_numbers(dets, img_height, row_eps_px=None):
 
     # Auto row grouping threshold
     if row_eps_px is None:
-        row_eps_px = max(25, int(img_height * 0.07))
-
-    # Sort by vertical order
-    centroids_sorted = sorted(centroids, key=lambda c: c["cy"])
-
-    rows = []
-    current_row = [centroids_sorted[0]]
-
-    # Group into rows using average Y for stability
-    for c in centroids_sorted[1:]:
-        avg_y = sum(p["cy"] for p in current_row) / len(current_row)
-
-        if abs(c["cy"] - avg_y) <= row_eps_px:
-            current_row.append(c)
-        else:
-            rows.append(sorted(current_row, key=lambda p: p["cx"]))
-            current_row = [c]
+        row_eps_px = row_tolerance(img_height)
 
-    # Add final row
-    rows.append(sorted(current_row, key=lambda p: p["cx"]))
+    # Group into rows and number them (top→bottom, left→right by default)
+    order, rows = number_trees(
+        [c["cx"] for c in centroids],
+        [c["cy"] for c in centroids],
+        row_eps_px,
+        strategy=strategy,
+        ordering=ordering
+    )
 
-    # Assign tree numbers in reading order (top→bottom, left→right)
     numbered = []
-    num = 1
-    for row in rows:
-        for c in row:
-            c["tree_number"] = num
-            numbered.append(c)
-            num += 1
+    for num, (idx, row) in enumerate(zip(order, rows), 1):
+        c = centroids[idx]
+        c["tree_number"] = num
+        c["row"] = int(row) + 1
+        numbered.append(c)
 
     return numbered
 
@@ -0,0 +1,255 @@
+# backend/utils/model_registry.py
+"""
+Process-wide model registry.
+
+Every model used by the routers and pipelines (topview YOLO, sideview
+transfer classifier, UNet++ segmenter) is loaded through this registry so
+each worker process holds exactly one warm copy, no matter how many
+routers or requests use it.
+
+Usage:
+    from utils.model_registry import model_registry
+
+    model_registry.register("my_model", load_fn)
+    model = model_registry.acquire("my_model")   # long-lived reference
+    ...
+    with model_registry.lease("my_model") as model:   # per-request use
+        model.predict(...)
+"""
+
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+
+def current_rss_bytes() -> Optional[int]:
+    """Resident set size of this process in bytes, or None if unavailable."""
+    if psutil is not None:
+        return psutil.Process(os.getpid()).memory_info().rss
+    try:
+        with open("/proc/self/statm", "r") as f:
+            resident_pages = int(f.read().split()[1])
+        return resident_pages * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError, AttributeError):
+        return None
+
+
+def estimate_model_nbytes(obj: Any, _depth: int = 0) -> Optional[int]:
+    """
+    Estimate the parameter memory of a model object.
+
+    Understands objects with an integer ``nbytes``, PyTorch modules
+    (parameters + buffers), Keras models (weights) and wrapper objects
+    exposing one of those as ``.model``.
+    Returns None if the size cannot be determined.
+    """
+    if obj is None or _depth > 3:
+        return None
+
+    # Objects that account for themselves (e.g. TransferModelPredictor)
+    nbytes = getattr(obj, "nbytes", None)
+    if isinstance(nbytes, int):
+        return nbytes
+
+    # PyTorch nn.Module
+    if callable(getattr(obj, "parameters", None)) and callable(getattr(obj, "buffers", None)):
+        try:
+            tensors = list(obj.parameters()) + list(obj.buffers())
+            return int(sum(t.numel() * t.element_size() for t in tensors))
+        except Exception:
+            return None
+
+    # Keras model
+    weights = getattr(obj, "weights", None)
+    if isinstance(weights, (list, tuple)) and hasattr(obj, "count_params"):
+        try:
+            import numpy as np
+            total = 0
+            for w in weights:
+                itemsize = getattr(w.dtype, "size", None) or np.dtype(str(w.dtype)).itemsize
+                total += int(np.prod(w.shape)) * int(itemsize)
+            return total
+        except Exception:
+            return None
+
+    # Wrapper (TransferModelPredictor, TopViewModel, ultralytics YOLO, ...)
+    inner = getattr(obj, "model", None)
+    if inner is not None and inner is not obj:
+        return estimate_model_nbytes(inner, _depth + 1)
+
+    return None
+
+
+class _ModelEntry:
+    """Bookkeeping for one registered model."""
+
+    def __init__(self, name: str, loader: Callable[[], Any], sizeof: Optional[Callable[[Any], Optional[int]]]):
+        self.name = name
+        self.loader = loader
+        self.sizeof = sizeof or estimate_model_nbytes
+        self.lock = threading.Lock()
+        self.model = None
+        self.refcount = 0
+        self.load_count = 0
+        self.load_seconds: Optional[float] = None
+        self.loaded_at: Optional[str] = None
+        self.memory_bytes: Optional[int] = None
+        self.rss_delta_bytes: Optional[int] = None
+        self.last_error: Optional[str] = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "loaded": self.model is not None,
+            "refcount": self.refcount,
+            "load_count": self.load_count,
+            "load_seconds": round(self.load_seconds, 3) if self.load_seconds is not None else None,
+            "loaded_at": self.loaded_at,
+            "memory_bytes": self.memory_bytes,
+            "rss_delta_bytes": self.rss_delta_bytes,
+            "last_error": self.last_error,
+        }
+
+
+class ModelRegistry:
+    """
+    Registry of lazily loaded, shared model instances.
+
+    - Models are loaded once per process on first ``acquire`` and then kept
+      warm, even when their reference count drops to zero.
+    - ``acquire``/``release`` (or the ``lease`` context manager) maintain a
+      reference count; ``unload`` only drops models nobody holds.
+    - Load time, parameter memory and the RSS growth caused by each load are
+      recorded for the health endpoint.
+    """
+
+    def __init__(self):
+        self._entries: Dict[str, _ModelEntry] = {}
+        self._lock = threading.Lock()
+
+    def register(self, name: str, loader: Callable[[], Any],
+                 sizeof: Optional[Callable[[Any], Optional[int]]] = None,
+                 replace: bool = False) -> None:
+        """Register a loader for ``name``. Re-registering is a no-op unless ``replace``."""
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is not None and not replace:
+                return
+            if entry is not None and entry.model is not None:
+                raise RuntimeError(f"Cannot replace loaded model '{name}'")
+            self._entries[name] = _ModelEntry(name, loader, sizeof)
+
+    def is_registered(self, name: str) -> bool:
+        return name in self._entries
+
+    def _entry(self, name: str) -> _ModelEntry:
+        try:
+            return self._entries[name]
+        except KeyError:
+            raise KeyError(f"Model '{name}' is not registered") from None
+
+    def _ensure_loaded(self, entry: _ModelEntry) -> Any:
+        # Caller holds entry.lock
+        if entry.model is not None:
+            return entry.model
+
+        rss_before = current_rss_bytes()
+        start = time.perf_counter()
+        try:
+            model = entry.loader()
+        except Exception as e:
+            entry.last_error = str(e)
+            raise
+        entry.load_seconds = time.perf_counter() - start
+        rss_after = current_rss_bytes()
+
+        entry.model = model
+        entry.load_count += 1
+        entry.loaded_at = datetime.utcnow().isoformat()
+        entry.last_error = None
+        entry.rss_delta_bytes = (
+            rss_after - rss_before if rss_before is not None and rss_after is not None else None
+        )
+        try:
+            entry.memory_bytes = entry.sizeof(model)
+        except Exception:
+            entry.memory_bytes = None
+
+        logger.info(f"Model '{entry.name}' loaded in {entry.load_seconds:.2f}s")
+        return model
+
+    def acquire(self, name: str) -> Any:
+        """Return the shared instance (loading it if needed) and take a reference."""
+        entry = self._entry(name)
+        with entry.lock:
+            model = self._ensure_loaded(entry)
+            entry.refcount += 1
+            return model
+
+    def release(self, name: str) -> None:
+        """Drop a reference taken with ``acquire``. The model stays warm."""
+        entry = self._entry(name)
+        with entry.lock:
+            if entry.refcount > 0:
+                entry.refcount -= 1
+
+    @contextmanager
+    def lease(self, name: str):
+        """Context manager around ``acquire``/``release``."""
+        model = self.acquire(name)
+        try:
+            yield model
+        finally:
+            self.release(name)
+
+    def peek(self, name: str) -> Any:
+        """Return the loaded instance without loading it or taking a reference."""
+        entry = self._entries.get(name)
+        return entry.model if entry is not None else None
+
+    def unload(self, name: str, force: bool = False) -> bool:
+        """Free a model. Returns False if it is still referenced and not forced."""
+        entry = self._entry(name)
+        with entry.lock:
+            if entry.model is None:
+                return True
+            if entry.refcount > 0 and not force:
+                return False
+            entry.model = None
+            entry.refcount = 0
+            entry.memory_bytes = None
+            logger.info(f"Model '{name}' unloaded")
+        return True
+
+    def warm_up(self, names: Optional[List[str]] = None) -> Dict[str, Optional[str]]:
+        """Load models ahead of the first request. Returns name -> error (or None)."""
+        errors = {}
+        for name in names or list(self._entries):
+            try:
+                entry = self._entry(name)
+                with entry.lock:
+                    self._ensure_loaded(entry)
+                errors[name] = None
+            except Exception as e:
+                logger.warning(f"Warm-up of model '{name}' failed: {e}")
+                errors[name] = str(e)
+        return errors
+
+    def stats(self) -> List[Dict[str, Any]]:
+        """Per-model load/memory/reference statistics."""
+        return [entry.stats() for entry in self._entries.values()]
+
+
+# Shared instance used by the whole process
+model_registry = ModelRegistry()
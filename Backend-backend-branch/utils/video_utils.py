@@ -29,3 +29,47 @@ def extract_frame_at(video_path, t_seconds, out_path):
     cv2.imwrite(out_path, frame)
     cap.release()
     return True
+
+# extract_frames_at: gaps between requested frames longer than this are
+# crossed with one forward seek instead of decoding every frame in between
+SEEK_GAP_SECONDS = 4.0
+
+def extract_frames_at(video_path, timestamps, seek_gap_seconds=SEEK_GAP_SECONDS):
+    """
+    Decode the frames at several timestamps with a single pass over the video.
+
+    Yields (index, frame_bgr) in timestamp order, where ``index`` is the
+    position in ``timestamps``. Frames past the end of the video are not
+    yielded. The video is opened once and read forward only.
+    """
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        return
+    try:
+        fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+        seek_gap = int(seek_gap_seconds * fps) if seek_gap_seconds else None
+        wanted = sorted((max(0, int(round(t * fps))), i) for i, t in enumerate(timestamps))
+
+        position = 0  # index of the next frame the decoder returns
+        frame = None
+        for frame_no, i in wanted:
+            if frame is not None and frame_no < position:
+                # Same frame requested again
+                yield i, frame.copy()
+                continue
+
+            gap = frame_no - position
+            if seek_gap and gap > seek_gap:
+                cap.set(cv2.CAP_PROP_POS_FRAMES, frame_no)
+                gap = 0
+            for _ in range(gap):
+                if not cap.grab():
+                    return
+
+            ok, frame = cap.read()
+            if not ok:
+                return
+            position = frame_no + 1
+            yield i, frame
+    finally:
+        cap.release()